@@ -3,12 +3,15 @@ Chart Agent: Generates chart code or visualization instructions from NL prompts.
 """
 from typing import Any, Dict
 import streamlit as st
+from agents.prompt_builder import estimate_tokens
+from utils.monitoring import Monitoring, record_tokens
 import re
 
 class ChartAgent:
-    def __init__(self, llm, model_type: str = 'groq'):
+    def __init__(self, llm, model_type: str = 'groq', monitoring=None):
         self.llm = llm
         self.model_type = model_type
+        self.monitoring = monitoring or Monitoring()  # optional shared utils.monitoring.Monitoring
 
     def wants_chart(self, question: str) -> bool:
         # Simple heuristic for demo
@@ -30,16 +33,18 @@ Result (first rows):
 
 Plotly Code:
 """
-        st.session_state["logs"].append(f"[ChartAgent] Prompt:\n{prompt}")
-        if self.model_type == 'groq':
-            response = self.llm.invoke(prompt)
-            code = response.content if hasattr(response, 'content') else str(response)
-        elif self.model_type == 'hf':
-            response = self.llm(prompt, max_new_tokens=128, return_full_text=False)
-            code = response[0]['generated_text'] if isinstance(response, list) else str(response)
-        else:
-            code = "import plotly.express as px\nfig = px.bar(result_df, x=result_df.columns[0], y=result_df.columns[1]); fig.show()"
-        st.session_state["logs"].append(f"[ChartAgent] Response:\n{code}")
+        st.session_state["logs"].debug("ChartAgent", "Prompt:\n%s", prompt)
+        with self.monitoring.span('llm_call', agent='chart', model=self.model_type):
+            if self.model_type == 'groq':
+                response = self.llm.invoke(prompt)
+                code = response.content if hasattr(response, 'content') else str(response)
+            elif self.model_type == 'hf':
+                response = self.llm(prompt, max_new_tokens=128, return_full_text=False)
+                code = response[0]['generated_text'] if isinstance(response, list) else str(response)
+            else:
+                code = "import plotly.express as px\nfig = px.bar(result_df, x=result_df.columns[0], y=result_df.columns[1]); fig.show()"
+        record_tokens(self.monitoring, 'chart', self.model_type, estimate_tokens(prompt), estimate_tokens(code))
+        st.session_state["logs"].debug("ChartAgent", "Response:\n%s", code)
         return self._extract_code(code)
 
     def _extract_code(self, text: str) -> str:
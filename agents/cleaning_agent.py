@@ -3,11 +3,15 @@ CleaningAgent: Converts NL cleaning requests to pandas code and applies them.
 """
 from typing import Any
 import streamlit as st
+from core.query_executor import copy_on_write, cow_view
 
 class CleaningAgent:
-    def __init__(self, llm, model_type: str = 'groq'):
+    def __init__(self, llm, model_type: str = 'groq', engine=None, sandbox=None, versions=None):
         self.llm = llm
         self.model_type = model_type
+        self.engine = engine  # optional QueryEngine; cleaned data is re-registered on it
+        self.sandbox = sandbox  # optional SandboxPool; generated code runs out of process
+        self.versions = versions  # optional DatasetVersions; each cleaning step becomes an undoable version
 
     def nl_to_pandas(self, user_request: str, df_columns: list) -> str:
         prompt = f"""
@@ -17,21 +21,59 @@ Columns: {', '.join(df_columns)}
 Request: {user_request}
 Code:
 """
-        if self.model_type == 'groq':
+        if self.model_type in ('groq', 'mistral'):
             response = self.llm.invoke(prompt)
             code = response.content.strip() if hasattr(response, 'content') else str(response).strip()
         elif self.model_type == 'hf':
             response = self.llm(prompt, max_new_tokens=64, return_full_text=False)
             code = response[0]['generated_text'].strip() if isinstance(response, list) else str(response).strip()
         else:
+            st.session_state["logs"].error("CleaningAgent", "Unsupported model type: %s", self.model_type)
             code = ""
         return code
 
     def apply_cleaning(self, code: str, df: Any):
+        """
+        Run the cleaning code on df. Returns df itself (nothing re-registered)
+        when there is no code or the code leaves the data unchanged.
+        """
+        if not code or not code.strip():
+            return df
         try:
-            local_vars = {'df': df.copy()}
-            exec(code, {}, local_vars)
-            return local_vars['df']
+            if self.sandbox is not None:
+                cleaned = self.sandbox.run(code, df, outputs=('df',))
+            else:
+                # Unchanged columns stay shared with df; only written columns are copied
+                with copy_on_write():
+                    local_vars = {'df': cow_view(df)}
+                    exec(code, {}, local_vars)
+                cleaned = local_vars['df']
+            if self.versions is not None:
+                head = self.versions.head
+                if self.versions.commit(cleaned, code) == head:
+                    return df  # no-op step: keep the registered data and its caches
+            if self.engine is not None and cleaned is not df:
+                # New dataset version: drops cached results computed on the old data
+                self.engine.register(cleaned)
+            return cleaned
         except Exception as e:
-            st.session_state["logs"].append(f"[CleaningAgent] Cleaning error: {e}")
+            st.session_state["logs"].error("CleaningAgent", "Cleaning error: %s", e)
             return df
+
+    def undo(self):
+        """
+        Step back to the previous dataset version and return it.
+        """
+        if self.versions is None:
+            raise ValueError("Undo needs a CleaningAgent created with versions=DatasetVersions(...).")
+        return self._activate(self.versions.undo())
+
+    def redo(self):
+        if self.versions is None:
+            raise ValueError("Redo needs a CleaningAgent created with versions=DatasetVersions(...).")
+        return self._activate(self.versions.redo())
+
+    def _activate(self, df):
+        if self.engine is not None:
+            self.engine.register(df)
+        return df
@@ -2,15 +2,15 @@
 Embed Agent: Indexes table schemas and injects relevant context for RAG.
 """
 from typing import Any, Dict
+from core.schema_embedder import schema_to_tables
 
 class EmbedAgent:
     def __init__(self, embedder):
-        self.embedder = embedder
+        self.embedder = embedder  # core.schema_embedder.SchemaEmbedder
 
-    def index_schema(self, schema: Dict[str, Any]):
-        # Placeholder: Use embedder to index schema
-        return self.embedder.embed(schema)
+    def index_schema(self, schema: Dict[str, Any], chunk_size: int = 5):
+        self.embedder.chunk_schema(schema_to_tables(schema), chunk_size)
+        self.embedder.embed_chunks()
 
-    def retrieve_context(self, question: str) -> str:
-        # Placeholder: Use embedder to retrieve relevant context
-        return self.embedder.retrieve(question)
+    def retrieve_context(self, question: str, k: int = 3) -> str:
+        return '\n'.join(self.embedder.retrieve(question, k=k))
@@ -1,18 +1,27 @@
 """
 Explainer Agent: Explains code and results using LLMs.
 """
-from typing import Any
+from typing import Any, Optional
 import re
 import streamlit as st
+from agents.prompt_builder import estimate_tokens
+from utils.monitoring import Monitoring, record_tokens
 
 class ExplainerAgent:
-    def __init__(self, llm, model_type: str = 'groq'):
+    def __init__(self, llm, model_type: str = 'groq', monitoring=None):
         self.llm = llm
         self.model_type = model_type
+        self.monitoring = monitoring or Monitoring()  # optional shared utils.monitoring.Monitoring
 
-    def explain(self, sql: str, result: Any) -> str:
+    def explain(self, sql: str, result: Any, sample_percent: Optional[float] = None) -> str:
+        """
+        sample_percent: set when the result was computed on a TABLESAMPLE, so
+        counts and sums are only about that share of the full-table values.
+        """
+        sample_note = (f"\n**Note:** Computed on a {sample_percent:g}% random sample of the data; counts and sums "
+                       f"are roughly {sample_percent:g}% of the full-table values." if sample_percent else "")
         if not sql or sql.strip().lower() in ["none", "null", "", "-- error:"]:
-            st.session_state["logs"].append("[ExplainerAgent] No valid SQL to explain.")
+            st.session_state["logs"].warning("ExplainerAgent", "No valid SQL to explain.")
             return "**Explanation:** No recent query found. Try asking something like 'Show total fare by payment type.'"
         # Direct explanation for single aggregate queries
         agg_match = re.match(r"SELECT\\s+(MAX|MIN|AVG|SUM|COUNT)\\((.*?)\\)\\s+FROM", sql.strip(), re.IGNORECASE)
@@ -26,19 +35,21 @@ class ExplainerAgent:
                 value = result.values[0][0]
             if value is not None:
                 if agg_func == 'MAX':
-                    return f"**Query Description:** This query finds the highest value in the '{col}' column.\n**Business Insight:** The highest {col.replace('_',' ')} in the dataset is ${value}."
+                    return f"**Query Description:** This query finds the highest value in the '{col}' column.\n**Business Insight:** The highest {col.replace('_',' ')} in the dataset is ${value}.{sample_note}"
                 elif agg_func == 'MIN':
-                    return f"**Query Description:** This query finds the lowest value in the '{col}' column.\n**Business Insight:** The lowest {col.replace('_',' ')} in the dataset is ${value}."
+                    return f"**Query Description:** This query finds the lowest value in the '{col}' column.\n**Business Insight:** The lowest {col.replace('_',' ')} in the dataset is ${value}.{sample_note}"
                 elif agg_func == 'AVG':
-                    return f"**Query Description:** This query calculates the average of the '{col}' column.\n**Business Insight:** The average {col.replace('_',' ')} in the dataset is ${value}."
+                    return f"**Query Description:** This query calculates the average of the '{col}' column.\n**Business Insight:** The average {col.replace('_',' ')} in the dataset is ${value}.{sample_note}"
                 elif agg_func == 'SUM':
-                    return f"**Query Description:** This query sums all values in the '{col}' column.\n**Business Insight:** The total {col.replace('_',' ')} in the dataset is ${value}."
+                    return f"**Query Description:** This query sums all values in the '{col}' column.\n**Business Insight:** The total {col.replace('_',' ')} in the dataset is ${value}.{sample_note}"
                 elif agg_func == 'COUNT':
-                    return f"**Query Description:** This query counts the number of rows in the dataset.\n**Business Insight:** The total number of rows is {value}."
+                    return f"**Query Description:** This query counts the number of rows in the dataset.\n**Business Insight:** The total number of rows is {value}.{sample_note}"
         # Fallback: if result is empty
         if not result or (hasattr(result, 'empty') and result.empty):
             return "**Explanation:** No meaningful data returned."
         # Fallback to LLM prompt
+        sample_instruction = (f"The result was computed on a {sample_percent:g}% random sample of the data: counts and sums "
+                              f"are only about {sample_percent:g}% of the true totals. Say so in the insight." if sample_percent else "")
         prompt = f"""
 You are a helpful data analyst. Given the following SQL query and its result, do two things:
 1. Briefly describe in plain English what the query is doing (e.g., 'This query finds the vendor with the most customers.').
@@ -55,19 +66,22 @@ SQL Query:
 
 Result (first rows):
 {result.head().to_markdown(index=False) if hasattr(result, 'head') else str(result)}
+{sample_instruction}
 
 Explanation:
 """
-        st.session_state["logs"].append(f"[ExplainerAgent] Prompt:\n{prompt}")
-        if self.model_type == 'groq':
-            response = self.llm.invoke(prompt)
-            explanation = response.content if hasattr(response, 'content') else str(response)
-        elif self.model_type == 'hf':
-            response = self.llm(prompt, max_new_tokens=128, return_full_text=False)
-            explanation = response[0]['generated_text'] if isinstance(response, list) else str(response)
-        else:
-            explanation = "No explanation available."
-        st.session_state["logs"].append(f"[ExplainerAgent] Response:\n{explanation}")
+        st.session_state["logs"].debug("ExplainerAgent", "Prompt:\n%s", prompt)
+        with self.monitoring.span('llm_call', agent='explainer', model=self.model_type):
+            if self.model_type == 'groq':
+                response = self.llm.invoke(prompt)
+                explanation = response.content if hasattr(response, 'content') else str(response)
+            elif self.model_type == 'hf':
+                response = self.llm(prompt, max_new_tokens=128, return_full_text=False)
+                explanation = response[0]['generated_text'] if isinstance(response, list) else str(response)
+            else:
+                explanation = "No explanation available."
+        record_tokens(self.monitoring, 'explainer', self.model_type, estimate_tokens(prompt), estimate_tokens(explanation))
+        st.session_state["logs"].debug("ExplainerAgent", "Response:\n%s", explanation)
         if not explanation or 'no explanation available' in explanation.lower():
             return "**Explanation:** Could not generate a meaningful explanation for this query."
-        return explanation.strip()
+        return explanation.strip() + sample_note
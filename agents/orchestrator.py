@@ -0,0 +1,62 @@
+"""
+Orchestrator: Runs independent agent calls concurrently and records per-stage timings.
+"""
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+class AgentOrchestrator:
+    def __init__(self, max_workers: int = 4, wrap: Optional[Callable[[Callable], Callable]] = None, monitoring=None):
+        self.max_workers = max_workers
+        self.wrap = wrap  # e.g. with_script_context, applied to every stage
+        self.monitoring = monitoring  # optional utils.monitoring.Monitoring; each stage is recorded as a span
+        self.timings: Dict[str, float] = {}
+
+    def _record(self, name: str, seconds: float):
+        self.timings[name] = seconds
+        if self.monitoring is not None:
+            self.monitoring.observe(name, seconds)
+
+    def time_stage(self, name: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run a sequential stage inline, recording its duration.
+        """
+        t0 = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            self._record(name, time.perf_counter() - t0)
+
+    def run(self, stages: Dict[str, Callable[[], Any]]) -> Iterator[Tuple[str, Any, Optional[Exception]]]:
+        """
+        Run stages concurrently and yield (name, result, error) as each one finishes.
+        """
+        def timed(name, fn):
+            t0 = time.perf_counter()
+            try:
+                return fn()
+            finally:
+                self._record(name, time.perf_counter() - t0)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, max(len(stages), 1))) as executor:
+            futures = {}
+            for name, fn in stages.items():
+                task = (lambda name=name, fn=fn: timed(name, fn))
+                futures[executor.submit(self.wrap(task) if self.wrap else task)] = name
+            for future in as_completed(futures):
+                error = future.exception()
+                yield futures[future], (None if error else future.result()), error
+
+def with_script_context(fn: Callable) -> Callable:
+    """
+    Bind the calling Streamlit script context to `fn` so it can use
+    st.session_state from a worker thread.
+    """
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    ctx = get_script_run_ctx()
+
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn()
+    return run
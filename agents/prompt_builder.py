@@ -0,0 +1,163 @@
+"""
+Prompt builder for SQLAgent: keeps prompts within a token budget by selecting
+relevant columns, a summarized sliding window of chat history, and the few-shot
+examples most similar to the question.
+"""
+import re
+import hashlib
+from typing import Any, Dict, List, Tuple
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (~4 characters per token for English/SQL).
+    """
+    return (len(text) + 3) // 4
+
+def tokenize(text: str) -> set:
+    """
+    Lowercase word tokens, splitting snake_case/camelCase and dropping plural 's'.
+    """
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", str(text))
+    words = re.findall(r"[a-z0-9]+", text.lower().replace('_', ' '))
+    return {w[:-1] if len(w) > 3 and w.endswith('s') else w for w in words}
+
+# Leading connectives and references back to an earlier answer ("now by product", "sort those")
+_FOLLOW_UP = re.compile(r"^\s*(?:and|but|now|also|then|instead|only|just|what about|how about)\b"
+                        r"|\b(?:it|its|that|those|these|them|they|previous|above|same|instead|again)\b", re.IGNORECASE)
+
+def is_follow_up(question: str) -> bool:
+    """
+    Whether a question reads as building on the previous answer.
+    """
+    return bool(_FOLLOW_UP.search(question))
+
+def parse_examples(text: str) -> List[Tuple[str, str]]:
+    """
+    Split a 'User: ...\\nSQL: ...' few-shot block into (question, sql) pairs.
+    """
+    return re.findall(r"User:\s*(.+?)\s*\nSQL:\s*(.+?)\s*(?:\n|$)", text)
+
+class PromptBuilder:
+    def __init__(self, examples: List[Tuple[str, str]], token_budget: int = 1500, max_columns: int = 40,
+                 history_turns: int = 4, num_examples: int = 3):
+        self.examples = examples
+        self.token_budget = token_budget
+        self.max_columns = max_columns
+        self.history_turns = history_turns
+        self.num_examples = num_examples
+
+    def build(self, question: str, schema: Dict[str, Any], chat_history: List[Dict[str, Any]],
+              prefer_pandas: bool = False) -> str:
+        max_columns, history_turns, num_examples = self.max_columns, self.history_turns, self.num_examples
+        while True:
+            prompt = self._render(
+                question, prefer_pandas,
+                self.schema_section(question, schema, chat_history, max_columns),
+                self.history_section(chat_history, history_turns),
+                self.examples_section(question, num_examples)
+            )
+            if estimate_tokens(prompt) <= self.token_budget:
+                return prompt
+            # Shrink the largest optional sections first
+            if max_columns > 10:
+                max_columns //= 2
+            elif history_turns > 1:
+                history_turns -= 1
+            elif num_examples > 1:
+                num_examples -= 1
+            else:
+                return prompt
+
+    def schema_section(self, question: str, schema: Dict[str, Any], chat_history: List[Dict[str, Any]],
+                       max_columns: int) -> str:
+        tables = schema.get('tables') or {None: schema}
+        all_columns = [(table, col) for table, table_schema in tables.items() for col in table_schema.get('columns', [])]
+        if len(all_columns) > max_columns:
+            recent = ' '.join(self._message_text(msg) for msg in (chat_history or [])[-2:])
+            query_tokens, recent_tokens = tokenize(question), tokenize(recent)
+
+            def score(item):
+                table, col = item
+                name_tokens = tokenize(col['name']) | (tokenize(table) if table else set())
+                return 2 * len(name_tokens & query_tokens) + len(name_tokens & recent_tokens)
+
+            ranked = sorted(range(len(all_columns)), key=lambda i: (-score(all_columns[i]), i))
+            keep = set(ranked[:max_columns])
+            selected = [item for i, item in enumerate(all_columns) if i in keep]
+        else:
+            selected = all_columns
+        lines = []
+        for table in tables:
+            cols = [f"{col['name']} ({col['dtype']})" for t, col in selected if t == table]
+            if not cols:
+                continue
+            total = len(tables[table].get('columns', []))
+            omitted = f" (+{total - len(cols)} more columns)" if len(cols) < total else ""
+            rows = tables[table].get('num_rows', 0)
+            prefix = f"Table {table}: " if table else "Columns: "
+            lines.append(f"{prefix}{', '.join(cols)}{omitted}; Rows: {rows}")
+        return '\n'.join(lines)
+
+    def history_section(self, chat_history: List[Dict[str, Any]], history_turns: int) -> str:
+        if not chat_history:
+            return ""
+        recent = chat_history[-2 * history_turns:]
+        older = chat_history[:-2 * history_turns]
+        lines = []
+        earlier_questions = [msg.get('content', '') for msg in older if msg.get('role') == 'user']
+        if earlier_questions:
+            summary = '; '.join(q[:80] for q in earlier_questions[-5:])
+            lines.append(f"(Earlier, {len(earlier_questions)} questions including: {summary})")
+        for msg in recent:
+            text = self._message_text(msg)
+            if text:
+                lines.append(f"{msg['role']}: {text[:300]}")
+        return '\n'.join(lines)
+
+    def cache_context(self, question: str, chat_history: List[Dict[str, Any]]) -> str:
+        """
+        What cached SQL for `question` depends on besides the question itself: the
+        previous turn's SQL (hashed) for follow-ups, nothing for standalone questions.
+        The current question (already appended to chat_history) is never part of it.
+        """
+        if not is_follow_up(question):
+            return ''
+        previous = next((msg['sql'] for msg in reversed(chat_history) if msg.get('role') == 'assistant' and msg.get('sql')), '')
+        return hashlib.sha1(previous.encode('utf-8')).hexdigest()
+
+    def examples_section(self, question: str, num_examples: int) -> str:
+        query_tokens = tokenize(question)
+
+        def similarity(example):
+            tokens = tokenize(example[0])
+            return len(tokens & query_tokens) / (len(tokens | query_tokens) or 1)
+
+        chosen = sorted(self.examples, key=similarity, reverse=True)[:num_examples]
+        return '\n\n'.join(f"User: {q}\nSQL: {sql}" for q, sql in chosen)
+
+    @staticmethod
+    def _message_text(msg: Dict[str, Any]) -> str:
+        # Assistant turns usually carry SQL rather than free text
+        return msg.get('content') or msg.get('sql') or ''
+
+    @staticmethod
+    def _render(question: str, prefer_pandas: bool, schema_str: str, chat_str: str, examples: str) -> str:
+        return f"""
+You are a helpful data analyst. Based on the database schema and user's natural language question, generate a {'pandas' if prefer_pandas else 'SQL'} query.
+
+Schema:
+{schema_str}
+
+Chat History:
+{chat_str}
+
+Here are some example questions and queries:
+{examples}
+
+IMPORTANT: Assume the SQL engine is DuckDB. Use EXTRACT(HOUR FROM timestamp) instead of strftime. Output ONLY the raw query with NO explanation, markdown, or code blocks. Do NOT wrap in triple backticks or include any commentary.
+
+Question:
+{question}
+
+{'Pandas Code:' if prefer_pandas else 'SQL Query:'}
+"""
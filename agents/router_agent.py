@@ -18,11 +18,11 @@ class RouterAgent:
 
     def route(self, question: str) -> str:
         q = question.lower()
-        st.session_state["logs"].append(f"[RouterAgent] Raw question: {question}")
+        st.session_state["logs"].debug("RouterAgent", "Raw question: %s", question)
         for keywords, intent in self.intent_keywords:
             for word in keywords:
                 if word in q:
-                    st.session_state["logs"].append(f"[RouterAgent] FINAL intent: {intent} (matched on '{word}')")
+                    st.session_state["logs"].info("RouterAgent", "FINAL intent: %s (matched on '%s')", intent, word)
                     return intent
-        st.session_state["logs"].append("[RouterAgent] FINAL intent: sql (fallback)")
+        st.session_state["logs"].info("RouterAgent", "FINAL intent: sql (fallback)")
         return 'sql'
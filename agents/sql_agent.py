@@ -5,6 +5,8 @@ from typing import Any, Dict, List
 import streamlit as st
 import time
 import re
+from agents.prompt_builder import PromptBuilder, estimate_tokens, parse_examples
+from utils.monitoring import Monitoring, record_tokens
 
 FEW_SHOT_EXAMPLES = """
 User: Show total sales by country
@@ -33,71 +35,57 @@ SQL: SELECT name FROM customers WHERE total > (SELECT AVG(total) FROM customers)
 """
 
 class SQLAgent:
-    def __init__(self, llm, model_type: str = 'mistral'):
+    def __init__(self, llm, model_type: str = 'mistral', cache=None, prompt_builder: PromptBuilder = None, monitoring=None):
         self.llm = llm
         self.model_type = model_type  # 'mistral' or 'hf'
+        self.cache = cache  # optional models.sql_cache.SQLCache
+        self.prompt_builder = prompt_builder or PromptBuilder(parse_examples(FEW_SHOT_EXAMPLES))
+        self.monitoring = monitoring or Monitoring()  # optional shared utils.monitoring.Monitoring
 
     def nl_to_sql(self, question: str, schema: Dict[str, Any], chat_history: List[Dict[str, str]], prefer_pandas: bool = False) -> str:
         if not schema or not schema.get('columns'):
-            st.session_state["logs"].append("[SQLAgent] Error: Empty or malformed schema.")
+            st.session_state["logs"].error("SQLAgent", "Empty or malformed schema.")
             return "-- Error: No schema available."
 
-        schema_str = self._schema_to_str(schema)
-        chat_str = self._chat_history_to_str(chat_history)
+        mode = 'pandas' if prefer_pandas else 'sql'
+        # Follow-up questions depend on the previous answer: their cached SQL is scoped to it
+        context = self.prompt_builder.cache_context(question, chat_history) if self.cache is not None else ''
+        if self.cache is not None:
+            cached = self.cache.get(question, schema, mode, context)
+            if cached is not None:
+                st.session_state["logs"].info("SQLAgent", "Cache hit (%.0f%% hit rate):\n%s", self.cache.stats()['hit_rate'] * 100, cached)
+                return cached
 
-        prompt = f"""
-You are a helpful data analyst. Based on the database schema and user's natural language question, generate a {'pandas' if prefer_pandas else 'SQL'} query.
-
-Schema:
-{schema_str}
-
-Chat History:
-{chat_str}
-
-Here are some example questions and queries:
-{FEW_SHOT_EXAMPLES}
-
-IMPORTANT: Assume the SQL engine is DuckDB. Use EXTRACT(HOUR FROM timestamp) instead of strftime. Output ONLY the raw query with NO explanation, markdown, or code blocks. Do NOT wrap in triple backticks or include any commentary.
-
-Question:
-{question}
-
-{'Pandas Code:' if prefer_pandas else 'SQL Query:'}
-"""
+        with self.monitoring.span('prompt_build', agent='sql'):
+            prompt = self.prompt_builder.build(question, schema, chat_history, prefer_pandas)
 
         t0 = time.time()
-        st.session_state["logs"].append(f"[SQLAgent] Prompt (model={self.model_type}, len={len(prompt)}):\n{prompt}")
+        st.session_state["logs"].debug("SQLAgent", "Prompt (model=%s, len=%d, ~%d tokens):\n%s", self.model_type, len(prompt), estimate_tokens(prompt), prompt)
         try:
-            if self.model_type == 'mistral':
-                response = self.llm.invoke(prompt)
-            elif self.model_type == 'hf':
-                response = self.llm(prompt, max_new_tokens=128, return_full_text=False)
-            else:
-                response = "SELECT * FROM data LIMIT 5;"
+            with self.monitoring.span('llm_call', agent='sql', model=self.model_type):
+                if self.model_type == 'mistral':
+                    response = self.llm.invoke(prompt)
+                elif self.model_type == 'hf':
+                    response = self.llm(prompt, max_new_tokens=128, return_full_text=False)
+                else:
+                    response = "SELECT * FROM data LIMIT 5;"
 
             t1 = time.time()
             raw_output = response if isinstance(response, str) else (response[0]['generated_text'] if isinstance(response, list) else str(response))
-            st.session_state["logs"].append(f"[SQLAgent] Response (time={t1 - t0:.2f}s):\n{raw_output}")
-            return self._extract_sql(raw_output)
+            record_tokens(self.monitoring, 'sql', self.model_type, estimate_tokens(prompt), estimate_tokens(raw_output))
+            st.session_state["logs"].debug("SQLAgent", "Response (time=%.2fs):\n%s", t1 - t0, raw_output)
+            query = self._extract_sql(raw_output)
+            if self.cache is not None and query and not query.startswith('-- Error'):
+                self.cache.put(question, schema, query, mode, context)
+            return query
 
         except Exception as e:
-            st.session_state["logs"].append(f"[SQLAgent] Error: {e}")
+            st.session_state["logs"].error("SQLAgent", "%s", e)
             return f"-- Error: {e}"
 
     def nl_to_pandas(self, question: str, schema: Dict[str, Any], chat_history: List[Dict[str, str]]) -> str:
         return self.nl_to_sql(question, schema, chat_history, prefer_pandas=True)
 
-    def _schema_to_str(self, schema: Dict[str, Any]) -> str:
-        if not schema:
-            return ""
-        cols = [f"{col['name']} ({col['dtype']})" for col in schema.get('columns', [])]
-        return f"Columns: {', '.join(cols)}; Rows: {schema.get('num_rows', 0)}"
-
-    def _chat_history_to_str(self, chat_history: List[Dict[str, str]]) -> str:
-        if not chat_history:
-            return ""
-        return '\n'.join([f"{msg['role']}: {msg['content']}" for msg in chat_history])
-
     def _extract_sql(self, text: str) -> str:
         match = re.search(r"(SELECT|INSERT|UPDATE|DELETE).*?(;|\Z)", text, re.IGNORECASE | re.DOTALL)
         return match.group(0).strip() if match else text.strip().strip('`').replace('```sql','').replace('```','')
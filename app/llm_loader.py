@@ -1,35 +1,134 @@
 """
 LLM Loader: Returns a Mistral or HuggingFace pipeline instance based on model selection.
 """
-from transformers import pipeline
 import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
 import requests
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+# Status codes worth retrying: throttling and transient server errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
 class MistralLLM:
-    def __init__(self, api_key: str, model_name: str = "mistral-medium"):
+    """
+    Mistral chat-completions client with a pooled keep-alive session,
+    (connect, read) timeouts and jittered exponential backoff on 429/5xx.
+    Sync (`invoke`, `stream`) and asyncio (`ainvoke`, `astream`) interfaces share the pool.
+    """
+    def __init__(self, api_key: str, model_name: str = "mistral-medium",
+                 api_url: str = "https://api.mistral.ai/v1/chat/completions",
+                 timeout: Tuple[float, float] = (5.0, 60.0), max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_cap: float = 8.0, pool_size: int = 16):
         self.api_key = api_key
         self.model_name = model_name
-        self.api_url = "https://api.mistral.ai/v1/chat/completions"
-
-    def invoke(self, prompt: str):
-        headers = {
+        self.api_url = api_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
-        }
+        })
+
+    def _payload(self, prompt: str, stream: bool = False) -> dict:
         data = {
             "model": self.model_name,
             "messages": [{"role": "user", "content": prompt}],
             "max_tokens": 256,
             "temperature": 0.2
         }
-        response = requests.post(self.api_url, headers=headers, json=data)
-        response.raise_for_status()
+        if stream:
+            data["stream"] = True
+        return data
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.backoff_cap))
+            except ValueError:
+                pass
+        return delay
+
+    def _post(self, data: dict, stream: bool = False) -> requests.Response:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(self.api_url, json=data, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                delay = self._backoff(attempt, response)
+                response.close()
+                time.sleep(delay)
+                continue
+            response.raise_for_status()
+            return response
+
+    def invoke(self, prompt: str):
+        response = self._post(self._payload(prompt))
         return response.json()["choices"][0]["message"]["content"]
 
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Yield completion tokens as they arrive (server-sent events).
+        """
+        response = self._post(self._payload(prompt, stream=True), stream=True)
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                chunk = line[len("data:"):].strip()
+                if chunk == "[DONE]":
+                    break
+                delta = json.loads(chunk)["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    yield delta["content"]
+
+    def ping(self) -> bool:
+        """
+        Cheap connectivity/auth check against the models endpoint (no completion tokens).
+        """
+        models_url = self.api_url.rsplit("/chat/completions", 1)[0] + "/models"
+        response = self.session.get(models_url, timeout=self.timeout)
+        response.raise_for_status()
+        return True
+
+    async def ainvoke(self, prompt: str):
+        return await asyncio.to_thread(self.invoke, prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        tokens = self.stream(prompt)
+        done = object()
+        while True:
+            token = await asyncio.to_thread(next, tokens, done)
+            if token is done:
+                break
+            yield token
+
+    def close(self):
+        self.session.close()
+
 def get_llm(model_type: str, api_key: str):
     if model_type == 'mistral':
         return MistralLLM(api_key)
     elif model_type == 'hf':
+        from transformers import pipeline
         return pipeline(
             "text-generation",
             model="HuggingFaceH4/zephyr-7b-beta",
@@ -38,3 +137,82 @@ def get_llm(model_type: str, api_key: str):
         )
     else:
         raise ValueError(f"Unknown model type: {model_type}")
+
+class LLMRegistry:
+    """
+    Process-wide cache of LLM backends shared by all sessions.
+
+    Each (model_type, api_key) backend is built once, in a background thread,
+    and health checks are cached for `health_ttl` seconds instead of probing
+    the model on every rerun.
+    """
+    def __init__(self, health_ttl: float = 300.0, max_workers: int = 2):
+        self.health_ttl = health_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-loader")
+        self._loads: Dict[Tuple[str, str], Future] = {}
+        self._health: Dict[Tuple[str, str], Tuple[Optional[bool], str, float]] = {}
+        self._health_checks: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_type: str, api_key: str) -> Tuple[str, str]:
+        return model_type, hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+    def preload(self, model_type: str, api_key: str, retry_failed: bool = False) -> Future:
+        """
+        Start building the backend in the background (no-op if already loading/loaded).
+        """
+        key = self._key(model_type, api_key)
+        with self._lock:
+            future = self._loads.get(key)
+            if future is None or (retry_failed and future.done() and future.exception() is not None):
+                future = self._executor.submit(get_llm, model_type, api_key)
+                self._loads[key] = future
+            return future
+
+    def get(self, model_type: str, api_key: str, timeout: Optional[float] = None):
+        """
+        Return the shared backend, waiting for it to finish loading.
+        A previously failed load is retried.
+        """
+        return self.preload(model_type, api_key, retry_failed=True).result(timeout=timeout)
+
+    def is_ready(self, model_type: str, api_key: str) -> bool:
+        future = self.preload(model_type, api_key)
+        return future.done() and future.exception() is None
+
+    def health(self, model_type: str, api_key: str) -> Tuple[Optional[bool], str]:
+        """
+        Last known (ok, message) status without blocking. ok is None while the
+        backend is still loading. A stale result triggers a background re-check.
+        """
+        key = self._key(model_type, api_key)
+        future = self.preload(model_type, api_key)
+        if not future.done():
+            return None, f"Loading {model_type} model..."
+        if future.exception() is not None:
+            return False, str(future.exception())
+        with self._lock:
+            cached = self._health.get(key)
+            check = self._health_checks.get(key)
+            stale = cached is None or time.time() - cached[2] > self.health_ttl
+            if stale and (check is None or check.done()):
+                self._health_checks[key] = self._executor.submit(self._check, key, model_type, future.result())
+        if cached is None:
+            return None, f"Checking {model_type} model..."
+        return cached[0], cached[1]
+
+    def _check(self, key: Tuple[str, str], model_type: str, llm):
+        try:
+            if model_type == 'mistral':
+                llm.ping()
+                status = (True, "Mistral model connected")
+            elif model_type == 'hf':
+                llm("ping", max_new_tokens=1)
+                status = (True, "HF model connected")
+            else:
+                status = (True, f"{model_type} model loaded")
+        except Exception as e:
+            status = (False, str(e))
+        with self._lock:
+            self._health[key] = (status[0], status[1], time.time())
@@ -11,21 +11,35 @@ from core.file_parser import parse_file
 import streamlit as st
 import pandas as pd
 import os
-from core.file_parser import parse_file
-from core.schema_handler import preview_schema, generate_profile
+from core.file_parser import parse_file, scan_file, open_sql_dump, detect_file_type, get_schema_from_relation, LAZY_READERS
+from core.schema_handler import preview_schema, ProfileCache
 from utils.erd import generate_erd
-from utils.profiling import generate_profile_report
+from utils.profiling import ProfileReportJobs, REPORT_SAMPLE_ROWS
 from agents.sql_agent import SQLAgent
 from agents.explainer_agent import ExplainerAgent
 from agents.chart_agent import ChartAgent
 from agents.router_agent import RouterAgent
-from core.query_executor import execute_sql, execute_pandas_code
+from agents.cleaning_agent import CleaningAgent
+from agents.orchestrator import AgentOrchestrator, with_script_context
+from core.query_executor import QueryEngine, execute_pandas_code, enable_copy_on_write
+from core.sandbox import SandboxPool
+from core.query_guard import QueryGuard
+from core.ingest_cache import IngestCache, content_digest
+from core.result_cache import ResultCache
 from models.chat_history import ChatHistory
+from models.chat_store import ChatStore
+from models.dataset_versions import DatasetVersions
+from models.query_history import QueryHistory
+from models.sql_cache import SQLCache
+from utils.monitoring import Monitoring
+from utils.log_buffer import LogBuffer, LEVELS
 from config.model_config import MODELS, get_model_key
 from dotenv import load_dotenv
-from llm_loader import get_llm
+from llm_loader import LLMRegistry
 import os
 import io
+import time
+import uuid
 import plotly.io as pio
 
 
@@ -39,6 +53,8 @@ else:
     load_dotenv(template_path)
 
 st.set_page_config(page_title="AutoQueryAI", layout="wide")
+# Shallow copies handed to generated code and cleaning steps rely on copy-on-write
+enable_copy_on_write()
 st.title("AutoQueryAI - LLM Data Analytics Assistant")
 
 # --- Sidebar: Model selector, file upload, schema preview, LLM status ---
@@ -47,49 +63,268 @@ model_name = st.sidebar.selectbox("Select LLM Model", list(MODELS.keys()))
 model_key = get_model_key(MODELS[model_name])
 
 # --- LLM connection status check ---
-def check_llm_status(model_type, api_key):
-    try:
-        from app.llm_loader import get_llm
-        llm = get_llm(model_type, api_key)
-        # Test call
-        if model_type == 'mistral':
-            resp = llm.invoke("SELECT * FROM customers LIMIT 5")
-            return True, "Mistral model connected"
-        elif model_type == 'hf':
-            resp = llm("SELECT * FROM customers LIMIT 5", max_new_tokens=10)
-            return True, "HF model connected"
-    except Exception as e:
-        return False, str(e)
+@st.cache_resource
+def get_llm_registry() -> LLMRegistry:
+    # One registry per process: backends load once in the background and are shared by all sessions
+    return LLMRegistry()
 
 model_type = MODELS[model_name]
-status_ok, status_msg = check_llm_status(model_type, model_key)
-if status_ok:
+llm_registry = get_llm_registry()
+status_ok, status_msg = llm_registry.health(model_type, model_key)
+if status_ok is None:
+    st.sidebar.info(f"⏳ {status_msg}")
+elif status_ok:
     st.sidebar.success(f"✅ {status_msg}")
 else:
     st.sidebar.error(f"❌ {status_msg}")
 
-uploaded_file = st.sidebar.file_uploader("Upload CSV, Excel, JSON, or SQL", type=["csv", "xlsx", "xls", "json", "sql"])
+uploaded_file = st.sidebar.file_uploader("Upload CSV, Excel, JSON, Parquet, or SQL", type=["csv", "xlsx", "xls", "json", "parquet", "sql"])
+lazy_mode = st.sidebar.checkbox("Lazy mode (scan CSV/JSON/Parquet in place)", value=False,
+                                help="Query the file directly with DuckDB instead of loading it into memory.")
+
+sample_large_queries = st.sidebar.checkbox("Sample expensive queries", value=False,
+                                           help="Run joins/aggregations estimated to touch very many rows on a TABLESAMPLE. "
+                                                "Counts and sums from a sample are only a fraction of the true totals.")
+
+approx_distinct = st.sidebar.checkbox("Approximate distinct counts", value=False,
+                                      help="Use HyperLogLog estimates for unique counts (faster on wide or large tables).")
+
+# Sources whose DEBUG records (full prompts and responses) can be captured
+LOG_SOURCES = ["RouterAgent", "SQLAgent", "ExplainerAgent", "ChartAgent", "CleaningAgent", "main.py"]
+verbose_sources = st.sidebar.multiselect("Debug logging for", LOG_SOURCES, default=[],
+                                         help="Record full prompts and responses for these agents (Debug tab).")
+
+# Uploads are written once under their content hash
+UPLOAD_DIR = os.path.join("/tmp", "autoqueryai", "uploads")
+
+@st.cache_resource
+def get_ingest_cache() -> IngestCache:
+    return IngestCache()
+
+@st.cache_resource
+def get_profile_jobs() -> ProfileReportJobs:
+    # Shared worker process; finished reports are cached on disk by dataset hash
+    return ProfileReportJobs()
+
+@st.cache_resource
+def get_sandbox() -> SandboxPool:
+    # Warm worker processes for LLM-generated code, shared by all sessions
+    return SandboxPool()
+
+@st.cache_resource
+def get_monitoring() -> Monitoring:
+    # Process-wide spans and counters; set AUTOQUERYAI_METRICS_PORT to expose /metrics for Prometheus
+    # (on localhost unless AUTOQUERYAI_METRICS_ADDR says otherwise)
+    monitoring = Monitoring()
+    port = os.getenv('AUTOQUERYAI_METRICS_PORT')
+    if port:
+        try:
+            monitoring.serve(int(port), os.getenv('AUTOQUERYAI_METRICS_ADDR', '127.0.0.1'))
+        except (OSError, ValueError) as e:
+            # Port taken or invalid: the app runs without the endpoint
+            monitoring.log('metrics_server_error', f"Could not serve /metrics on port {port}: {e}")
+    return monitoring
+
+@st.cache_resource
+def get_query_history() -> QueryHistory:
+    # One DuckDB catalog per process; entries are scoped by dataset_key()
+    return QueryHistory()
+
+def dataset_key():
+    """
+    Content identity of the data queries run on: the DatasetVersions head (a
+    hash chained from the upload through each cleaning step), or the upload
+    hash for lazy and SQL-dump datasets, which are never modified.
+    """
+    versions = st.session_state.get('dataset_versions')
+    if versions is not None:
+        return versions.head
+    digest = st.session_state.get('dataset_digest')
+    return digest[:16] if digest else None
+
+@st.cache_resource
+def get_sql_cache() -> SQLCache:
+    # Shared by all sessions; entries are scoped by schema fingerprint
+    return SQLCache()
+
+# Max rows pulled into pandas from a lazy dataset when an agent needs a DataFrame
+LAZY_SAMPLE_ROWS = 10000
+# Chat turns rendered per page; older turns are paged and their artifacts spilled to disk
+CHAT_PAGE_SIZE = 10
+# Messages listed in the sidebar history
+SIDEBAR_HISTORY = 20
+# Log records rendered per page in the Debug tab and routing log
+LOG_PAGE_SIZE = 50
+# Tables larger than this are profiled from a reservoir sample unless the user opts out
+PROFILE_SAMPLE_ROWS = 200000
 
 if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []  # List of dicts: {role, type, content, timestamp, message_id}
+    st.session_state.chat_history = ChatStore()  # Message dicts: {role, type, content, timestamp, message_id}
 if 'logs' not in st.session_state:
-    st.session_state.logs = []
+    # Set AUTOQUERYAI_LOG_DIR to also keep each session's log in a rotating file
+    log_dir = os.getenv('AUTOQUERYAI_LOG_DIR')
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    st.session_state.logs = LogBuffer(
+        spill_path=os.path.join(log_dir, f"session-{datetime.datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}.log") if log_dir else None
+    )
+for source in LOG_SOURCES:
+    st.session_state.logs.set_level('DEBUG' if source in verbose_sources else 'INFO', source)
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex  # scopes this session's query history browsing
 if 'message_id_counter' not in st.session_state:
     st.session_state.message_id_counter = 0
+if 'query_engine' not in st.session_state:
+    st.session_state.query_engine = QueryEngine(result_cache=ResultCache())
+if 'df' not in st.session_state:
+    st.session_state.df = None  # None in lazy mode; the data lives in the 'data' view
+if 'schema' not in st.session_state:
+    st.session_state.schema = None
+if 'profile_cache' not in st.session_state:
+    st.session_state.profile_cache = ProfileCache(st.session_state.query_engine, PROFILE_SAMPLE_ROWS)
+
+def has_dataset() -> bool:
+    return st.session_state.schema is not None
+
+def dataset_frame():
+    """
+    The in-memory DataFrame, or a bounded sample of the lazy view.
+    """
+    if st.session_state.df is not None:
+        return st.session_state.df
+    return st.session_state.query_engine.execute(f"SELECT * FROM data LIMIT {LAZY_SAMPLE_ROWS}")
+
+def report_frame(sample_rows: int):
+    """
+    Rows for the profile report: the in-memory DataFrame, or a reservoir sample
+    drawn from the whole lazy view (not just its first rows).
+    """
+    if st.session_state.df is not None:
+        return st.session_state.df
+    return st.session_state.query_engine.execute(
+        f"SELECT * FROM data USING SAMPLE reservoir({int(sample_rows)} ROWS) REPEATABLE (42)"
+    )
+
+def build_chart(chart_agent, question, result_df):
+    """
+    Ask the ChartAgent for plotly code and run it in the sandbox; returns the figure or None.
+    """
+    chart_code = chart_agent.prompt_to_chart_code(question, st.session_state.schema, result_df)
+    with get_monitoring().span('chart_render'):
+        return get_sandbox().run(chart_code, result_df, input_name='result_df', outputs=('fig',))
+
+def dataset_profile():
+    # Computed once per dataset version (the in-memory df is registered as 'data' too)
+    return st.session_state.profile_cache.summary()
+
+def render_turn(number, user_msg, assistant_msg):
+    """
+    Render one user question and the assistant response paired with it.
+    """
+    with st.chat_message('user'):
+        st.markdown(f"**{number}.** {user_msg['content']}  \n*{user_msg['timestamp']}*")
+    if not assistant_msg:
+        return
+    # Only render if there is actual content
+    has_content = (
+        assistant_msg.get('sql') or assistant_msg.get('explanation') or assistant_msg.get('chart') or assistant_msg.get('chart_error') or assistant_msg.get('profile') or assistant_msg.get('content') or assistant_msg.get('spilled')
+    )
+    if not has_content:
+        return
+    with st.chat_message('assistant'):
+        st.subheader(f"Response {number}")
+        # Older turns keep results/figures on disk; load them only when asked
+        if assistant_msg.get('spilled') and st.toggle("Show result and chart", key=f"artifacts_{assistant_msg['message_id']}"):
+            assistant_msg = st.session_state.chat_history.artifacts(assistant_msg)
+        t = assistant_msg.get('type')
+        if t == 'query':
+            if assistant_msg.get('sql'):
+                st.markdown("**SQL Query:**")
+                st.code(assistant_msg['sql'], language='sql')
+            if assistant_msg.get('result') is not None:
+                st.markdown("**Result:**")
+                st.dataframe(assistant_msg['result'])
+            if assistant_msg.get('explanation'):
+                st.markdown("**Explanation:**")
+                st.markdown(assistant_msg['explanation'])
+                st.toast("Explanation generated ✅", icon="🧠")
+            if assistant_msg.get('chart'):
+                st.markdown("**Chart:**")
+                st.plotly_chart(assistant_msg['chart'], use_container_width=True)
+            if assistant_msg.get('chart_error'):
+                st.warning(f"Chart error: {assistant_msg['chart_error']}")
+            if assistant_msg.get('guard_note'):
+                st.caption(assistant_msg['guard_note'])
+            if assistant_msg.get('timings'):
+                st.caption(" · ".join(f"{k} {v:.2f}s" for k, v in assistant_msg['timings'].items()))
+        elif t == 'plot':
+            st.markdown(f"Chart")
+            if assistant_msg.get('chart'):
+                st.plotly_chart(assistant_msg['chart'], use_container_width=True)
+            if assistant_msg.get('chart_error'):
+                st.warning(f"Chart error: {assistant_msg['chart_error']}")
+        elif t == 'profile':
+            st.markdown(f"Data Profile")
+            st.json(assistant_msg['profile'])
+        elif t == 'explanation':
+            # Fallback: if no recent valid SQL, show a friendly message
+            if not assistant_msg.get('explanation') or 'no recent query' in assistant_msg.get('explanation','').lower():
+                st.markdown("**Explanation:** No recent query found. Try asking something like 'What is the average fare?' or 'Show the highest tip.'")
+            else:
+                st.markdown(f"Explanation")
+                st.markdown(assistant_msg['explanation'])
+                st.toast("Explanation generated ✅", icon="🧠")
+        elif t == 'error':
+            st.markdown(f"Error")
+            st.warning(assistant_msg.get('content', 'Unknown error occurred.'))
 
 # --- File parsing and schema extraction ---
 if uploaded_file:
-    file_path = os.path.join("/tmp", uploaded_file.name)
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    try:
-        df, schema = parse_file(file_path)
-        st.session_state.df = df
-        st.session_state.schema = schema
-        st.session_state.logs.append(f"Loaded file: {uploaded_file.name}")
-    except Exception as e:
-        st.error(f"File parsing error: {e}")
-        st.session_state.logs.append(f"Error: {e}")
+    load_key = (uploaded_file.file_id, lazy_mode, approx_distinct)
+    # Streamlit reruns the script on every widget change; only reload on a new upload/mode
+    if st.session_state.get('load_key') != load_key:
+        digest = content_digest(uploaded_file.getbuffer())
+        file_path = os.path.join(UPLOAD_DIR, f"{digest}{os.path.splitext(uploaded_file.name)[1].lower()}")
+        if not os.path.exists(file_path):
+            os.makedirs(UPLOAD_DIR, exist_ok=True)
+            with open(file_path, "wb") as f:
+                f.write(uploaded_file.getbuffer())
+        ingest_started = time.perf_counter()
+        try:
+            ext = detect_file_type(file_path)
+            st.session_state.dataset_versions = None
+            if ext == '.sql':
+                # All tables stay in a persistent DuckDB file, queryable by name
+                schema = open_sql_dump(file_path, st.session_state.query_engine, approx_distinct)
+                st.session_state.df = None
+            elif lazy_mode and ext in LAZY_READERS:
+                schema = scan_file(file_path, st.session_state.query_engine, approx_distinct=approx_distinct)
+                st.session_state.df = None
+            else:
+                cache_key = f"{digest}-{'approx' if approx_distinct else 'exact'}"
+                cached = get_ingest_cache().get(cache_key)
+                if cached is not None:
+                    df, schema = cached
+                    st.session_state.logs.info("main.py", "Ingest cache hit: %s", uploaded_file.name)
+                else:
+                    progress_bar = st.progress(0.0, text=f"Parsing {uploaded_file.name}...")
+                    def report_progress(fraction, partial_schema):
+                        progress_bar.progress(fraction, text=f"Parsed {partial_schema['num_rows']:,} rows")
+                    df, schema = parse_file(file_path, approx_distinct, progress=report_progress if ext == '.csv' else None)
+                    progress_bar.empty()
+                    get_ingest_cache().put(cache_key, df, schema)
+                st.session_state.df = df
+                st.session_state.query_engine.register(df)
+                # Cleaning steps become undoable versions; the upload hash names the original
+                st.session_state.dataset_versions = DatasetVersions(df, base_id=digest[:16])
+            st.session_state.schema = schema
+            st.session_state.load_key = load_key
+            st.session_state.dataset_digest = digest
+            get_monitoring().observe('ingest', time.perf_counter() - ingest_started, format=ext.lstrip('.'))
+            st.session_state.logs.info("main.py", "Loaded file: %s", uploaded_file.name)
+        except Exception as e:
+            st.error(f"File parsing error: {e}")
+            st.session_state.logs.error("main.py", "File parsing error: %s", e)
 
 # --- Tabs: Chat | Schema | ERD/Profile | Debug ---
 tabs = st.tabs(["Chat", "Schema", "ERD/Profile", "Debug"])
@@ -101,20 +336,84 @@ with tabs[1]:
         st.code(preview_schema(st.session_state.schema))
         st.write(f"Rows: {st.session_state.schema['num_rows']}")
         st.write(f"Columns: {st.session_state.schema['num_columns']}")
+        versions = st.session_state.get('dataset_versions')
+        if versions is not None:
+            st.subheader("Clean data")
+            cleaning_request = st.text_input("Describe a cleaning step (e.g. 'drop rows with missing fare')", key="cleaning_request")
+            clean_cols = st.columns(3)
+            cleaner = CleaningAgent(None, model_type, engine=st.session_state.query_engine, sandbox=get_sandbox(), versions=versions)
+            cleaned = None
+            if clean_cols[0].button("Apply", disabled=not cleaning_request):
+                with st.spinner("Cleaning..."):
+                    cleaner.llm = llm_registry.get(model_type, model_key)
+                    code = cleaner.nl_to_pandas(cleaning_request, list(st.session_state.df.columns))
+                    cleaned = cleaner.apply_cleaning(code, st.session_state.df)
+            if clean_cols[1].button("Undo", disabled=not versions.can_undo()):
+                cleaned = cleaner.undo()
+            if clean_cols[2].button("Redo", disabled=not versions.can_redo()):
+                cleaned = cleaner.redo()
+            if cleaned is not None and cleaned is not st.session_state.df:
+                st.session_state.df = cleaned
+                st.session_state.schema = get_schema_from_relation(st.session_state.query_engine, 'data', approx_distinct)
+                st.rerun()
+            st.caption("Versions: " + " → ".join(step['description'] for step in versions.history()))
     else:
         st.info("Upload a file to see schema preview.")
 
 # --- ERD/Profile Tab ---
 with tabs[2]:
-    if st.session_state.df is not None:
+    if has_dataset():
         st.subheader("Profiling Summary")
-        profile = generate_profile(st.session_state.df)
-        st.json(profile)
+        profile_cache = st.session_state.profile_cache
+        full_scan = st.checkbox("Profile the full table", value=False,
+                                help=f"By default tables over {PROFILE_SAMPLE_ROWS:,} rows are profiled from a sample.")
+        profile_cache.sample_rows = None if full_scan else PROFILE_SAMPLE_ROWS
+        profile = dataset_profile()
+        if profile['sampled_rows']:
+            st.caption(f"Sampled {profile['sampled_rows']:,} of {profile['num_rows']:,} rows")
+        st.dataframe(pd.DataFrame.from_dict(profile['describe'], orient='index'))
+        st.markdown("**Column details**")
+        for column, dtype in profile['dtypes'].items():
+            with st.expander(f"{column} ({dtype})"):
+                # Expensive per-column stats are only computed on request, then cached
+                details = profile_cache.cached_column(column)
+                if details is None and st.button("Compute details", key=f"profile_{column}"):
+                    details = profile_cache.column(column)
+                if details is not None:
+                    st.json(details)
+        st.markdown("**Full profile report**")
+        report_cols = st.columns(4)
+        report_rows = report_cols[0].number_input("Sample rows", min_value=1000, value=REPORT_SAMPLE_ROWS, step=10000)
+        report_minimal = report_cols[1].checkbox("Minimal", value=True)
+        report_correlations = report_cols[2].checkbox("Correlations", value=False, help="Slow on wide tables.")
+        report_interactions = report_cols[3].checkbox("Interactions", value=False, help="Slow on wide tables.")
+        if st.button("Generate report"):
+            st.session_state.report_key = get_profile_jobs().submit(
+                report_frame(int(report_rows)), int(report_rows), report_minimal, report_correlations, report_interactions,
+                dataset_id=dataset_key()
+            )
+
+        @st.fragment(run_every=2)
+        def poll_report():
+            # Re-runs only this fragment until the background job finishes
+            if get_profile_jobs().status(st.session_state.report_key)[0] != 'running':
+                st.rerun()
+            st.info("Building profile report in the background...")
+
+        if st.session_state.get('report_key'):
+            state, detail = get_profile_jobs().status(st.session_state.report_key)
+            if state == 'running':
+                poll_report()
+            elif state == 'failed':
+                st.warning(f"Profile report failed: {detail}")
+            elif state == 'done':
+                with open(detail, 'r', encoding='utf-8') as f:
+                    st.components.v1.html(f.read(), height=800, scrolling=True)
         # Optionally, generate ERD (if SQL)
-        if uploaded_file and uploaded_file.name.endswith('.sql'):
+        if st.session_state.schema.get('database'):
             erd_path = os.path.join("/tmp", "erd.png")
             try:
-                generate_erd(f"duckdb:///{file_path}", erd_path)
+                generate_erd(f"duckdb:///{st.session_state.schema['database']}", erd_path)
                 st.image(erd_path, caption="ER Diagram")
             except Exception as e:
                 st.warning(f"ERD generation failed: {e}")
@@ -124,7 +423,7 @@ with tabs[2]:
 # --- Chat Tab ---
 with tabs[0]:
     st.subheader("Chat with your data")
-    if st.session_state.df is not None:
+    if has_dataset():
         router = RouterAgent()
         user_input = st.chat_input("Ask a question about your data...")
         if user_input:
@@ -135,11 +434,13 @@ with tabs[0]:
             st.session_state.chat_history.append({
                 'role': 'user', 'type': 'query', 'content': user_input, 'timestamp': now, 'message_id': msg_id
             })
-            llm = get_llm(model_type, model_key)
-            sql_agent = SQLAgent(llm, model_type)
-            explainer_agent = ExplainerAgent(llm, model_type)
-            chart_agent = ChartAgent(llm, model_type)
-            intent = router.route(user_input)
+            with st.spinner("Loading model..."):
+                llm = llm_registry.get(model_type, model_key)
+            sql_agent = SQLAgent(llm, model_type, cache=get_sql_cache(), monitoring=get_monitoring())
+            explainer_agent = ExplainerAgent(llm, model_type, monitoring=get_monitoring())
+            chart_agent = ChartAgent(llm, model_type, monitoring=get_monitoring())
+            with get_monitoring().span('routing'):
+                intent = router.route(user_input)
             st.toast(f"Routed to {intent.capitalize()} Agent", icon="🧠")
             with st.spinner("Thinking..."):
                 try:
@@ -150,11 +451,29 @@ with tabs[0]:
                         'message_id': msg_id
                     }
                     if intent == 'sql':
-                        sql_query = sql_agent.nl_to_sql(user_input, st.session_state.schema, st.session_state.chat_history)
+                        orchestrator = AgentOrchestrator(wrap=with_script_context, monitoring=get_monitoring())
+                        sql_query = orchestrator.time_stage('sql_generation', lambda: sql_agent.nl_to_sql(user_input, st.session_state.schema, st.session_state.chat_history))
                         if not sql_query or sql_query.strip().lower() in ["none", "null", "", "-- error:"]:
                             st.toast("No SQL could be generated for this question.", icon="❌")
                         else:
-                            result_df = execute_sql(st.session_state.df, sql_query)
+                            recalled = get_query_history().recall(sql_query, dataset_key()) if dataset_key() else None
+                            complete = False
+                            sample_percent = None
+                            if recalled is not None:
+                                result_df = recalled['result']
+                                assistant_msg['guard_note'] = f"Recalled from query history ({recalled['created_at']:%Y-%m-%d %H:%M}), not re-executed."
+                                st.session_state["logs"].info("main.py", "Query history hit for entry %s", recalled['id'])
+                            else:
+                                guard = QueryGuard(st.session_state.query_engine, auto_sample=sample_large_queries)
+                                guarded = orchestrator.time_stage('sql_execution', lambda: guard.run(sql_query))
+                                result_df = guarded['df']
+                                complete = not (guarded['sampled'] or guarded['truncated'])
+                                sample_percent = guard.sample_percent if guarded['sampled'] else None
+                                if not complete:
+                                    assistant_msg['guard_note'] = (
+                                        (f"Ran on a {guard.sample_percent:.0f}% sample. " if guarded['sampled'] else "") +
+                                        (f"Showing the first {guard.display_limit:,} rows (about {guarded['estimated_rows']:,} estimated)." if guarded['truncated'] else "")
+                                    ).strip()
                             try:
                                 if result_df is None or not hasattr(result_df, 'empty') or result_df.empty:
                                     assistant_msg['explanation'] = "**Explanation:** No data returned."
@@ -162,51 +481,65 @@ with tabs[0]:
                                 else:
                                     assistant_msg['sql'] = sql_query
                                     assistant_msg['result'] = result_df.head() if hasattr(result_df, 'head') else result_df
-                                    assistant_msg['explanation'] = explainer_agent.explain(sql_query, result_df)
-                                    st.toast("Explanation generated ✅", icon="🧠")
+                                    # Explanation and chart are independent LLM round trips: run them concurrently
+                                    stages = {'explanation': lambda: explainer_agent.explain(sql_query, result_df, sample_percent)}
                                     if chart_agent.wants_chart(user_input):
-                                        chart_code = chart_agent.prompt_to_chart_code(user_input, st.session_state.schema, result_df)
-                                        try:
-                                            local_vars = {'result_df': result_df.copy() if hasattr(result_df, 'copy') else result_df}
-                                            exec(chart_code, {}, local_vars)
-                                            fig = local_vars.get('fig', None)
-                                            if fig is not None:
-                                                assistant_msg['chart'] = fig
-                                        except Exception as e:
-                                            assistant_msg['chart_error'] = str(e)
+                                        stages['chart'] = lambda: build_chart(chart_agent, user_input, result_df)
+                                    with st.status("Explaining result...", expanded=True) as status:
+                                        for stage, value, error in orchestrator.run(stages):
+                                            if stage == 'explanation':
+                                                if error is not None:
+                                                    raise error
+                                                assistant_msg['explanation'] = value
+                                                st.markdown(value)
+                                                st.toast("Explanation generated ✅", icon="🧠")
+                                            elif error is not None:
+                                                assistant_msg['chart_error'] = str(error)
+                                            elif value is not None:
+                                                assistant_msg['chart'] = value
+                                                st.plotly_chart(value, use_container_width=True)
+                                            st.caption(f"{stage} ready in {orchestrator.timings[stage]:.2f}s")
+                                        status.update(label="Query complete!", state="complete", expanded=False)
                                     st.toast("Query complete!", icon="✅")
                             except Exception as e:
                                 assistant_msg['content'] = f"Exception during result handling: {e}"
+                        assistant_msg['timings'] = dict(orchestrator.timings)
+                        if assistant_msg.get('sql'):
+                            # A recalled result is already stored; only the question is recorded again
+                            get_query_history().add(user_input, sql_query, None if recalled is not None else result_df,
+                                                    assistant_msg.get('explanation'), assistant_msg['timings'],
+                                                    dataset_key(), complete, session=st.session_state.session_id)
+                        st.session_state["logs"].info(
+                            "main.py", "Stage timings: %s", ", ".join(f"{k}={v:.2f}s" for k, v in orchestrator.timings.items())
+                        )
                     elif intent == 'chart':
-                        chart_code = chart_agent.prompt_to_chart_code(user_input, st.session_state.schema, st.session_state.df)
                         try:
-                            local_vars = {'result_df': st.session_state.df.copy() if hasattr(st.session_state.df, 'copy') else st.session_state.df}
-                            exec(chart_code, {}, local_vars)
-                            fig = local_vars.get('fig', None)
                             assistant_msg['type'] = 'plot'
-                            assistant_msg['chart'] = fig
+                            with get_monitoring().span('chart'):
+                                assistant_msg['chart'] = build_chart(chart_agent, user_input, dataset_frame())
                         except Exception as e:
                             assistant_msg['type'] = 'plot'
                             assistant_msg['chart_error'] = str(e)
                     elif intent == 'profiler':
-                        profile = generate_profile(st.session_state.df)
+                        profile = dataset_profile()
                         assistant_msg['type'] = 'profile'
                         assistant_msg['profile'] = profile
                     elif intent == 'explainer':
                         # Only run explainer if last assistant message has valid sql and result
                         last_sql = None
                         last_result = None
-                        for msg in reversed(st.session_state.chat_history):
-                            if msg['role'] == 'assistant' and msg.get('sql') and msg.get('result') is not None:
-                                last_sql = msg['sql']
-                                last_result = msg['result']
-                                break
+                        last_query = st.session_state.chat_history.last_query
+                        if last_query is not None:
+                            last_query = st.session_state.chat_history.artifacts(last_query)
+                            last_sql = last_query['sql']
+                            last_result = last_query.get('result')
                         try:
                             if not last_sql or last_result is None or not hasattr(last_result, 'empty') or last_result.empty:
-                                st.session_state["logs"].append("[main.py] Skipped explainer: No recent SQL + result.")
+                                st.session_state["logs"].info("main.py", "Skipped explainer: No recent SQL + result.")
                             else:
                                 assistant_msg['type'] = 'explanation'
-                                assistant_msg['explanation'] = explainer_agent.explain(last_sql, last_result)
+                                with get_monitoring().span('explanation'):
+                                    assistant_msg['explanation'] = explainer_agent.explain(last_sql, last_result)
                                 st.toast("Explanation generated ✅", icon="🧠")
                         except Exception as e:
                             assistant_msg['content'] = f"Exception during explainer handling: {e}"
@@ -231,7 +564,7 @@ with tabs[0]:
                         assistant_msg.get('profile') or
                         assistant_msg.get('content')
                     ):
-                        st.session_state["logs"].append("[main.py] Discarded assistant message: No content.")
+                        st.session_state["logs"].warning("main.py", "Discarded assistant message: No content.")
                     else:
                         st.session_state.chat_history.append(assistant_msg)
                 except Exception as e:
@@ -243,79 +576,27 @@ with tabs[0]:
                         'content': f"Error: {e}"
                     })
                     st.toast(f"Query failed: {e}", icon="❌")
-        # Render chat history stack, grouping by message_id (user+assistant)
-        grouped_msgs = []
-        i = 0
-        while i < len(st.session_state.chat_history):
-            msg = st.session_state.chat_history[i]
-            if msg['role'] == 'user':
-                # Find the next assistant with same message_id
-                user_msg = msg
-                assistant_msg = None
-                for j in range(i+1, len(st.session_state.chat_history)):
-                    if st.session_state.chat_history[j]['role'] == 'assistant' and st.session_state.chat_history[j]['message_id'] == msg['message_id']:
-                        assistant_msg = st.session_state.chat_history[j]
-                        break
-                grouped_msgs.append((user_msg, assistant_msg))
-                i = j+1 if assistant_msg else i+1
-            else:
-                i += 1
-        for idx, (user_msg, assistant_msg) in enumerate(grouped_msgs):
-            with st.chat_message('user'):
-                st.markdown(f"**{idx+1}.** {user_msg['content']}  \n*{user_msg['timestamp']}*")
-            if assistant_msg:
-                # Only render if there is actual content
-                has_content = (
-                    assistant_msg.get('sql') or assistant_msg.get('explanation') or assistant_msg.get('chart') or assistant_msg.get('chart_error') or assistant_msg.get('profile') or assistant_msg.get('content')
-                )
-                if not has_content:
-                    continue
-                with st.chat_message('assistant'):
-                    st.subheader(f"Response {idx+1}")
-                    t = assistant_msg.get('type')
-                    if t == 'query':
-                        if assistant_msg.get('sql'):
-                            st.markdown("**SQL Query:**")
-                            st.code(assistant_msg['sql'], language='sql')
-                        if assistant_msg.get('result') is not None:
-                            st.markdown("**Result:**")
-                            st.dataframe(assistant_msg['result'])
-                        if assistant_msg.get('explanation'):
-                            st.markdown("**Explanation:**")
-                            st.markdown(assistant_msg['explanation'])
-                            st.toast("Explanation generated ✅", icon="🧠")
-                        if assistant_msg.get('chart'):
-                            st.markdown("**Chart:**")
-                            st.plotly_chart(assistant_msg['chart'], use_container_width=True)
-                        if assistant_msg.get('chart_error'):
-                            st.warning(f"Chart error: {assistant_msg['chart_error']}")
-                    elif t == 'plot':
-                        st.markdown(f"Chart")
-                        if assistant_msg.get('chart'):
-                            st.plotly_chart(assistant_msg['chart'], use_container_width=True)
-                        if assistant_msg.get('chart_error'):
-                            st.warning(f"Chart error: {assistant_msg['chart_error']}")
-                    elif t == 'profile':
-                        st.markdown(f"Data Profile")
-                        st.json(assistant_msg['profile'])
-                    elif t == 'explanation':
-                        # Fallback: if no recent valid SQL, show a friendly message
-                        if not assistant_msg.get('explanation') or 'no recent query' in assistant_msg.get('explanation','').lower():
-                            st.markdown("**Explanation:** No recent query found. Try asking something like 'What is the average fare?' or 'Show the highest tip.'")
-                        else:
-                            st.markdown(f"Explanation")
-                            st.markdown(assistant_msg['explanation'])
-                            st.toast("Explanation generated ✅", icon="🧠")
-                    elif t == 'error':
-                        st.markdown(f"Error")
-                        st.warning(assistant_msg.get('content', 'Unknown error occurred.'))
+        # Render the newest page of turns; older pages on demand
+        chat = st.session_state.chat_history
+        num_pages = chat.num_pages(CHAT_PAGE_SIZE)
+        if num_pages > 1:
+            with st.expander(f"Earlier turns ({len(chat.turn_ids) - CHAT_PAGE_SIZE})", expanded=False):
+                older_page = st.number_input("Page (1 = most recent)", min_value=1, max_value=num_pages - 1, value=1)
+                for number, message_id in chat.page(int(older_page), CHAT_PAGE_SIZE):
+                    render_turn(number, *chat.turn(message_id))
+        for number, message_id in chat.page(0, CHAT_PAGE_SIZE):
+            render_turn(number, *chat.turn(message_id))
 # --- Route Log Expander ---
 with st.expander("Routing & Classification Log", expanded=False):
-    for log in st.session_state.logs:
-        st.markdown(log)
+    routing_lines, _ = st.session_state.logs.window(0, LOG_PAGE_SIZE, sources=["RouterAgent"])
+    for log in routing_lines:
+        st.text(log)
 # --- Chat History Expander in Sidebar ---
 with st.sidebar.expander("Chat History", expanded=False):
-    for i, msg in enumerate(st.session_state.chat_history):
+    offset = max(0, len(st.session_state.chat_history) - SIDEBAR_HISTORY)
+    if offset:
+        st.caption(f"Showing the last {SIDEBAR_HISTORY} of {len(st.session_state.chat_history)} messages")
+    for i, msg in enumerate(st.session_state.chat_history[offset:], start=offset):
         if msg['role'] == 'user':
             st.markdown(f"**{i+1}. User:** {msg['content']}  \n*{msg['timestamp']}*")
         elif msg['role'] == 'assistant':
@@ -332,5 +613,51 @@ with st.sidebar.expander("Chat History", expanded=False):
 # --- Debug Tab ---
 with tabs[3]:
     st.subheader("Debug / Logs")
-    for log in st.session_state.logs:
-        st.text(log)
+    st.markdown("**Query result cache**")
+    st.json(st.session_state.query_engine.result_cache.stats())
+    @st.fragment(run_every=2)
+    def telemetry_panel():
+        # Refreshes on its own so latencies stay live without rerunning the page
+        monitoring = get_monitoring()
+        for event in monitoring.get_metrics():
+            if event['event'] == 'metrics_server_error':
+                st.warning(event['value'])
+        st.markdown(f"**Latency (seconds, p50/p95/p99 over the last {monitoring.window} calls per span)**")
+        spans = monitoring.summary()
+        if spans:
+            st.dataframe(pd.DataFrame(spans), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No spans recorded yet.")
+        totals = monitoring.totals()
+        if totals:
+            st.dataframe(pd.DataFrame(totals), use_container_width=True, hide_index=True)
+        st.download_button("Download metrics (Prometheus text)", monitoring.export(), file_name="autoqueryai.prom",
+                           mime="text/plain")
+
+    telemetry_panel()
+    st.markdown("**Query history**")
+    history_search = st.text_input("Search past questions and SQL", key="history_search")
+    match_structure = st.checkbox("Match SQL structure (ignore literal values)", key="history_by_fingerprint")
+    history_entries = get_query_history().search(
+        None if match_structure else history_search, sql=history_search if match_structure else None,
+        session=st.session_state.session_id, limit=20
+    )
+    if history_entries:
+        st.dataframe(pd.DataFrame(history_entries)[['created_at', 'question', 'sql', 'result_rows']],
+                     use_container_width=True, hide_index=True)
+        picked = st.selectbox("Show stored result", [entry['id'] for entry in history_entries],
+                              format_func=lambda entry_id: next(e['question'] for e in history_entries if e['id'] == entry_id))
+        stored = get_query_history().result(picked, session=st.session_state.session_id)
+        if stored is not None:
+            st.dataframe(stored, use_container_width=True)
+    st.markdown("**Logs**")
+    logs = st.session_state.logs
+    log_filters = st.columns([1, 2, 2, 1])
+    log_level = log_filters[0].selectbox("Level", list(LEVELS), index=0, key="log_level_filter")
+    log_sources = log_filters[1].multiselect("Sources", logs.sources(), key="log_sources_filter")
+    log_text = log_filters[2].text_input("Contains", key="log_text_filter")
+    log_page = log_filters[3].number_input("Page (1 = newest)", min_value=1, value=1, key="log_page")
+    log_lines, log_pages = logs.window(int(log_page) - 1, LOG_PAGE_SIZE, level=log_level,
+                                       sources=log_sources or None, text=log_text or None)
+    st.caption(f"Page {min(int(log_page), log_pages)} of {log_pages} · {len(logs):,} records held, {logs.dropped:,} evicted")
+    st.code("\n".join(log_lines) or "No matching log records.", language=None)
@@ -0,0 +1,61 @@
+"""
+ChatHistory persistence: JSONL journal vs. rewriting the whole JSON file per message.
+
+Usage: python -m benchmarks.bench_chat_history [--messages 100000] [--legacy 5000]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from models.chat_history import ChatHistory
+
+def _message(i: int) -> str:
+    return f"What was the average fare for trips in zone {i % 265} during hour {i % 24}?"
+
+def legacy_append(history_file: str, count: int):
+    # The previous add_message: json.dump of the full history on every message
+    history = []
+    for i in range(count):
+        history.append({'role': 'user', 'content': _message(i)})
+        with open(history_file, 'w', encoding='utf-8') as f:
+            json.dump(history, f)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--legacy', type=int, default=5_000, help="legacy format is O(n^2); keep this small")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_file = os.path.join(tmp, 'legacy.json')
+        t0 = time.perf_counter()
+        legacy_append(legacy_file, args.legacy)
+        legacy = time.perf_counter() - t0
+        print(f"legacy json rewrite: {args.legacy:,} appends in {legacy:.2f}s ({legacy / args.legacy * 1e6:.0f}us/append)")
+
+        journal_file = os.path.join(tmp, 'history.jsonl')
+        history = ChatHistory(journal_file)
+        t0 = time.perf_counter()
+        for i in range(args.messages):
+            history.add_message('user', _message(i))
+        history.close()
+        journal = time.perf_counter() - t0
+        print(f"jsonl journal:       {args.messages:,} appends in {journal:.2f}s ({journal / args.messages * 1e6:.1f}us/append), "
+              f"file {os.path.getsize(journal_file) / 1e6:.1f}MB")
+
+        t0 = time.perf_counter()
+        tail = ChatHistory(journal_file, load_last=200)
+        print(f"startup, last 200:   {(time.perf_counter() - t0) * 1000:.1f}ms ({len(tail.get_history())} messages)")
+        t0 = time.perf_counter()
+        full = len(tail.load_all())
+        print(f"load all:            {(time.perf_counter() - t0) * 1000:.1f}ms ({full:,} messages)")
+        tail.close()
+
+        compacting = ChatHistory(journal_file, max_messages=10_000)
+        t0 = time.perf_counter()
+        compacting.compact()
+        print(f"compact to 10k:      {(time.perf_counter() - t0) * 1000:.1f}ms")
+        compacting.close()
+
+if __name__ == '__main__':
+    main()
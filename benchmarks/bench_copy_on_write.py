@@ -0,0 +1,63 @@
+"""
+Peak memory of the in-process exec paths: df.copy() per call vs. copy-on-write views.
+
+Each case runs in a fresh interpreter; the peak-RSS high-water mark (VmHWM) is
+reset after the dataset is built, so the figure is the extra memory one call needs.
+Linux only (uses /proc/self/clear_refs).
+
+Usage: python -m benchmarks.bench_copy_on_write [--rows N]
+"""
+import argparse
+import subprocess
+import sys
+import time
+from benchmarks.taxi import make_taxi_df
+from core.query_executor import copy_on_write, cow_view
+
+SNIPPETS = {
+    'aggregate': "result = df.groupby('payment_type')['fare_amount'].mean()",
+    'add column': "df['tip_pct'] = df['tip_amount'] / df['fare_amount']",
+    'fix one column': "df.loc[df['fare_amount'] < 0, 'fare_amount'] = 0",
+    'drop rows': "df = df[df['trip_distance'] > 0]",
+}
+
+def _status_kb(field: str) -> int:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1])
+    return 0
+
+def run_case(mode: str, snippet: str, rows: int):
+    df = make_taxi_df(rows)
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')  # reset VmHWM to the current RSS
+    baseline = _status_kb('VmRSS:')
+    t0 = time.perf_counter()
+    with copy_on_write():
+        local_vars = {'df': df.copy() if mode == 'copy' else cow_view(df)}
+        exec(SNIPPETS[snippet], {}, local_vars)
+    elapsed = time.perf_counter() - t0
+    print(f"{(_status_kb('VmHWM:') - baseline) / 1024:.1f} {elapsed * 1000:.1f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=3_000_000)
+    parser.add_argument('--case', nargs=2, default=None)
+    args = parser.parse_args()
+    if args.case:
+        run_case(args.case[0], args.case[1], args.rows)
+        return
+    size_mb = make_taxi_df(args.rows).memory_usage(deep=True).sum() / 1024 ** 2
+    print(f"rows={args.rows:,} frame={size_mb:.0f}MB; extra peak RSS per call")
+    print(f"{'snippet':<16} {'df.copy()':>18} {'copy-on-write':>18}")
+    for snippet in SNIPPETS:
+        cells = []
+        for mode in ('copy', 'cow'):
+            out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_copy_on_write', '--rows', str(args.rows),
+                                  '--case', mode, snippet], capture_output=True, text=True, check=True).stdout.split()
+            cells.append(f"{float(out[0]):>7.0f}MB {float(out[1]):>6.0f}ms")
+        print(f"{snippet:<16} {cells[0]:>18} {cells[1]:>18}")
+
+if __name__ == '__main__':
+    main()
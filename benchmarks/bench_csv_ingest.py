@@ -0,0 +1,50 @@
+"""
+CSV ingest: pd.read_csv (the original parse_file path) vs. chunked streaming with dtype narrowing.
+Each method runs in a fresh subprocess so peak RSS is measured independently.
+
+Usage: python -m benchmarks.bench_csv_ingest [--rows N] [--path trips.csv]
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+def run_method(method: str, path: str):
+    import pandas as pd
+    from core.file_parser import get_schema_from_df, read_csv_streaming
+    t0 = time.perf_counter()
+    if method == 'read_csv':
+        df = pd.read_csv(path)
+        get_schema_from_df(df)
+    else:
+        df, _ = read_csv_streaming(path)
+    elapsed = time.perf_counter() - t0
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    frame_mb = df.memory_usage(deep=True).sum() / 1024 ** 2
+    print(f"{method:<12} {elapsed:>8.2f}s  peak RSS {peak_mb:>8.0f} MB  frame {frame_mb:>8.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=3_000_000)
+    parser.add_argument('--path', default=None)
+    parser.add_argument('--method', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.method:
+        run_method(args.method, args.path)
+        return
+    path = args.path
+    if path is None:
+        from benchmarks.taxi import write_taxi_csv
+        path = os.path.join(tempfile.gettempdir(), f"taxi_{args.rows}.csv")
+        if not os.path.exists(path):
+            write_taxi_csv(path, args.rows)
+    print(f"file={path} size={os.path.getsize(path) / 1024 ** 2:.0f} MB")
+    for method in ['read_csv', 'streaming']:
+        subprocess.run([sys.executable, '-m', 'benchmarks.bench_csv_ingest', '--path', path, '--method', method], check=True)
+
+if __name__ == '__main__':
+    main()
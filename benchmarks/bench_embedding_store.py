@@ -0,0 +1,66 @@
+"""
+EmbeddingStore retrieval: Python list of (chunk, vector) tuples vs. the contiguous
+float32 matrix (argpartition top-k) and the FAISS IVF index used above the threshold.
+
+Usage: python -m benchmarks.bench_embedding_store [--sizes 1000,10000,100000,1000000] [--dim 128]
+"""
+import argparse
+import time
+import numpy as np
+from models.embedding_store import EmbeddingStore
+
+def list_search(index, query, k):
+    # The original layout: one Python tuple per chunk, scored one by one
+    scored = sorted(((float(np.dot(vector, query)), chunk) for chunk, vector in index), reverse=True)
+    return [chunk for _, chunk in scored[:k]]
+
+def clustered_vectors(rng, centers, size):
+    # Real embeddings cluster by topic; isotropic noise is a worst case for IVF
+    labels = rng.integers(0, len(centers), size)
+    return (centers[labels] + 0.35 * rng.normal(size=(size, centers.shape[1]))).astype('float32')
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+    parser.add_argument('--dim', type=int, default=128)
+    parser.add_argument('--queries', type=int, default=32)
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(1000, args.dim))
+    queries = clustered_vectors(rng, centers, args.queries)
+    print(f"dim={args.dim} queries={args.queries} k={args.k} (times are per query)")
+    print(f"{'chunks':>9} {'add':>9} {'list':>10} {'matrix':>10} {'faiss ivf':>10} {'recall@k':>9}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        vectors = clustered_vectors(rng, centers, size)
+        store = EmbeddingStore(ann_threshold=size + 1)
+        t0 = time.perf_counter()
+        store.add_batch(list(range(size)), vectors)
+        add_s = time.perf_counter() - t0
+
+        list_ms = float('nan')
+        if size <= 100_000:
+            index = list(zip(range(size), store.vectors[:size]))
+            t0 = time.perf_counter()
+            for query in queries[:4]:
+                list_search(index, query / np.linalg.norm(query), args.k)
+            list_ms = (time.perf_counter() - t0) / 4 * 1000
+
+        t0 = time.perf_counter()
+        _, exact = store.search_vectors(queries, args.k)
+        matrix_ms = (time.perf_counter() - t0) / args.queries * 1000
+
+        store.ann_threshold = 0
+        t0 = time.perf_counter()
+        store._ensure_ann()
+        build_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        _, approx = store.search_vectors(queries, args.k)
+        ann_ms = (time.perf_counter() - t0) / args.queries * 1000
+        recall = np.mean([len(set(a) & set(e)) / args.k for a, e in zip(approx, exact)])
+        print(f"{size:>9,} {add_s:>8.2f}s {list_ms:>8.2f}ms {matrix_ms:>8.3f}ms {ann_ms:>8.3f}ms {recall:>9.2f}"
+              f"  (ivf build {build_s:.1f}s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Prompt size and build latency: the original full prompt (every column, whole chat
+history, all few-shot examples) vs. PromptBuilder, replayed over a recorded session
+against a wide taxi-style schema.
+
+Usage: python -m benchmarks.bench_prompt_builder [--extra-columns N] [--live]
+  --live also sends both prompts to Mistral (MISTRAL_API_KEY) and reports LLM latency.
+"""
+import argparse
+import json
+import os
+import time
+from agents.prompt_builder import PromptBuilder, estimate_tokens, parse_examples
+from agents.sql_agent import FEW_SHOT_EXAMPLES
+
+SESSION_PATH = os.path.join(os.path.dirname(__file__), 'data', 'taxi_session.json')
+TAXI_COLUMNS = [
+    ('VendorID', 'int32'), ('tpep_pickup_datetime', 'datetime64[ns]'), ('tpep_dropoff_datetime', 'datetime64[ns]'),
+    ('passenger_count', 'float64'), ('trip_distance', 'float64'), ('RatecodeID', 'float64'),
+    ('store_and_fwd_flag', 'object'), ('PULocationID', 'int32'), ('DOLocationID', 'int32'),
+    ('payment_type', 'object'), ('fare_amount', 'float64'), ('extra', 'float64'), ('mta_tax', 'float64'),
+    ('tip_amount', 'float64'), ('tolls_amount', 'float64'), ('improvement_surcharge', 'float64'),
+    ('total_amount', 'float64'), ('congestion_surcharge', 'float64'), ('airport_fee', 'float64'),
+]
+
+def wide_schema(extra_columns: int):
+    columns = TAXI_COLUMNS + [(f"sensor_{i}_reading", 'float64') for i in range(extra_columns)]
+    return {
+        'columns': [{'name': name, 'dtype': dtype, 'nulls': 0, 'unique': 0} for name, dtype in columns],
+        'num_rows': 3_000_000,
+        'num_columns': len(columns)
+    }
+
+def original_prompt(question, schema, chat_history):
+    # Prompt as SQLAgent built it before PromptBuilder
+    cols = [f"{col['name']} ({col['dtype']})" for col in schema['columns']]
+    schema_str = f"Columns: {', '.join(cols)}; Rows: {schema['num_rows']}"
+    chat_str = '\n'.join(f"{msg['role']}: {msg['content']}" for msg in chat_history)
+    return f"""
+You are a helpful data analyst. Based on the database schema and user's natural language question, generate a SQL query.
+
+Schema:
+{schema_str}
+
+Chat History:
+{chat_str}
+
+Here are some example questions and queries:
+{FEW_SHOT_EXAMPLES}
+
+IMPORTANT: Assume the SQL engine is DuckDB. Use EXTRACT(HOUR FROM timestamp) instead of strftime. Output ONLY the raw query with NO explanation, markdown, or code blocks. Do NOT wrap in triple backticks or include any commentary.
+
+Question:
+{question}
+
+SQL Query:
+"""
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--extra-columns', type=int, default=100)
+    parser.add_argument('--live', action='store_true')
+    args = parser.parse_args()
+
+    with open(SESSION_PATH, 'r', encoding='utf-8') as f:
+        session = json.load(f)
+    schema = wide_schema(args.extra_columns)
+    builder = PromptBuilder(parse_examples(FEW_SHOT_EXAMPLES))
+    llm = None
+    if args.live:
+        from app.llm_loader import MistralLLM
+        llm = MistralLLM(os.environ['MISTRAL_API_KEY'])
+
+    history = []
+    totals = {'original': [0, 0.0, 0.0], 'builder': [0, 0.0, 0.0]}
+    print(f"columns={schema['num_columns']} turns={len(session)}")
+    print(f"{'turn':>4} {'original tok':>13} {'builder tok':>12}")
+    for i, turn in enumerate(session, 1):
+        history.append({'role': 'user', 'content': turn['question']})
+        for label, build in [('original', original_prompt), ('builder', builder.build)]:
+            t0 = time.perf_counter()
+            prompt = build(turn['question'], schema, history)
+            totals[label][1] += time.perf_counter() - t0
+            totals[label][0] += estimate_tokens(prompt)
+            if llm is not None:
+                t0 = time.perf_counter()
+                llm.invoke(prompt)
+                totals[label][2] += time.perf_counter() - t0
+            if label == 'original':
+                original_tokens = estimate_tokens(prompt)
+        print(f"{i:>4} {original_tokens:>13} {estimate_tokens(prompt):>12}")
+        history.append({'role': 'assistant', 'content': turn['sql']})
+    for label, (tokens, build_s, llm_s) in totals.items():
+        line = f"{label:<9} total tokens={tokens:>7} build={build_s * 1000:.1f}ms"
+        if llm is not None:
+            line += f" llm={llm_s:.1f}s"
+        print(line)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Per-query overhead: QueryEngine session vs. execute_sql (connect/register/close per call).
+
+Usage: python -m benchmarks.bench_query_engine [--rows N] [--path trips.parquet] [--repeat R]
+"""
+import argparse
+import statistics
+import time
+from benchmarks.taxi import load_taxi_df
+from core.query_executor import QueryEngine, execute_sql
+
+QUERIES = [
+    "SELECT COUNT(*) FROM data",
+    "SELECT VendorID, SUM(total_amount) AS total FROM data GROUP BY VendorID ORDER BY total DESC LIMIT 5",
+    "SELECT EXTRACT(HOUR FROM tpep_pickup_datetime) AS hour, AVG(fare_amount) FROM data GROUP BY hour ORDER BY hour",
+    "SELECT payment_type, AVG(tip_amount) FROM data GROUP BY payment_type",
+    "SELECT MAX(trip_distance) FROM data",
+]
+
+def _timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=3_000_000)
+    parser.add_argument('--path', default=None)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    df = load_taxi_df(args.path, args.rows)
+    print(f"rows={len(df):,} columns={len(df.columns)}")
+    engine = QueryEngine()
+    engine.register(df)
+    print(f"{'query':<60} {'execute_sql':>12} {'QueryEngine':>12}")
+    for sql in QUERIES:
+        cold = _timed(lambda: execute_sql(df, sql), args.repeat)
+        warm = _timed(lambda: engine.execute(sql), args.repeat)
+        print(f"{sql[:58]:<60} {cold * 1000:>10.1f}ms {warm * 1000:>10.1f}ms")
+    trivial = "SELECT 1 FROM data LIMIT 1"
+    cold = _timed(lambda: execute_sql(df, trivial), args.repeat * 4)
+    warm = _timed(lambda: engine.execute(trivial), args.repeat * 4)
+    print(f"fixed overhead per query: execute_sql={cold * 1000:.2f}ms QueryEngine={warm * 1000:.2f}ms")
+    engine.close()
+
+if __name__ == '__main__':
+    main()
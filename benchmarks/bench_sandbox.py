@@ -0,0 +1,54 @@
+"""
+Round-trip overhead of running generated pandas code in the sandbox pool vs. in-process exec.
+
+Usage: python -m benchmarks.bench_sandbox [--rows 10000,100000,1000000] [--repeat R]
+"""
+import argparse
+import statistics
+import time
+from benchmarks.taxi import make_taxi_df
+from core.sandbox import SandboxPool
+
+SNIPPETS = {
+    'aggregate': "result = df.groupby('payment_type')['fare_amount'].mean()",
+    'filter': "result = df[df['trip_distance'] > 10]",
+    'clean': "df['tip_pct'] = df['tip_amount'] / df['fare_amount']",
+}
+
+def _in_process(df, code):
+    local_vars = {'df': df.copy()}
+    exec(code, {}, local_vars)
+    return local_vars.get('result', local_vars.get('df'))
+
+def _timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    pool = SandboxPool(workers=1, timeout=300)
+    pool.run("result = None")
+    print(f"pool warm-up: {time.perf_counter() - t0:.2f}s")
+    print(f"{'rows':>10} {'snippet':<10} {'exec':>10} {'sandbox':>10} {'share (once)':>13}")
+    for rows in [int(r) for r in args.rows.split(',')]:
+        df = make_taxi_df(rows)
+        t0 = time.perf_counter()
+        pool.share(df)
+        share = time.perf_counter() - t0
+        for name, code in SNIPPETS.items():
+            local = _timed(lambda: _in_process(df, code), args.repeat)
+            sandboxed = _timed(lambda: pool.run(code, df), args.repeat)
+            print(f"{rows:>10,} {name:<10} {local * 1000:>8.1f}ms {sandboxed * 1000:>8.1f}ms {share * 1000:>11.1f}ms")
+    pool.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Schema statistics: per-column pandas scans vs. one DuckDB pass (exact and approximate distinct).
+
+Usage: python -m benchmarks.bench_schema_stats [--rows N] [--path trips.parquet]
+"""
+import argparse
+import time
+from benchmarks.taxi import load_taxi_df
+from core.file_parser import get_schema_from_df
+
+def per_column_schema(df):
+    # The original implementation: two full scans per column
+    return [
+        {'name': col, 'nulls': int(df[col].isnull().sum()), 'unique': int(df[col].nunique())}
+        for col in df.columns
+    ]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=3_000_000)
+    parser.add_argument('--path', default=None)
+    args = parser.parse_args()
+
+    df = load_taxi_df(args.path, args.rows)
+    print(f"rows={len(df):,} columns={len(df.columns)}")
+    runs = [
+        ('pandas per-column', lambda: per_column_schema(df)),
+        ('duckdb exact', lambda: get_schema_from_df(df)['columns']),
+        ('duckdb approx', lambda: get_schema_from_df(df, approx_distinct=True)['columns']),
+    ]
+    baseline = None
+    for label, fn in runs:
+        t0 = time.perf_counter()
+        cols = fn()
+        elapsed = time.perf_counter() - t0
+        if baseline is None:
+            baseline = cols
+        err = max(abs(c['unique'] - b['unique']) / max(b['unique'], 1) for c, b in zip(cols, baseline))
+        print(f"{label:<20} {elapsed:>8.2f}s  max distinct error={err:.2%}")
+
+if __name__ == '__main__':
+    main()
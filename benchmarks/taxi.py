@@ -0,0 +1,45 @@
+"""
+Synthetic NYC-taxi-style dataset shared by the benchmarks.
+"""
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+def make_taxi_df(num_rows: int = 3_000_000, seed: int = 0) -> pd.DataFrame:
+    """
+    Build a yellow-cab-like trip table with the columns the agents expect.
+    """
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2023-01-01T00:00:00')
+    pickup = start + rng.integers(0, 31 * 24 * 3600, num_rows).astype('timedelta64[s]')
+    duration = rng.integers(60, 3600, num_rows).astype('timedelta64[s]')
+    distance = np.round(rng.gamma(2.0, 1.5, num_rows), 2)
+    fare = np.round(3.0 + distance * 2.5 + rng.normal(0, 1, num_rows).clip(-2, 2), 2)
+    tip = np.round(np.where(rng.random(num_rows) < 0.7, fare * rng.uniform(0.1, 0.25, num_rows), 0.0), 2)
+    return pd.DataFrame({
+        'VendorID': rng.integers(1, 3, num_rows).astype('int32'),
+        'tpep_pickup_datetime': pickup,
+        'tpep_dropoff_datetime': pickup + duration,
+        'passenger_count': rng.integers(1, 7, num_rows).astype('int32'),
+        'trip_distance': distance,
+        'PULocationID': rng.integers(1, 266, num_rows).astype('int32'),
+        'DOLocationID': rng.integers(1, 266, num_rows).astype('int32'),
+        'payment_type': rng.choice(['Credit card', 'Cash', 'No charge', 'Dispute'], num_rows, p=[0.75, 0.2, 0.03, 0.02]),
+        'fare_amount': fare,
+        'tip_amount': tip,
+        'total_amount': np.round(fare + tip + 2.5, 2),
+    })
+
+def load_taxi_df(path: Optional[str] = None, num_rows: int = 3_000_000) -> pd.DataFrame:
+    """
+    Load a real trip file (Parquet or CSV) if given, otherwise synthesize one.
+    """
+    if path is None:
+        return make_taxi_df(num_rows)
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+def write_taxi_csv(path: str, num_rows: int = 3_000_000) -> str:
+    make_taxi_df(num_rows).to_csv(path, index=False)
+    return path
@@ -1,14 +1,34 @@
 """
 File parsing and schema detection logic for AutoQueryAI.
-Supports CSV, Excel, JSON, and SQL dump files.
+Supports CSV, Excel, JSON, Parquet, and SQL dump files.
 """
 import os
+import re
+import hashlib
+import tempfile
 import pandas as pd
 import duckdb
 import json
-from typing import Tuple, Dict, Any, Optional
+from typing import Tuple, Dict, Any, Optional, Callable
+from core.query_executor import QueryEngine, quote_ident, quote_literal
 
-SUPPORTED_EXTENSIONS = ['.csv', '.xlsx', '.xls', '.json', '.sql']
+SUPPORTED_EXTENSIONS = ['.csv', '.xlsx', '.xls', '.json', '.parquet', '.sql']
+
+# File types DuckDB can scan in place (lazy mode) and the table function used for each
+LAZY_READERS = {
+    '.csv': 'read_csv_auto',
+    '.json': 'read_json_auto',
+    '.parquet': 'read_parquet',
+}
+
+# CSVs larger than this are streamed in chunks with dtype narrowing
+STREAMING_THRESHOLD_BYTES = 64 * 1024 ** 2
+STREAMING_CHUNK_ROWS = 250_000
+
+# Persistent DuckDB databases built from SQL dumps, named by content hash
+DUCKDB_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'autoqueryai', 'duckdb')
+# Attached dump databases are named this plus their content hash
+_DUMP_ALIAS_PREFIX = 'dump_'
 
 def detect_file_type(file_path: str) -> str:
     _, ext = os.path.splitext(file_path)
@@ -17,11 +37,16 @@ def detect_file_type(file_path: str) -> str:
         return ext
     raise ValueError(f"Unsupported file type: {ext}")
 
-def parse_file(file_path: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+def parse_file(file_path: str, approx_distinct: bool = False,
+               progress: Optional[Callable[[float, Dict[str, Any]], None]] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
     """
     Parse the uploaded file and return a DataFrame and schema info.
+    CSVs above STREAMING_THRESHOLD_BYTES are streamed (reporting to `progress`);
+    smaller ones are read whole with plain dtypes.
     """
     ext = detect_file_type(file_path)
+    if ext == '.csv' and os.path.getsize(file_path) > STREAMING_THRESHOLD_BYTES:
+        return read_csv_streaming(file_path, progress=progress, approx_distinct=approx_distinct)
     if ext == '.csv':
         df = pd.read_csv(file_path)
     elif ext in ['.xlsx', '.xls']:
@@ -30,37 +55,246 @@ def parse_file(file_path: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
         df = pd.json_normalize(data)
+    elif ext == '.parquet':
+        df = pd.read_parquet(file_path)
     elif ext == '.sql':
-        # Use DuckDB to load SQL dump
-        con = duckdb.connect()
-        with open(file_path, 'r', encoding='utf-8') as f:
-            sql_script = f.read()
-        con.execute(sql_script)
-        tables = con.execute("SHOW TABLES").fetchall()
-        if not tables:
-            raise ValueError("No tables found in SQL dump.")
-        table_name = tables[0][0]
-        df = con.execute(f"SELECT * FROM {table_name}").df()
+        # Same database and schema (every table under 'tables') as open_sql_dump; df is the first table
+        engine = QueryEngine()
+        try:
+            schema = open_sql_dump(file_path, engine, approx_distinct)
+            df = engine.execute("SELECT * FROM data")
+        finally:
+            engine.close()
+        return df, schema
     else:
         raise ValueError(f"Unsupported file type: {ext}")
-    schema = get_schema_from_df(df)
+    schema = get_schema_from_df(df, approx_distinct)
     return df, schema
 
-def get_schema_from_df(df: pd.DataFrame) -> Dict[str, Any]:
+def read_csv_streaming(file_path: str, chunk_rows: int = STREAMING_CHUNK_ROWS,
+                       progress: Optional[Callable[[float, Dict[str, Any]], None]] = None,
+                       approx_distinct: bool = False) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Read a CSV in chunks, narrowing dtypes as it goes: integers are downcast,
+    floats become float32 where that is exact, and strings are kept in Arrow
+    buffers rather than Python objects (not categoricals, so cleaning code can
+    assign new values). Row and null counts are accumulated per chunk for
+    `progress(fraction, partial_schema)`, called after each one; the final
+    schema comes from one DuckDB pass like get_schema_from_df.
+    """
+    total_bytes = max(os.path.getsize(file_path), 1)
+    pieces: Dict[str, list] = {}
+    nulls: Dict[str, int] = {}
+    num_rows = 0
+    with open(file_path, 'rb') as f:
+        for chunk in pd.read_csv(f, chunksize=chunk_rows):
+            for col in chunk.columns:
+                series = _narrow_series(chunk[col])
+                pieces.setdefault(col, []).append(series)
+                nulls[col] = nulls.get(col, 0) + int(series.isnull().sum())
+            num_rows += len(chunk)
+            if progress is not None:
+                partial = {
+                    'columns': [
+                        {'name': col, 'dtype': str(parts[-1].dtype), 'nulls': nulls[col]}
+                        for col, parts in pieces.items()
+                    ],
+                    'num_rows': num_rows,
+                    'num_columns': len(pieces)
+                }
+                progress(min(f.tell() / total_bytes, 1.0), partial)
+    if not pieces:
+        df = pd.read_csv(file_path)
+        return df, get_schema_from_df(df, approx_distinct)
+
+    columns = {}
+    for col in list(pieces):
+        # Chunks are released column by column as they are joined
+        parts = pieces.pop(col)
+        columns[col] = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+    # copy=False: the frame takes the joined columns as they are instead of consolidating a second copy
+    df = pd.DataFrame(columns, copy=False)
+    return df, get_schema_from_df(df, approx_distinct)
+
+def _narrow_series(series: pd.Series) -> pd.Series:
+    dtype = series.dtype
+    if pd.api.types.is_integer_dtype(dtype):
+        return pd.to_numeric(series, downcast='integer')
+    if pd.api.types.is_float_dtype(dtype):
+        narrowed = series.astype('float32')
+        # Only when every value survives the round trip (NaN never compares equal, so skip it)
+        if (narrowed.astype(dtype) == series)[series.notna()].all():
+            return narrowed
+        return series
+    if pd.api.types.is_object_dtype(dtype) and pd.api.types.infer_dtype(series, skipna=True) in ('string', 'empty'):
+        return series.astype(pd.StringDtype('pyarrow'))
+    return series
+
+def get_schema_from_df(df: pd.DataFrame, approx_distinct: bool = False) -> Dict[str, Any]:
     """
     Generate schema info from a DataFrame.
+    Null and distinct counts for all columns come from one DuckDB pass over the
+    frame; set approx_distinct to use HyperLogLog estimates for wide/large tables.
     """
+    stats = None
+    if not df.columns.has_duplicates:
+        engine = QueryEngine()
+        try:
+            engine.register(df, 'schema_source')
+            stats = _column_stats(engine, 'schema_source', list(df.columns), approx_distinct)
+        except duckdb.Error:
+            pass  # column types DuckDB cannot scan
+        finally:
+            engine.close()
+    if stats is None:
+        # Duplicate column names or unscannable columns: count in pandas
+        stats = len(df), df.isnull().sum().tolist(), df.nunique().tolist()
+    num_rows, nulls, unique = stats
     schema = {
         'columns': [
             {
                 'name': col,
-                'dtype': str(df[col].dtype),
-                'nulls': int(df[col].isnull().sum()),
-                'unique': int(df[col].nunique())
+                'dtype': str(df.dtypes.iloc[i]),
+                'nulls': int(nulls[i]),
+                'unique': int(unique[i])
             }
-            for col in df.columns
+            for i, col in enumerate(df.columns)
         ],
-        'num_rows': len(df),
+        'num_rows': int(num_rows),
         'num_columns': len(df.columns)
     }
     return schema
+
+def scan_file(file_path: str, engine: QueryEngine, name: str = 'data', approx_distinct: bool = False) -> Dict[str, Any]:
+    """
+    Lazy mode: expose the file to `engine` as a DuckDB view that scans it in place.
+    No DataFrame is built; returns schema info computed by SQL over the view.
+    """
+    ext = detect_file_type(file_path)
+    if ext not in LAZY_READERS:
+        raise ValueError(f"Lazy mode is not supported for {ext} files")
+    engine.register_view(name, f"SELECT * FROM {LAZY_READERS[ext]}({quote_literal(file_path)})")
+    return get_schema_from_relation(engine, name, approx_distinct)
+
+def get_schema_from_relation(engine: QueryEngine, name: str = 'data', approx_distinct: bool = False) -> Dict[str, Any]:
+    """
+    Generate schema info for a DuckDB relation with a single aggregate query.
+    """
+    columns = engine.execute(f"DESCRIBE {quote_ident(name)}")
+    names = list(columns['column_name'])
+    num_rows, nulls, unique = _column_stats(engine, name, names, approx_distinct)
+    schema = {
+        'columns': [
+            {
+                'name': col,
+                'dtype': dtype,
+                'nulls': int(nulls[i]),
+                'unique': int(unique[i])
+            }
+            for i, (col, dtype) in enumerate(zip(names, columns['column_type']))
+        ],
+        'num_rows': int(num_rows),
+        'num_columns': len(names)
+    }
+    return schema
+
+def _column_stats(engine: QueryEngine, name: str, columns: list, approx_distinct: bool = False):
+    """
+    Row count plus per-column null and distinct counts, all in one scan.
+    """
+    distinct = "approx_count_distinct({})" if approx_distinct else "COUNT(DISTINCT {})"
+    selects = ['COUNT(*)']
+    for col in columns:
+        selects.append(f"COUNT(*) - COUNT({quote_ident(col)})")
+        selects.append(distinct.format(quote_ident(col)))
+    stats = engine.execute(f"SELECT {', '.join(selects)} FROM {quote_ident(name)}").iloc[0].tolist()
+    return stats[0], stats[1::2], stats[2::2]
+
+def file_digest(file_path: str) -> str:
+    """
+    SHA-256 of the file contents, read in 1 MB blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_sql_dump(file_path: str, cache_dir: str = DUCKDB_CACHE_DIR) -> str:
+    """
+    Run a SQL dump into a persistent DuckDB database file and return its path.
+    The file is keyed by the dump's content hash, so re-uploading the same dump
+    reuses the existing database instead of re-running the script.
+    """
+    db_path = os.path.join(cache_dir, f"{file_digest(file_path)}.duckdb")
+    if os.path.exists(db_path):
+        return db_path
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        sql_script = _mysql_to_duckdb(f.read())
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    con = duckdb.connect(tmp_path)
+    try:
+        con.execute(sql_script)
+        if not con.execute("SHOW TABLES").fetchall():
+            raise ValueError("No tables found in SQL dump.")
+    except Exception:
+        con.close()
+        os.remove(tmp_path)
+        raise
+    con.close()
+    os.replace(tmp_path, db_path)
+    return db_path
+
+def open_sql_dump(file_path: str, engine: QueryEngine, approx_distinct: bool = False,
+                  cache_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Attach a SQL dump's database to `engine` and expose every table as a view
+    under its own name; `data` points at the first table. Views of a previously
+    opened dump are dropped first. Returns the first table's schema with
+    per-table schemas under 'tables'.
+    """
+    db_path = load_sql_dump(file_path, cache_dir or DUCKDB_CACHE_DIR)
+    alias = _DUMP_ALIAS_PREFIX + os.path.splitext(os.path.basename(db_path))[0][:16]
+    tables = engine.attach(db_path, alias)
+    if not tables:
+        raise ValueError("No tables found in SQL dump.")
+    for name, relation in list(engine.relations.items()):
+        if isinstance(relation, str) and relation.startswith(f'SELECT * FROM "{_DUMP_ALIAS_PREFIX}'):
+            engine.unregister(name)
+    for table in tables:
+        engine.register_view(table, f"SELECT * FROM {quote_ident(alias)}.{quote_ident(table)}")
+    if 'data' not in tables:
+        engine.register_view('data', f"SELECT * FROM {quote_ident(alias)}.{quote_ident(tables[0])}")
+    table_schemas = {table: get_schema_from_relation(engine, table, approx_distinct) for table in tables}
+    schema = dict(table_schemas[tables[0]])
+    schema['tables'] = table_schemas
+    schema['database'] = db_path
+    return schema
+
+# Backtick identifiers and N'' literals to rewrite, plus the strings and comments
+# they must not be rewritten inside of (matched first so they are skipped whole)
+_MYSQL_TOKEN = re.compile(
+    r"(?P<ident>`(?:[^`]|``)*`)"
+    r"|(?P<nstring>\bN'(?:[^'\\]|\\.|'')*')"
+    r"|'(?:[^'\\]|\\.|'')*'"
+    r'|"(?:[^"\\]|\\.|"")*"'
+    r"|--[^\n]*|/\*.*?\*/",
+    re.DOTALL,
+)
+
+def _mysql_token_to_duckdb(match: "re.Match") -> str:
+    if match.group('ident') is not None:
+        return quote_ident(match.group('ident')[1:-1].replace('``', '`'))
+    if match.group('nstring') is not None:
+        return match.group('nstring')[1:]
+    return match.group(0)
+
+def _mysql_to_duckdb(sql_script: str) -> str:
+    """
+    Rewrite the MySQL-only bits of common dumps (backtick identifiers, N'' literals,
+    ALTER TABLE ... FOREIGN KEY) so DuckDB can run them.
+    """
+    sql_script = _MYSQL_TOKEN.sub(_mysql_token_to_duckdb, sql_script)
+    sql_script = re.sub(r"ALTER TABLE [^;]*?FOREIGN KEY[^;]*;", "", sql_script, flags=re.DOTALL)
+    return sql_script
@@ -0,0 +1,98 @@
+"""
+Content-addressed ingest cache for AutoQueryAI.
+Parsed datasets are stored as Parquet next to their schema JSON, keyed by a
+hash of the uploaded bytes, and evicted least-recently-used past a size budget.
+"""
+import os
+import json
+import hashlib
+import tempfile
+import pandas as pd
+from typing import Tuple, Dict, Any, Optional
+
+INGEST_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'autoqueryai', 'ingest')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+def content_digest(data: bytes) -> str:
+    """
+    SHA-256 of raw upload bytes (same value file_parser.file_digest gives for the file).
+    """
+    return hashlib.sha256(data).hexdigest()
+
+class IngestCache:
+    def __init__(self, cache_dir: str = INGEST_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.parquet", f"{base}.json"
+
+    def get(self, key: str) -> Optional[Tuple[pd.DataFrame, Dict[str, Any]]]:
+        data_path, schema_path = self._paths(key)
+        if not (os.path.exists(data_path) and os.path.exists(schema_path)):
+            return None
+        try:
+            df = pd.read_parquet(data_path)
+            with open(schema_path, 'r', encoding='utf-8') as f:
+                schema = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Bump recency for LRU eviction
+        os.utime(data_path)
+        os.utime(schema_path)
+        return df, schema
+
+    def put(self, key: str, df: pd.DataFrame, schema: Dict[str, Any]) -> bool:
+        """
+        Store a parsed dataset. Returns False if the frame cannot be written as Parquet.
+        """
+        data_path, schema_path = self._paths(key)
+        tmp_path = f"{data_path}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, data_path)
+            with open(schema_path, 'w', encoding='utf-8') as f:
+                json.dump(schema, f, default=str)
+        except (OSError, ValueError, TypeError, ImportError):
+            for path in (tmp_path, data_path, schema_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return False
+        self.evict(keep=key)
+        return True
+
+    def size_bytes(self) -> int:
+        return sum(size for _, _, size in self._entries())
+
+    def evict(self, keep: Optional[str] = None):
+        """
+        Drop least-recently-used entries until the cache fits in max_bytes.
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for key, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for path in self._paths(key):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.parquet'):
+                continue
+            key = name[:-len('.parquet')]
+            data_path, schema_path = self._paths(key)
+            try:
+                stat = os.stat(data_path)
+                size = stat.st_size + (os.path.getsize(schema_path) if os.path.exists(schema_path) else 0)
+            except OSError:
+                continue
+            entries.append((key, stat.st_mtime, size))
+        return entries
@@ -1,9 +1,158 @@
 """
 Query executor for AutoQueryAI. Uses DuckDB for SQL execution.
 """
+import threading
+import contextlib
 import duckdb
 import pandas as pd
-from typing import Any
+from typing import Any, Dict, List, Optional
+from core.result_cache import ResultCache, canonicalize_sql, is_cacheable
+from core.sandbox import SandboxPool
+
+_COW_BUILTIN = int(pd.__version__.split('.')[0]) >= 3
+
+def enable_copy_on_write():
+    """
+    Turn on pandas copy-on-write for the whole process (always on from pandas
+    3.0). Called once by the app at startup and by sandbox workers.
+    """
+    if not _COW_BUILTIN:
+        pd.set_option('mode.copy_on_write', True)
+
+def copy_on_write():
+    """
+    Context manager enabling copy-on-write only for the enclosed block.
+    """
+    return contextlib.nullcontext() if _COW_BUILTIN else pd.option_context('mode.copy_on_write', True)
+
+def cow_view(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copy of df that shares every column buffer; a column is only copied when
+    code writes to it. Only safe while copy-on-write is on: create and use
+    it inside copy_on_write() (or after enable_copy_on_write()).
+    """
+    return df.copy(deep=False)
+
+class QueryTimeout(TimeoutError):
+    """
+    A query was interrupted because it ran past its timeout or was cancelled.
+    """
+
+def quote_ident(name: str) -> str:
+    """
+    Quote a table or column name for use in DuckDB SQL.
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+def quote_literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+class QueryEngine:
+    """
+    Long-lived DuckDB session for one user.
+
+    Owns a single connection and the relations registered on it, so follow-up
+    questions reuse the same catalog instead of reconnecting per query.
+    """
+    def __init__(self, database: str = ':memory:', result_cache: Optional[ResultCache] = None):
+        self.database = database
+        self.con = duckdb.connect(database)
+        self.relations: Dict[str, Any] = {}
+        # Bumped whenever a relation changes; part of every result cache key
+        self.version = 0
+        self.result_cache = result_cache
+        self._lock = threading.Lock()
+
+    def register(self, df: pd.DataFrame, name: str = 'data'):
+        """
+        Expose a DataFrame as a view named `name`. DuckDB scans the pandas
+        buffers directly, so (re-)registering does not copy the data.
+        """
+        with self._lock:
+            self._drop(name)
+            self.con.register(name, df)
+            self.relations[name] = df
+            self._bump_version()
+
+    def register_view(self, name: str, select_sql: str):
+        """
+        Expose an arbitrary SELECT (e.g. a read_csv_auto scan) as a view named `name`.
+        Nothing is materialized; every query re-scans the source.
+        """
+        with self._lock:
+            self._drop(name)
+            self.con.execute(f"CREATE VIEW {quote_ident(name)} AS {select_sql}")
+            self.relations[name] = select_sql
+            self._bump_version()
+
+    def attach(self, db_path: str, alias: str) -> List[str]:
+        """
+        Attach a DuckDB database file read-only and return its table names.
+        Attaching the same alias twice is a no-op.
+        """
+        with self._lock:
+            self.con.execute(f"ATTACH IF NOT EXISTS {quote_literal(db_path)} AS {quote_ident(alias)} (READ_ONLY)")
+            rows = self.con.execute(
+                "SELECT table_name FROM duckdb_tables() WHERE database_name = ? ORDER BY table_name", [alias]
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def unregister(self, name: str = 'data'):
+        with self._lock:
+            self._drop(name)
+            self._bump_version()
+
+    def _bump_version(self):
+        self.version += 1
+        if self.result_cache is not None:
+            self.result_cache.invalidate(self.version)
+
+    def _drop(self, name: str):
+        relation = self.relations.pop(name, None)
+        if isinstance(relation, str):
+            self.con.execute(f"DROP VIEW IF EXISTS {quote_ident(name)}")
+        elif relation is not None:
+            self.con.unregister(name)
+
+    def execute(self, sql: str, timeout: Optional[float] = None) -> pd.DataFrame:
+        """
+        Execute SQL against the registered relations.
+        Read-only, deterministic queries are served from the result cache when one is set.
+        With a timeout the query is interrupted (QueryTimeout) after that many seconds.
+        """
+        key = None
+        if self.result_cache is not None:
+            canonical = canonicalize_sql(sql)
+            if is_cacheable(canonical):
+                key = (canonical, self.version)
+                cached = self.result_cache.get(key)
+                if cached is not None:
+                    return cached
+        timer = threading.Timer(timeout, self.cancel) if timeout else None
+        try:
+            with self._lock:
+                if timer is not None:
+                    timer.start()
+                result = self.con.execute(sql).df()
+        except duckdb.InterruptException as e:
+            raise QueryTimeout(f"Query interrupted after {timeout}s" if timeout else "Query cancelled") from e
+        finally:
+            if timer is not None:
+                timer.cancel()
+        if key is not None and key[1] == self.version:
+            self.result_cache.put(key, result)
+        return result
+
+    def cancel(self):
+        """
+        Interrupt the query currently running on this engine (safe from any thread).
+        """
+        self.con.interrupt()
+
+    def close(self):
+        with self._lock:
+            self.relations.clear()
+            self.con.close()
 
 def execute_sql(df: pd.DataFrame, sql: str) -> pd.DataFrame:
     """
@@ -15,11 +164,15 @@ def execute_sql(df: pd.DataFrame, sql: str) -> pd.DataFrame:
     con.close()
     return result
 
-def execute_pandas_code(df: pd.DataFrame, code: str) -> Any:
+def execute_pandas_code(df: pd.DataFrame, code: str, sandbox: Optional[SandboxPool] = None) -> Any:
     """
     Execute pandas code string in a restricted namespace.
     Returns the result of the last expression.
+    With a sandbox pool the code runs in a resource-limited worker process.
     """
-    local_vars = {'df': df.copy()}
-    exec(code, {}, local_vars)
+    if sandbox is not None:
+        return sandbox.run(code, df, outputs=('result', 'df'))
+    with copy_on_write():
+        local_vars = {'df': cow_view(df)}
+        exec(code, {}, local_vars)
     return local_vars.get('result', local_vars.get('df'))
@@ -0,0 +1,123 @@
+"""
+Guardrails for generated SQL: EXPLAIN-based cardinality estimates, a display
+LIMIT, optional TABLESAMPLE execution and a per-query timeout.
+"""
+import re
+import json
+from typing import Any, Dict, List, Optional
+from core.query_executor import QueryEngine, quote_ident
+from core.result_cache import canonicalize_sql
+
+_LEADING_WITH = re.compile(r"^\s*with(\s+recursive)?\s", re.IGNORECASE)
+# Only plain queries are planned, limited and sampled; DESCRIBE/SUMMARIZE etc. run as-is
+_GUARDED_START = ('select', 'with', 'from', '(')
+# Operators that consume their whole input before emitting rows; a LIMIT doesn't cut their work short
+_BLOCKING = re.compile(r"AGGREGATE|GROUP_BY|ORDER_BY|TOP_N|WINDOW|JOIN|CROSS_PRODUCT|DISTINCT")
+
+def _node_rows(node: Dict[str, Any]) -> int:
+    """
+    Estimated output rows of a plan node. Cross products carry no estimate
+    in DuckDB's plan, so their children are multiplied.
+    """
+    children = [_node_rows(child) for child in node.get('children', [])]
+    if node.get('name') == 'CROSS_PRODUCT':
+        rows = 1
+        for child in children:
+            rows *= child
+        return rows
+    estimate = node.get('extra_info', {}).get('Estimated Cardinality') if isinstance(node.get('extra_info'), dict) else None
+    if estimate is not None:
+        return int(estimate)
+    return max(children, default=0)
+
+def _plan_nodes(node: Dict[str, Any]) -> List[Dict[str, Any]]:
+    nodes = [node]
+    for child in node.get('children', []):
+        nodes.extend(_plan_nodes(child))
+    return nodes
+
+def explain(engine: QueryEngine, sql: str) -> Dict[str, Any]:
+    """
+    Plan summary from EXPLAIN: estimated output rows, the largest estimated
+    input to a blocking operator (join, aggregate, sort, ...), and whether the
+    plan contains a cross product.
+    """
+    plan = json.loads(engine.execute(f"EXPLAIN (FORMAT json) {sql}")['explain_value'].iloc[0])
+    roots = plan if isinstance(plan, list) else [plan]
+    nodes = [node for root in roots for node in _plan_nodes(root)]
+    return {
+        'estimated_rows': max((_node_rows(root) for root in roots), default=0),
+        'blocking_rows': max((_node_rows(child) for node in nodes if _BLOCKING.search(node.get('name', ''))
+                              for child in node.get('children', [])), default=0),
+        'cross_product': any(node.get('name') == 'CROSS_PRODUCT' for node in nodes),
+    }
+
+def limit_sql(sql: str, limit: int) -> str:
+    """
+    Cap a query's result at `limit` rows; a tighter LIMIT in the query still wins.
+    """
+    return f"SELECT * FROM (\n{sql.rstrip().rstrip(';')}\n) AS limited LIMIT {int(limit)}"
+
+def sample_sql(sql: str, tables: List[str], percent: float) -> str:
+    """
+    Run sql over a TABLESAMPLE of each of `tables` by shadowing them with CTEs.
+    """
+    if not tables:
+        return sql
+    ctes = ', '.join(
+        f"{quote_ident(table)} AS (SELECT * FROM {quote_ident(table)} TABLESAMPLE {float(percent)}%)" for table in tables
+    )
+    match = _LEADING_WITH.match(sql)
+    if match:
+        return f"{sql[:match.end()]}{ctes}, {sql[match.end():]}"
+    return f"WITH {ctes}\n{sql}"
+
+class QueryGuard:
+    """
+    Runs generated SQL safely on a QueryEngine.
+
+    The query is EXPLAINed first; results are capped at `display_limit` rows
+    (one extra row is fetched to detect truncation). With `auto_sample` on,
+    a query whose join, aggregate or sort is estimated to consume more than
+    `sample_threshold` rows runs on a TABLESAMPLE of the tables it reads.
+    Sampling is off by default: counts and sums from a sample are only a
+    fraction of the true totals.
+    """
+    def __init__(self, engine: QueryEngine, display_limit: int = 1000, timeout: Optional[float] = 30.0,
+                 sample_threshold: int = 50_000_000, sample_percent: float = 10.0, auto_sample: bool = False):
+        self.engine = engine
+        self.auto_sample = auto_sample
+        self.display_limit = display_limit
+        self.timeout = timeout
+        self.sample_threshold = sample_threshold
+        self.sample_percent = sample_percent
+
+    def referenced_tables(self, sql: str) -> List[str]:
+        lowered = sql.lower()
+        return [name for name in self.engine.relations
+                if re.search(rf'(?<![\w.]){re.escape(name.lower())}(?![\w])', lowered)]
+
+    def run(self, sql: str, sample: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Execute sql under the guardrails. sample: None decides from the plan
+        when auto_sample is on (never samples otherwise), True always samples,
+        False never does. Returns the result DataFrame
+        plus what the guard did ('truncated', 'sampled', plan estimates).
+        """
+        if not canonicalize_sql(sql).startswith(_GUARDED_START):
+            result = self.engine.execute(sql, timeout=self.timeout)
+            return {'df': result, 'truncated': False, 'sampled': False, 'sql': sql,
+                    'estimated_rows': len(result), 'blocking_rows': 0, 'cross_product': False}
+        plan = explain(self.engine, sql)
+        if sample is None:
+            sample = self.auto_sample and plan['blocking_rows'] > self.sample_threshold
+        executed = sample_sql(sql, self.referenced_tables(sql), self.sample_percent) if sample else sql
+        result = self.engine.execute(limit_sql(executed, self.display_limit + 1), timeout=self.timeout)
+        truncated = len(result) > self.display_limit
+        return {
+            'df': result.iloc[:self.display_limit] if truncated else result,
+            'truncated': truncated,
+            'sampled': bool(sample),
+            'sql': executed,
+            **plan
+        }
@@ -0,0 +1,89 @@
+"""
+Query result cache for AutoQueryAI.
+Results are held as Arrow tables keyed by canonical SQL and dataset version,
+with LRU eviction once the byte budget is exceeded.
+"""
+import re
+import threading
+import pandas as pd
+import pyarrow as pa
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+_QUOTED = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+# Queries whose result can change without the data changing are never cached
+_VOLATILE = re.compile(r"\b(random|now|current_date|current_time|current_timestamp|gen_random_uuid|uuid|setseed)\b")
+_CACHEABLE_START = ('select', 'with', 'from', 'summarize', 'describe', 'show')
+
+def canonicalize_sql(sql: str) -> str:
+    """
+    Lowercase and collapse whitespace outside quoted literals/identifiers,
+    drop comments and trailing semicolons.
+    """
+    parts = []
+    last = 0
+    for match in _QUOTED.finditer(sql):
+        parts.append(' '.join(_COMMENTS.sub(' ', sql[last:match.start()]).lower().split()))
+        parts.append(match.group(0))
+        last = match.end()
+    parts.append(' '.join(_COMMENTS.sub(' ', sql[last:]).lower().split()))
+    return ' '.join(part for part in parts if part).rstrip('; ')
+
+def is_cacheable(canonical_sql: str) -> bool:
+    unquoted = _QUOTED.sub('', canonical_sql)
+    return canonical_sql.startswith(_CACHEABLE_START) and not _VOLATILE.search(unquoted) and ';' not in unquoted
+
+class ResultCache:
+    def __init__(self, max_bytes: int = 256 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Tuple[str, int], pa.Table]" = OrderedDict()
+        self.bytes_held = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, int]) -> Optional[pd.DataFrame]:
+        with self._lock:
+            table = self.entries.get(key)
+            if table is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return table.to_pandas()
+
+    def put(self, key: Tuple[str, int], df: pd.DataFrame):
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowException, TypeError, ValueError):
+            return
+        if table.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self.entries:
+                self.bytes_held -= self.entries.pop(key).nbytes
+            self.entries[key] = table
+            self.bytes_held += table.nbytes
+            while self.bytes_held > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes_held -= evicted.nbytes
+
+    def invalidate(self, version: Optional[int] = None):
+        """
+        Drop every entry, or only those computed against an older dataset version.
+        """
+        with self._lock:
+            for key in list(self.entries):
+                if version is None or key[1] < version:
+                    self.bytes_held -= self.entries.pop(key).nbytes
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes_held': self.bytes_held,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
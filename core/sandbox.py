@@ -0,0 +1,269 @@
+"""
+Sandboxed execution of LLM-generated pandas/plotly code.
+
+Code runs in a warm pool of worker processes under CPU-time and memory limits,
+so a runaway snippet kills a worker instead of the Streamlit server. Input
+frames are written once as Arrow IPC files in shared memory and memory-mapped
+by the workers; DataFrame results come back the same way, figures as plotly JSON
+and plain values as JSON. Nothing from a worker is ever unpickled in the parent.
+"""
+import os
+import json
+import uuid
+import queue
+import pickle
+import shutil
+import signal
+import tempfile
+import threading
+import traceback
+import weakref
+import multiprocessing
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, only the wall-clock timeout applies
+    resource = None
+
+SHARED_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+def _shared_path(nbytes: int, suffix: str) -> str:
+    # /dev/shm is often tiny in containers (64 MB in Docker); spill to disk when it won't fit
+    directory = SHARED_DIR
+    if shutil.disk_usage(directory).free < nbytes * 1.2:
+        directory = tempfile.gettempdir()
+    return os.path.join(directory, f"autoqueryai-{uuid.uuid4().hex}{suffix}")
+
+class SandboxError(Exception):
+    """
+    The sandboxed code raised, or its worker died (e.g. CPU or memory limit).
+    """
+
+class SandboxTimeout(SandboxError):
+    """
+    The sandboxed code ran past the wall-clock timeout; its worker was killed.
+    """
+
+def _write_arrow(df: pd.DataFrame) -> Optional[str]:
+    """
+    Write df as an Arrow IPC file in shared memory; None if Arrow can't hold it
+    (e.g. mixed-type object columns).
+    """
+    try:
+        table = pa.Table.from_pandas(df)
+    except (pa.ArrowException, TypeError, ValueError):
+        return None
+    path = _shared_path(table.nbytes, '.arrow')
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return path
+
+def _encode_result(value: Any) -> Tuple[str, Any]:
+    """
+    Serialize a result in a form the parent can load without running code:
+    Arrow IPC for frames, plotly JSON for figures, JSON for plain values.
+    """
+    if isinstance(value, pd.Series):
+        value = value.to_frame()
+    if isinstance(value, pd.DataFrame):
+        path = _write_arrow(value)
+        if path is None:
+            # Mixed-type object columns: Arrow needs one type per column
+            mixed = {col: str for col in value.columns if value[col].dtype == object}
+            path = _write_arrow(value.astype(mixed))
+        if path is not None:
+            return 'arrow', path
+        raise TypeError("DataFrame result could not be converted to Arrow")
+    if hasattr(value, 'to_plotly_json') and hasattr(value, 'to_json'):
+        return 'figure', value.to_json()
+    if isinstance(value, np.generic):
+        value = value.item()
+    try:
+        return 'json', json.dumps(value, allow_nan=True)
+    except (TypeError, ValueError):
+        raise TypeError(f"Unsupported result type {type(value).__name__}: return a DataFrame, "
+                        "Series, plotly figure or plain value") from None
+
+def _is_result_path(path: Any) -> bool:
+    # Only files the worker could have created with _shared_path; never delete anything else
+    return (isinstance(path, str) and os.path.dirname(path) in (SHARED_DIR, tempfile.gettempdir())
+            and os.path.basename(path).startswith('autoqueryai-') and path.endswith('.arrow'))
+
+def _decode_result(kind: str, payload: Any) -> Any:
+    if kind == 'arrow':
+        if not _is_result_path(payload):
+            raise SandboxError("Sandbox returned an unexpected result path")
+        try:
+            return _load_shared(payload)
+        finally:
+            os.remove(payload)
+    if kind == 'figure':
+        import plotly.io as pio
+        return pio.from_json(payload)
+    if kind == 'json':
+        return json.loads(payload)
+    raise SandboxError(f"Unexpected result encoding from sandbox: {kind}")
+
+def _load_shared(path: str, zero_copy: bool = False) -> pd.DataFrame:
+    if path.endswith('.pkl'):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    if zero_copy:
+        # Null-free numeric columns become read-only views of the memory-mapped file;
+        # only hand these out through cow_view so writes copy instead of failing
+        return table.to_pandas(split_blocks=True)
+    return table.to_pandas()
+
+def _set_limits(memory_mb: Optional[int]):
+    if resource is None or not memory_mb:
+        return
+    # RLIMIT_DATA caps heap allocations but not the memory-mapped inputs
+    limit = memory_mb * 1024 ** 2
+    resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+
+def _worker_main(conn, memory_mb: Optional[int]):
+    from core.query_executor import cow_view, enable_copy_on_write
+    enable_copy_on_write()  # dedicated process: every frame handed to code is a cow_view
+    _set_limits(memory_mb)
+    # Last shared input, kept so repeated questions on one dataset skip the load
+    cached_path, cached_frame = None, None
+    try:
+        import plotly.express  # noqa: F401  (warm import for chart code)
+    except ImportError:
+        pass
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        code, path, input_name, outputs, cpu_seconds = task
+        if resource is not None and cpu_seconds:
+            # RLIMIT_CPU is cumulative per process: allow cpu_seconds more for this task
+            used = resource.getrusage(resource.RUSAGE_SELF)
+            soft = int(used.ru_utime + used.ru_stime) + cpu_seconds
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, resource.getrlimit(resource.RLIMIT_CPU)[1]))
+        try:
+            if path and path != cached_path:
+                cached_path, cached_frame = None, None
+                cached_frame = _load_shared(path, zero_copy=True)
+                cached_path = path
+            local_vars = {input_name: cow_view(cached_frame) if path else None}
+            exec(code, {}, local_vars)
+            value = next((local_vars[name] for name in outputs if name in local_vars), None)
+            reply = ('ok',) + _encode_result(value)
+        except BaseException as e:
+            reply = ('error', f"{type(e).__name__}: {e}", traceback.format_exc(limit=5))
+        # Replies are JSON bytes, not pickles: code in the worker could reach this pipe
+        conn.send_bytes(json.dumps(reply).encode('utf-8'))
+
+class _Worker:
+    def __init__(self, context, memory_mb: Optional[int]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class SandboxPool:
+    """
+    Warm pool of sandbox worker processes shared by all sessions.
+
+    run() blocks until a worker is free. A worker that times out, exceeds its
+    CPU/memory limits or crashes is replaced. Shared frames are treated as
+    immutable: mutate a copy and share that instead.
+    """
+    def __init__(self, workers: int = 2, cpu_seconds: int = 20, memory_mb: Optional[int] = 2048,
+                 timeout: float = 30.0):
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.timeout = timeout
+        # spawn: forking a multi-threaded Streamlit server is unsafe
+        self._context = multiprocessing.get_context('spawn')
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._shared: Dict[int, Tuple[weakref.ref, str]] = {}
+        # Re-entrant: a finalizer may release a shared frame while share() holds the lock
+        self._lock = threading.RLock()
+        for _ in range(workers):
+            self._idle.put(_Worker(self._context, memory_mb))
+
+    def share(self, df: pd.DataFrame) -> str:
+        """
+        Write df once to shared memory (Arrow IPC, pickle if Arrow can't hold it)
+        and return the path workers load it from. The file lives as long as df does.
+        """
+        with self._lock:
+            entry = self._shared.get(id(df))
+            if entry is not None and entry[0]() is df:
+                return entry[1]
+            path = _write_arrow(df)
+            if path is None:
+                path = _shared_path(int(df.memory_usage(deep=True).sum()), '.pkl')
+                with open(path, 'wb') as f:
+                    pickle.dump(df, f)
+            self._shared[id(df)] = (weakref.ref(df), path)
+            weakref.finalize(df, self._release, id(df), path)
+            return path
+
+    def _release(self, key: int, path: str):
+        with self._lock:
+            entry = self._shared.get(key)
+            if entry is not None and entry[1] == path:
+                del self._shared[key]
+            if os.path.exists(path):
+                os.remove(path)
+
+    def run(self, code: str, df: Optional[pd.DataFrame] = None, input_name: str = 'df',
+            outputs: Sequence[str] = ('result', 'df'), timeout: Optional[float] = None) -> Any:
+        """
+        Execute code with df bound to `input_name` and return the first of
+        `outputs` it defines (None if none). Raises SandboxError/SandboxTimeout.
+        """
+        path = self.share(df) if df is not None else None
+        worker = self._idle.get()
+        if not worker.process.is_alive():
+            # Died while idle (e.g. killed by the OOM killer): the task has not started, so use a fresh one
+            worker.kill()
+            worker = _Worker(self._context, self.memory_mb)
+        try:
+            try:
+                worker.conn.send((code, path, input_name, tuple(outputs), self.cpu_seconds))
+                finished = worker.conn.poll(timeout or self.timeout)
+                raw_reply = worker.conn.recv_bytes() if finished else None
+            except (BrokenPipeError, EOFError, OSError):
+                # Died during this task or an earlier one (rlimit, OOM kill): replace it
+                worker.kill()
+                exit_code = worker.process.exitcode
+                worker = _Worker(self._context, self.memory_mb)
+                if exit_code == -getattr(signal, 'SIGXCPU', 0):
+                    raise SandboxError(f"Code exceeded the {self.cpu_seconds}s CPU time limit")
+                raise SandboxError(f"Sandbox worker died (exit code {exit_code})")
+            if not finished:
+                worker.kill()
+                worker = _Worker(self._context, self.memory_mb)
+                raise SandboxTimeout(f"Code did not finish within {timeout or self.timeout:.0f}s")
+        finally:
+            self._idle.put(worker)
+        try:
+            reply = json.loads(raw_reply)
+        except ValueError:
+            reply = None
+        if not isinstance(reply, list) or not reply or reply[0] not in ('ok', 'error'):
+            raise SandboxError("Malformed reply from sandbox worker")
+        if reply[0] == 'error':
+            raise SandboxError(reply[1])
+        return _decode_result(reply[1], reply[2])
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get().kill()
+        for key, (_, path) in list(self._shared.items()):
+            self._release(key, path)
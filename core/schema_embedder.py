@@ -1,15 +1,82 @@
 """
 Schema Embedder: Chunks, embeds, and retrieves relevant schema context for RAG.
+Works offline with the local HashingEmbeddings backend; FAISS indexes are
+persisted on disk keyed by a fingerprint of the schema chunks and backend.
 """
-import faiss
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores import FAISS
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import os
+import re
+import json
+import hashlib
+import tempfile
+import numpy as np
+from typing import Dict, List, Optional
+
+SCHEMA_INDEX_DIR = os.path.join(tempfile.gettempdir(), 'autoqueryai', 'schema_index')
+
+class HashingEmbeddings:
+    """
+    Local, CPU-only embeddings: hashed word and character-trigram counts with
+    sublinear TF, optional IDF weights fitted on the corpus, L2-normalized.
+    Implements the LangChain embed_documents/embed_query interface.
+    """
+    def __init__(self, n_features: int = 1024):
+        self.n_features = n_features
+        self.idf: Optional[np.ndarray] = None
+
+    @property
+    def name(self) -> str:
+        return f"hashing-{self.n_features}"
+
+    def _features(self, text: str) -> List[str]:
+        text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text).lower().replace('_', ' ')
+        words = re.findall(r"[a-z0-9]+", text)
+        grams = [w[i:i + 3] for w in words for i in range(max(len(w) - 2, 1))]
+        return words + grams
+
+    def _counts(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.n_features), dtype='float32')
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                bucket = int.from_bytes(hashlib.md5(feature.encode('utf-8')).digest()[:4], 'little') % self.n_features
+                matrix[row, bucket] += 1
+        return matrix
+
+    def fit(self, texts: List[str]):
+        counts = self._counts(texts)
+        df = (counts > 0).sum(axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype('float32')
+        return self
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        matrix = np.log1p(self._counts(texts))
+        if self.idf is not None:
+            matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+def get_embedding_backend(backend: str = 'local'):
+    """
+    'local' (HashingEmbeddings, offline) or 'openai' (LangChain OpenAIEmbeddings).
+    """
+    if backend == 'local':
+        return HashingEmbeddings()
+    if backend == 'openai':
+        from langchain.embeddings import OpenAIEmbeddings
+        return OpenAIEmbeddings()
+    raise ValueError(f"Unknown embedding backend: {backend}")
 
 class SchemaEmbedder:
-    def __init__(self, embedding_model=None):
-        self.embedding_model = embedding_model or OpenAIEmbeddings()
-        self.vectorstore = None
+    def __init__(self, embedding_model=None, index_dir: Optional[str] = SCHEMA_INDEX_DIR, batch_size: int = 64):
+        self.embedding_model = embedding_model or HashingEmbeddings()
+        self.index_dir = index_dir
+        self.batch_size = batch_size
+        self.index = None
         self.chunks = []
 
     def chunk_schema(self, schema_dict, chunk_size=5):
@@ -22,13 +89,60 @@ class SchemaEmbedder:
         self.chunks = chunks
         return chunks
 
+    def fingerprint(self) -> str:
+        backend = getattr(self.embedding_model, 'name', type(self.embedding_model).__name__)
+        payload = json.dumps({'backend': backend, 'chunks': self.chunks})
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed in batches, returning an L2-normalized float32 matrix.
+        """
+        if hasattr(self.embedding_model, 'embed_array'):
+            vectors = np.concatenate([self.embedding_model.embed_array(texts[i:i + self.batch_size])
+                                      for i in range(0, len(texts), self.batch_size)])
+        else:
+            vectors = np.asarray([vector for i in range(0, len(texts), self.batch_size)
+                                  for vector in self.embedding_model.embed_documents(texts[i:i + self.batch_size])],
+                                 dtype='float32')
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.where(norms == 0, 1, norms)).astype('float32')
+
     def embed_chunks(self):
+        """
+        Build the FAISS index for the current chunks, or reload it from disk if
+        an index for the same chunks and backend was saved before.
+        """
+        import faiss
         if not self.chunks:
             raise ValueError("No schema chunks to embed.")
-        self.vectorstore = FAISS.from_texts(self.chunks, self.embedding_model)
+        path = os.path.join(self.index_dir, self.fingerprint()) if self.index_dir else None
+        if path and os.path.exists(f"{path}.faiss"):
+            self.index = faiss.read_index(f"{path}.faiss")
+            if os.path.exists(f"{path}.idf.npy"):
+                self.embedding_model.idf = np.load(f"{path}.idf.npy")
+            return
+        if hasattr(self.embedding_model, 'fit'):
+            self.embedding_model.fit(self.chunks)
+        vectors = self.embed_texts(self.chunks)
+        self.index = faiss.IndexFlatIP(vectors.shape[1])
+        self.index.add(vectors)
+        if path:
+            os.makedirs(self.index_dir, exist_ok=True)
+            if getattr(self.embedding_model, 'idf', None) is not None:
+                np.save(f"{path}.idf.npy", self.embedding_model.idf)
+            faiss.write_index(self.index, f"{path}.faiss.tmp")
+            os.replace(f"{path}.faiss.tmp", f"{path}.faiss")
 
     def retrieve(self, query, k=3):
-        if not self.vectorstore:
+        if self.index is None:
             raise ValueError("Vectorstore not initialized.")
-        docs = self.vectorstore.similarity_search(query, k=k)
-        return [doc.page_content for doc in docs]
+        _, ids = self.index.search(self.embed_texts([query]), min(k, self.index.ntotal))
+        return [self.chunks[i] for i in ids[0] if i >= 0]
+
+def schema_to_tables(schema: Dict) -> Dict[str, List[str]]:
+    """
+    Convert app schema info (see file_parser.get_schema_from_df) to {table: [columns]}.
+    """
+    tables = schema.get('tables') or {'data': schema}
+    return {table: [col['name'] for col in table_schema.get('columns', [])] for table, table_schema in tables.items()}
@@ -2,8 +2,16 @@
 Schema handler for AutoQueryAI.
 Handles schema preview, ERD, and profiling summary generation.
 """
+import re
+import json
+import hashlib
+import threading
 import pandas as pd
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+from core.query_executor import QueryEngine, quote_ident
+
+# DuckDB column types that get quantiles in the per-column profile
+_NUMERIC_TYPE = re.compile(r"INT|FLOAT|DOUBLE|DECIMAL|REAL|NUMERIC", re.IGNORECASE)
 
 def preview_schema(schema: Dict[str, Any]) -> str:
     """
@@ -13,8 +21,25 @@ def preview_schema(schema: Dict[str, Any]) -> str:
     for col in schema['columns']:
         lines.append(f"- {col['name']} ({col['dtype']}), unique: {col['unique']}, nulls: {col['nulls']}")
     lines.append(f"Rows: {schema['num_rows']}")
+    if schema.get('tables'):
+        lines.append(f"Tables ({len(schema['tables'])}):")
+        for table, table_schema in schema['tables'].items():
+            lines.append(f"- {table}: {table_schema['num_columns']} columns, {table_schema['num_rows']} rows")
     return '\n'.join(lines)
 
+def schema_fingerprint(schema: Dict[str, Any]) -> str:
+    """
+    Stable hash of table/column names and dtypes (ignores row and null counts).
+    """
+    if not schema:
+        return ''
+    tables = schema.get('tables') or {'data': schema}
+    layout = {
+        table: [(col['name'], col['dtype']) for col in table_schema.get('columns', [])]
+        for table, table_schema in sorted(tables.items())
+    }
+    return hashlib.sha1(json.dumps(layout, default=str).encode('utf-8')).hexdigest()[:16]
+
 def generate_profile(df: pd.DataFrame) -> Dict[str, Any]:
     """
     Generate a simple profiling summary (can be extended with pandas-profiling).
@@ -26,3 +51,105 @@ def generate_profile(df: pd.DataFrame) -> Dict[str, Any]:
         'dtypes': df.dtypes.apply(str).to_dict()
     }
     return profile
+
+def _profile_source(name: str, sample_rows: Optional[int] = None) -> str:
+    relation = quote_ident(name)
+    if sample_rows is None:
+        return relation
+    return f"(SELECT * FROM {relation} USING SAMPLE reservoir({int(sample_rows)} ROWS) REPEATABLE (42))"
+
+def generate_profile_sql(engine: QueryEngine, name: str = 'data', sample_rows: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Same summary as generate_profile, computed by DuckDB in a single SUMMARIZE
+    pass. Tables larger than `sample_rows` are summarized from a reservoir sample.
+    """
+    relation = quote_ident(name)
+    num_rows = int(engine.execute(f"SELECT COUNT(*) AS n FROM {relation}")['n'].iloc[0])
+    sampled = sample_rows is not None and num_rows > sample_rows
+    summary = engine.execute(f"SUMMARIZE {_profile_source(name, sample_rows if sampled else None)}")
+    stats = summary.set_index('column_name')
+    profile = {
+        'head': engine.execute(f"SELECT * FROM {relation} LIMIT 5").to_dict(orient='records'),
+        'describe': stats.drop(columns=['column_type', 'null_percentage']).to_dict(orient='index'),
+        'nulls': {
+            col: int(round(float(row['null_percentage']) * int(row['count']) / 100))
+            for col, row in stats.iterrows()
+        },
+        'dtypes': stats['column_type'].to_dict(),
+        'num_rows': num_rows,
+        'sampled_rows': int(sample_rows) if sampled else None
+    }
+    return profile
+
+def column_profile(engine: QueryEngine, column: str, dtype: str = '', name: str = 'data',
+                   sample_rows: Optional[int] = None, top_k: int = 10) -> Dict[str, Any]:
+    """
+    Detailed statistics for one column: exact distinct count, most frequent
+    values and, for numeric columns, deciles.
+    """
+    source = _profile_source(name, sample_rows)
+    col = quote_ident(column)
+    details = {
+        'distinct': int(engine.execute(f"SELECT COUNT(DISTINCT {col}) AS n FROM {source}")['n'].iloc[0]),
+        'top_values': engine.execute(
+            f"SELECT {col} AS value, COUNT(*) AS count FROM {source} GROUP BY 1 ORDER BY 2 DESC, 1 LIMIT {int(top_k)}"
+        ).to_dict(orient='records')
+    }
+    if _NUMERIC_TYPE.search(dtype):
+        deciles = engine.execute(
+            f"SELECT quantile_cont({col}, [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1]) AS q FROM {source}"
+        )['q'].iloc[0]
+        details['deciles'] = None if deciles is None else [None if v is None else float(v) for v in deciles]
+    return details
+
+class ProfileCache:
+    """
+    Per-session cache of profile results keyed by relation and engine version.
+
+    The summary is computed once per dataset version; column details are only
+    computed when asked for. Entries for older versions are dropped on access.
+    """
+    def __init__(self, engine: QueryEngine, sample_rows: Optional[int] = None):
+        self.engine = engine
+        self.sample_rows = sample_rows
+        self.version = engine.version
+        self.summaries: Dict[Tuple[str, Optional[int]], Dict[str, Any]] = {}
+        self.columns: Dict[Tuple[str, Optional[int], str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _sync(self):
+        if self.version != self.engine.version:
+            self.summaries.clear()
+            self.columns.clear()
+            self.version = self.engine.version
+
+    def summary(self, name: str = 'data') -> Dict[str, Any]:
+        """
+        Cached generate_profile_sql, sampled according to `sample_rows`.
+        """
+        with self._lock:
+            self._sync()
+            key = (name, self.sample_rows)
+            if key not in self.summaries:
+                self.summaries[key] = generate_profile_sql(self.engine, name, self.sample_rows)
+            return self.summaries[key]
+
+    def column(self, column: str, name: str = 'data') -> Dict[str, Any]:
+        """
+        Cached column_profile, sampled the same way as the table summary.
+        """
+        summary = self.summary(name)
+        sampled_rows = summary['sampled_rows']
+        with self._lock:
+            key = (name, sampled_rows, column)
+            if key not in self.columns:
+                self.columns[key] = column_profile(self.engine, column, summary['dtypes'].get(column, ''), name, sampled_rows)
+            return self.columns[key]
+
+    def cached_column(self, column: str, name: str = 'data') -> Optional[Dict[str, Any]]:
+        """
+        Column details if they were already computed for this version, else None.
+        """
+        summary = self.summary(name)
+        with self._lock:
+            return self.columns.get((name, summary['sampled_rows'], column))
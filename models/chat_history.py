@@ -1,23 +1,179 @@
 """
 Chat history and memory management for AutoQueryAI.
+Persisted as an append-only JSONL journal: one message per line, fsync'd in
+batches, with only the most recent turns loaded on startup. The journal keeps
+the last max_messages and is rewritten once dropped lines make up dead_ratio of it.
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import json
 import os
+import atexit
+import threading
+import time
 
 class ChatHistory:
-    def __init__(self, history_file: str = None):
+    def __init__(self, history_file: str = None, load_last: Optional[int] = 200, fsync_every: int = 64,
+                 fsync_interval: float = 1.0, max_messages: Optional[int] = 10000, dead_ratio: float = 0.5):
         self.history: List[Dict[str, Any]] = []
         self.history_file = history_file
-        if history_file and os.path.exists(history_file):
-            with open(history_file, 'r', encoding='utf-8') as f:
-                self.history = json.load(f)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.max_messages = max_messages  # older messages are dropped on compaction (None keeps all)
+        self.dead_ratio = dead_ratio
+        self._file = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._records = 0  # lines in the journal, live or not
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        if history_file:
+            if os.path.exists(history_file):
+                self._migrate_json_array()
+                self._repair_tail()
+                self.history = self._read_tail(load_last)
+                with open(history_file, 'rb') as f:
+                    self._records = sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b''))
+            self._file = open(history_file, 'a', encoding='utf-8')
+            # The last batch is fsync'd on exit even if close() is never called
+            atexit.register(self.close)
+            with self._lock:
+                if self._needs_compaction():
+                    self._compact()
 
     def add_message(self, role: str, content: str):
-        self.history.append({'role': role, 'content': content})
-        if self.history_file:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.history, f)
+        message = {'role': role, 'content': content}
+        with self._lock:
+            self.history.append(message)
+            if self._file is None:
+                return
+            self._file.write(json.dumps(message) + '\n')
+            self._file.flush()
+            self._pending += 1
+            self._records += 1
+            if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+            elif self._timer is None:
+                # Sync this batch after fsync_interval even if no further message arrives
+                self._timer = threading.Timer(self.fsync_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            if self._needs_compaction():
+                self._compact()
 
     def get_history(self) -> List[Dict[str, Any]]:
         return self.history
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        """
+        Every persisted message, not just the tail loaded on startup.
+        """
+        with self._lock:
+            self.history = self._read_tail(None) if self.history_file else self.history
+            return self.history
+
+    def flush(self):
+        """
+        Force pending appends to disk.
+        """
+        with self._lock:
+            self._timer = None
+            if self._file is not None and self._pending:
+                self._sync()
+
+    def compact(self):
+        with self._lock:
+            if self._file is not None:
+                self._compact()
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+        atexit.unregister(self.close)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def _needs_compaction(self) -> bool:
+        # Lines past the last max_messages are dead; rewrite once they are dead_ratio of the journal
+        dead = self._records - self.max_messages if self.max_messages else 0
+        return dead > 0 and dead >= self.dead_ratio * self._records
+
+    def _compact(self):
+        # Rewrite the journal with only the last max_messages, atomically
+        messages = self._read_tail(self.max_messages)
+        tmp_path = f"{self.history_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(message) + '\n' for message in messages)
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp_path, self.history_file)
+        self._file = open(self.history_file, 'a', encoding='utf-8')
+        self._pending = 0
+        self._records = len(messages)
+        if self.max_messages:
+            self.history = self.history[-self.max_messages:]
+
+    def _migrate_json_array(self):
+        # Files written before the journal format hold a single JSON array
+        with open(self.history_file, 'r', encoding='utf-8') as f:
+            if f.read(1) != '[':
+                return
+            f.seek(0)
+            messages = json.load(f)
+        tmp_path = f"{self.history_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(message) + '\n' for message in messages)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.history_file)
+
+    def _repair_tail(self):
+        # A crash mid-append can leave a partial last line; cut it off so new appends stay parseable
+        with open(self.history_file, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return
+            position = size
+            while position > 0:
+                step = min(65536, position)
+                position -= step
+                f.seek(position)
+                newline = f.read(step).rfind(b'\n')
+                if newline >= 0:
+                    f.truncate(position + newline + 1)
+                    return
+            f.truncate(0)
+
+    def _read_tail(self, count: Optional[int]) -> List[Dict[str, Any]]:
+        """
+        Last `count` messages (all when None), reading the file backwards in blocks.
+        """
+        with open(self.history_file, 'rb') as f:
+            if count is None:
+                lines = f.read().splitlines()
+            else:
+                position = f.seek(0, os.SEEK_END)
+                data = b''
+                while position > 0 and data.count(b'\n') <= count:
+                    step = min(65536, position)
+                    position -= step
+                    f.seek(position)
+                    data = f.read(step) + data
+                lines = data.splitlines()
+                if position > 0:
+                    lines = lines[1:]  # first line may be cut mid-record
+                lines = lines[-count:] if count else []
+        return [json.loads(line) for line in lines if line.strip()]
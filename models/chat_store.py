@@ -0,0 +1,110 @@
+"""
+ChatStore: in-session chat messages indexed by message_id.
+Behaves like the list of message dicts it replaces, pairs user and assistant
+messages in O(1), and spills results/figures of older turns to disk.
+"""
+import os
+import uuid
+import shutil
+import weakref
+import tempfile
+import pandas as pd
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+CHAT_SPILL_DIR = os.path.join(tempfile.gettempdir(), 'autoqueryai', 'chat')
+# Message keys holding heavy artifacts, with how they are written to disk
+_ARTIFACTS = {'result': '.parquet', 'chart': '.json'}
+
+class ChatStore:
+    def __init__(self, spill_dir: Optional[str] = None, keep_recent: int = 5):
+        self.messages: List[Dict[str, Any]] = []
+        self.turns: Dict[int, Dict[str, Dict[str, Any]]] = {}  # message_id -> {'user': msg, 'assistant': msg}
+        self.turn_ids: List[int] = []
+        self.last_query: Optional[Dict[str, Any]] = None  # latest assistant message with SQL and a result
+        self.keep_recent = keep_recent
+        self.spill_dir = spill_dir or os.path.join(CHAT_SPILL_DIR, uuid.uuid4().hex)
+        # Spilled artifacts go when the session's store is collected or the process exits
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.spill_dir, ignore_errors=True)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.messages)
+
+    def __reversed__(self) -> Iterator[Dict[str, Any]]:
+        return reversed(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+    def append(self, msg: Dict[str, Any]):
+        self.messages.append(msg)
+        message_id = msg.get('message_id')
+        if message_id not in self.turns:
+            self.turns[message_id] = {}
+            self.turn_ids.append(message_id)
+            if len(self.turn_ids) > self.keep_recent:
+                self._spill(self.turns[self.turn_ids[-self.keep_recent - 1]].get('assistant'))
+        self.turns[message_id].setdefault(msg['role'], msg)
+        if msg['role'] == 'assistant' and msg.get('sql') and msg.get('result') is not None:
+            self.last_query = msg
+
+    def turn(self, message_id: int) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        pair = self.turns.get(message_id, {})
+        return pair.get('user'), pair.get('assistant')
+
+    def page(self, page: int, page_size: int) -> List[Tuple[int, int]]:
+        """
+        (turn number, message_id) for one page of turns, oldest first; page 0 is the newest.
+        """
+        end = max(0, len(self.turn_ids) - page * page_size)
+        start = max(0, end - page_size)
+        return [(start + offset + 1, message_id) for offset, message_id in enumerate(self.turn_ids[start:end])]
+
+    def num_pages(self, page_size: int) -> int:
+        return max(1, -(-len(self.turn_ids) // page_size))
+
+    def _spill(self, msg: Optional[Dict[str, Any]]):
+        # Move heavy artifacts to disk; the message keeps only their paths
+        if not msg:
+            return
+        for key, suffix in _ARTIFACTS.items():
+            value = msg.get(key)
+            if value is None:
+                continue
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"{msg['message_id']}-{key}{suffix}")
+            try:
+                if key == 'result':
+                    value.to_parquet(path)
+                else:
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write(value.to_json())
+            except Exception:
+                continue  # not serializable: keep it in memory
+            msg.setdefault('spilled', {})[key] = path
+            del msg[key]
+
+    def artifacts(self, msg: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        The message with spilled artifacts loaded back (the stored message is left spilled).
+        """
+        if not msg.get('spilled'):
+            return msg
+        loaded = dict(msg)
+        for key, path in msg['spilled'].items():
+            if key == 'result':
+                loaded[key] = pd.read_parquet(path)
+            else:
+                import plotly.io as pio
+                with open(path, 'r', encoding='utf-8') as f:
+                    loaded[key] = pio.from_json(f.read())
+        return loaded
+
+    def clear(self):
+        self.messages.clear()
+        self.turns.clear()
+        self.turn_ids.clear()
+        self.last_query = None
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
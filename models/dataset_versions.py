@@ -0,0 +1,192 @@
+"""
+Versioned dataset store: every cleaning step is kept as a column-level delta
+against its parent, giving undo/redo and branching without full copies.
+"""
+import hashlib
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+class DatasetVersion:
+    """
+    One node of the version tree. `rows` holds parent row positions when rows
+    were dropped or reordered, `columns` only the new or changed columns and
+    `order` the resulting column names.
+    """
+    def __init__(self, version_id: str, parent: Optional[str], description: str,
+                 columns: Dict[str, pd.Series], order: List[str], rows: Optional[np.ndarray] = None,
+                 snapshot: Optional[pd.DataFrame] = None):
+        self.id = version_id
+        self.parent = parent
+        self.description = description
+        self.columns = columns
+        self.order = order
+        self.rows = rows
+        self.snapshot = snapshot  # full frame for the root or changes a delta can't express
+        self.children: List[str] = []
+
+    def nbytes(self) -> int:
+        size = sum(int(col.memory_usage(index=False, deep=True)) for col in self.columns.values())
+        if self.rows is not None:
+            size += self.rows.nbytes
+        if self.snapshot is not None:
+            size += int(self.snapshot.memory_usage(deep=True).sum())
+        return size
+
+def _digest(*parts) -> str:
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def _series_hash(series: pd.Series) -> bytes:
+    return pd.util.hash_pandas_object(series, index=False).values.tobytes() + str(series.dtype).encode('utf-8')
+
+def _frame_hash(df: pd.DataFrame) -> bytes:
+    parts = [str(list(df.columns)).encode('utf-8'), pd.util.hash_pandas_object(df.index).values.tobytes()]
+    return b''.join(parts + [_series_hash(df.iloc[:, i]) for i in range(df.shape[1])])
+
+def _same_column(new: pd.Series, old: pd.Series) -> bool:
+    if new.dtype != old.dtype:
+        return False
+    if isinstance(new.dtype, np.dtype) and np.shares_memory(new.to_numpy(), old.to_numpy()):
+        return True  # untouched copy-on-write column
+    return new.reset_index(drop=True).equals(old.reset_index(drop=True))
+
+class DatasetVersions:
+    """
+    Version tree for one dataset. Version ids are content hashes chained from
+    the base, so the same steps on the same data give the same ids across
+    sessions (usable as cache keys). A few recently used versions are kept
+    materialized; any other version is rebuilt by replaying deltas.
+    """
+    def __init__(self, df: pd.DataFrame, base_id: Optional[str] = None, max_materialized: int = 3):
+        base_id = base_id or _digest(_frame_hash(df))
+        root = DatasetVersion(base_id, None, 'original', {}, list(df.columns), snapshot=df)
+        self.versions: Dict[str, DatasetVersion] = {base_id: root}
+        self.root = base_id
+        self.head = base_id
+        self.max_materialized = max_materialized
+        self._frames: "OrderedDict[str, pd.DataFrame]" = OrderedDict({base_id: df})
+        self._redo: List[str] = []
+
+    @property
+    def current(self) -> pd.DataFrame:
+        return self.get(self.head)
+
+    def commit(self, df: pd.DataFrame, description: str = '') -> str:
+        """
+        Record df as a child of the head and move the head to it. Committing
+        after an undo starts a new branch; the old one stays reachable by id.
+        """
+        parent = self.current
+        version = self._delta(parent, df, description)
+        if version.snapshot is None and version.rows is None and not version.columns and version.order == list(parent.columns):
+            return self.head  # nothing changed
+        if version.id not in self.versions:
+            self.versions[version.id] = version
+            self.versions[self.head].children.append(version.id)
+        self.head = version.id
+        self._redo.clear()
+        self._remember(version.id, df)
+        return version.id
+
+    def _delta(self, parent: pd.DataFrame, df: pd.DataFrame, description: str) -> DatasetVersion:
+        rows = None
+        if not df.index.equals(parent.index):
+            if parent.index.is_unique and df.index.is_unique:
+                rows = parent.index.get_indexer(df.index).astype('int64')
+            if rows is None or (rows < 0).any():
+                return self._snapshot(df, description)  # new row labels: not a selection of parent rows
+        if not df.columns.is_unique:
+            return self._snapshot(df, description)
+
+        def parent_column(col):
+            return parent[col] if rows is None else parent[col].iloc[rows]
+
+        changed = {
+            col: df[col] for col in df.columns
+            if col not in parent.columns or not _same_column(df[col], parent_column(col))
+        }
+        version_id = _digest(self.head, rows.tobytes() if rows is not None else b'', list(df.columns),
+                             *(str(name).encode('utf-8') + _series_hash(col) for name, col in changed.items()))
+        return DatasetVersion(version_id, self.head, description, changed, list(df.columns), rows)
+
+    def _snapshot(self, df: pd.DataFrame, description: str) -> DatasetVersion:
+        version_id = _digest(self.head, 'snapshot', _frame_hash(df))
+        return DatasetVersion(version_id, self.head, description, {}, list(df.columns), snapshot=df)
+
+    def get(self, version_id: str) -> pd.DataFrame:
+        """
+        Materialize any version, replaying deltas from the nearest cached ancestor.
+        """
+        chain = []
+        cursor = version_id
+        while cursor not in self._frames and self.versions[cursor].snapshot is None:
+            chain.append(self.versions[cursor])
+            cursor = self.versions[cursor].parent
+        df = self._frames[cursor] if cursor in self._frames else self.versions[cursor].snapshot
+        for version in reversed(chain):
+            if version.rows is not None:
+                df = df.iloc[version.rows]
+            else:
+                df = df.copy(deep=False)
+            for col, values in version.columns.items():
+                df[col] = values
+            df = df[version.order]
+        self._remember(version_id, df)
+        return df
+
+    def _remember(self, version_id: str, df: pd.DataFrame):
+        self._frames[version_id] = df
+        self._frames.move_to_end(version_id)
+        while len(self._frames) > self.max_materialized:
+            oldest = next(iter(self._frames))
+            if oldest == self.head:
+                self._frames.move_to_end(oldest)
+                oldest = next(iter(self._frames))
+            del self._frames[oldest]
+
+    def can_undo(self) -> bool:
+        return self.versions[self.head].parent is not None
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def undo(self) -> pd.DataFrame:
+        if not self.can_undo():
+            raise ValueError("Nothing to undo.")
+        self._redo.append(self.head)
+        self.head = self.versions[self.head].parent
+        return self.current
+
+    def redo(self) -> pd.DataFrame:
+        if not self.can_redo():
+            raise ValueError("Nothing to redo.")
+        self.head = self._redo.pop()
+        return self.current
+
+    def checkout(self, version_id: str) -> pd.DataFrame:
+        if version_id not in self.versions:
+            raise KeyError(f"Unknown dataset version: {version_id}")
+        self.head = version_id
+        self._redo.clear()
+        return self.current
+
+    def history(self) -> List[Dict[str, str]]:
+        """
+        Versions from the original to the head.
+        """
+        path = []
+        cursor = self.head
+        while cursor is not None:
+            path.append({'id': cursor, 'description': self.versions[cursor].description})
+            cursor = self.versions[cursor].parent
+        return path[::-1]
+
+    def delta_bytes(self) -> int:
+        """
+        Memory held by deltas, excluding the original frame.
+        """
+        return sum(version.nbytes() for version_id, version in self.versions.items() if version_id != self.root)
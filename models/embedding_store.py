@@ -1,17 +1,182 @@
 """
 Embedding store for schema/context RAG.
+Vectors live in one contiguous, pre-normalized float32 matrix; search is a batched
+cosine top-k with argpartition, switching to a FAISS IVF index on large stores.
 """
-from typing import Any
+import os
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+# Max elements in one (queries x vectors) score block during brute-force search
+_SCORE_BLOCK = 1 << 25
 
 class EmbeddingStore:
-    def __init__(self, embedder):
-        self.embedder = embedder
-        self.index = []
+    def __init__(self, embedder=None, dim: Optional[int] = None, ann_threshold: int = 200_000, nprobe: Optional[int] = None):
+        self.embedder = embedder  # any model with embed_documents/embed_query; optional for raw vectors
+        self.dim = dim
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe  # IVF lists probed per query; default max(8, nlist // 8)
+        self.vectors: Optional[np.ndarray] = None
+        self.ids = np.empty(0, dtype='int64')
+        self.chunks: List[Any] = []
+        self.size = 0
+        self._rows: Dict[int, int] = {}
+        self._next_id = 0
+        self._ann = None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, chunk: Any) -> int:
+        return self.add_batch([chunk])[0]
+
+    def add_batch(self, chunks: List[Any], vectors: Optional[np.ndarray] = None) -> List[int]:
+        """
+        Append chunks (embedding them in one call unless vectors are given). Returns their ids.
+        """
+        if vectors is None:
+            vectors = self.embedder.embed_documents([str(chunk) for chunk in chunks])
+        vectors = self._normalize(np.asarray(vectors, dtype='float32').reshape(len(chunks), -1))
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        self._reserve(len(chunks))
+        new_ids = np.arange(self._next_id, self._next_id + len(chunks), dtype='int64')
+        self._next_id += len(chunks)
+        end = self.size + len(chunks)
+        self.vectors[self.size:end] = vectors
+        self.ids[self.size:end] = new_ids
+        for offset, chunk_id in enumerate(new_ids):
+            self._rows[int(chunk_id)] = self.size + offset
+        self.chunks.extend(chunks)
+        self.size = end
+        if self._ann is not None:
+            self._ann.add_with_ids(vectors, new_ids)
+        return new_ids.tolist()
+
+    def delete(self, ids: Iterable[int]):
+        """
+        Remove chunks by id; the last row is moved into each freed slot.
+        """
+        # dict.fromkeys: a repeated id must only free its row once
+        ids = list(dict.fromkeys(int(i) for i in ids if int(i) in self._rows))
+        if not ids:
+            return
+        self._reserve(0)
+        for chunk_id in ids:
+            row = self._rows.pop(chunk_id)
+            last = self.size - 1
+            if row != last:
+                self.vectors[row] = self.vectors[last]
+                self.ids[row] = self.ids[last]
+                self.chunks[row] = self.chunks[last]
+                self._rows[int(self.ids[row])] = row
+            self.chunks.pop()
+            self.size = last
+        if self._ann is not None:
+            self._ann.remove_ids(np.asarray(ids, dtype='int64'))
+
+    def get(self, chunk_id: int) -> Any:
+        return self.chunks[self._rows[chunk_id]]
+
+    def search(self, query: str, k: int = 1) -> List[Any]:
+        """
+        Top-k chunks by cosine similarity to the query.
+        """
+        if not self.size:
+            return []
+        _, ids = self.search_vectors(np.asarray([self.embedder.embed_query(query)], dtype='float32'), k)
+        return [self.get(int(i)) for i in ids[0] if i >= 0]
+
+    def search_vectors(self, queries: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Batched top-k: returns (scores, ids), each shaped (num_queries, k), best first.
+        Missing results (k > size) are padded with id -1.
+        """
+        queries = self._normalize(np.asarray(queries, dtype='float32').reshape(-1, self.dim))
+        if self.size >= self.ann_threshold and self._ensure_ann():
+            return self._ann.search(queries, k)
+        return self._brute_force(queries, k)
+
+    def _brute_force(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        matrix = self.vectors[:self.size]
+        scores_out = np.full((len(queries), k), -np.inf, dtype='float32')
+        ids_out = np.full((len(queries), k), -1, dtype='int64')
+        top = min(k, self.size)
+        if top == 0:
+            return scores_out, ids_out
+        step = max(1, _SCORE_BLOCK // self.size)
+        for start in range(0, len(queries), step):
+            scores = queries[start:start + step] @ matrix.T
+            if top < self.size:
+                rows = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+            else:
+                rows = np.broadcast_to(np.arange(self.size), scores.shape)
+            best = np.take_along_axis(scores, rows, axis=1)
+            order = np.argsort(-best, axis=1)
+            scores_out[start:start + step, :top] = np.take_along_axis(best, order, axis=1)
+            ids_out[start:start + step, :top] = self.ids[np.take_along_axis(rows, order, axis=1)]
+        return scores_out, ids_out
+
+    def _ensure_ann(self) -> bool:
+        """
+        Build the FAISS IVF index on first use past the threshold (False if faiss is missing).
+        It is kept in sync incrementally by add_batch/delete afterwards.
+        """
+        if self._ann is not None:
+            return True
+        try:
+            import faiss
+        except ImportError:
+            return False
+        matrix = self.vectors[:self.size]
+        nlist = max(1, int(np.sqrt(self.size)))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatIP(self.dim), self.dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        sample = np.random.default_rng(0).choice(self.size, min(self.size, nlist * 40), replace=False)
+        index.train(np.ascontiguousarray(matrix[np.sort(sample)]))
+        index.add_with_ids(matrix, self.ids[:self.size])
+        index.nprobe = self.nprobe or max(8, nlist // 8)
+        self._ann = index
+        return True
+
+    def _reserve(self, extra: int):
+        # Grow geometrically; also copies a read-only memory-mapped matrix on first write
+        needed = self.size + extra
+        if self.vectors is not None and needed <= len(self.vectors) and self.vectors.flags.writeable:
+            return
+        capacity = max(needed, 1024, 2 * (len(self.vectors) if self.vectors is not None else 0))
+        vectors = np.empty((capacity, self.dim), dtype='float32')
+        ids = np.empty(capacity, dtype='int64')
+        if self.size:
+            vectors[:self.size] = self.vectors[:self.size]
+            ids[:self.size] = self.ids[:self.size]
+        self.vectors, self.ids = vectors, ids
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
 
-    def add(self, chunk: Any):
-        embedding = self.embedder.embed(chunk)
-        self.index.append((chunk, embedding))
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'vectors.npy'), self.vectors[:self.size] if self.size else np.empty((0, self.dim or 0), dtype='float32'))
+        np.save(os.path.join(directory, 'ids.npy'), self.ids[:self.size])
+        with open(os.path.join(directory, 'chunks.json'), 'w', encoding='utf-8') as f:
+            json.dump({'chunks': self.chunks, 'next_id': self._next_id}, f, default=str)
 
-    def search(self, query: str):
-        # Placeholder: Return most similar chunk
-        return self.index[0][0] if self.index else None
+    @classmethod
+    def load(cls, directory: str, embedder=None, mmap: bool = True, **kwargs) -> 'EmbeddingStore':
+        """
+        Load a saved store; with mmap the vectors are paged in from disk on demand.
+        """
+        vectors = np.load(os.path.join(directory, 'vectors.npy'), mmap_mode='r' if mmap else None)
+        with open(os.path.join(directory, 'chunks.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        store = cls(embedder, dim=vectors.shape[1], **kwargs)
+        store.vectors = vectors
+        store.ids = np.load(os.path.join(directory, 'ids.npy'))
+        store.chunks = meta['chunks']
+        store.size = len(store.chunks)
+        store._next_id = meta['next_id']
+        store._rows = {int(chunk_id): row for row, chunk_id in enumerate(store.ids)}
+        return store
@@ -1,23 +1,247 @@
 """
-QueryHistory: Save and retrieve previous queries, SQL, results, and explanations.
+QueryHistory: durable, searchable record of past questions, SQL, timings and results.
+Entries live in a local DuckDB catalog; result snapshots are written to Parquet
+and only a few recent ones are kept in memory.
 """
-import streamlit as st
+import os
+import re
+import json
+import uuid
+import hashlib
+import datetime
+import tempfile
+import threading
+import duckdb
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from core.result_cache import canonicalize_sql, is_cacheable
+
+QUERY_HISTORY_DIR = os.path.join(tempfile.gettempdir(), 'autoqueryai', 'history')
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.\"])\d+(?:\.\d+)?(?![\w\"])")
+# Columns returned by search(); results themselves are loaded on demand
+_FIELDS = ('id', 'created_at', 'question', 'sql', 'dataset', 'session', 'explanation', 'timings', 'result_rows', 'complete')
+
+def sql_key(sql: str) -> str:
+    """
+    Hash of the canonical SQL: equal for queries that differ only in case,
+    whitespace or comments.
+    """
+    return hashlib.sha1(canonicalize_sql(sql).encode('utf-8')).hexdigest()
+
+def sql_fingerprint(sql: str) -> str:
+    """
+    Hash of the canonical SQL with string and numeric literals replaced by '?',
+    so queries with the same shape but different constants match.
+    """
+    parts = []
+    last = 0
+    canonical = canonicalize_sql(sql)
+    for match in _STRING_LITERAL.finditer(canonical):
+        parts.append(_NUMBER_LITERAL.sub('?', canonical[last:match.start()]))
+        parts.append('?')
+        last = match.end()
+    parts.append(_NUMBER_LITERAL.sub('?', canonical[last:]))
+    return hashlib.sha1(''.join(parts).encode('utf-8')).hexdigest()
+
+def _recallable(sql: Optional[str]) -> bool:
+    # Same rule as the result cache: read-only and deterministic
+    return bool(sql) and is_cacheable(canonicalize_sql(sql))
 
 class QueryHistory:
-    def __init__(self):
-        if 'query_history' not in st.session_state:
-            st.session_state['query_history'] = []
+    def __init__(self, history_dir: str = QUERY_HISTORY_DIR, max_entries: int = 5000,
+                 max_result_rows: int = 10000, max_memory_results: int = 8):
+        self.history_dir = history_dir
+        self.results_dir = os.path.join(history_dir, 'results')
+        self.max_entries = max_entries
+        self.max_result_rows = max_result_rows
+        self.max_memory_results = max_memory_results
+        self._results: "OrderedDict[int, pd.DataFrame]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.results_dir, exist_ok=True)
+        try:
+            self._con = duckdb.connect(os.path.join(history_dir, 'history.duckdb'))
+        except duckdb.IOException:
+            # Catalog locked by another process: keep this process's history in memory
+            self._con = duckdb.connect(':memory:')
+        self._con.execute("CREATE SEQUENCE IF NOT EXISTS query_history_id")
+        self._con.execute("""
+            CREATE TABLE IF NOT EXISTS query_history (
+                id BIGINT PRIMARY KEY DEFAULT nextval('query_history_id'),
+                created_at TIMESTAMP,
+                question VARCHAR,
+                sql VARCHAR,
+                sql_key VARCHAR,
+                fingerprint VARCHAR,
+                dataset VARCHAR,
+                explanation VARCHAR,
+                timings VARCHAR,
+                result_path VARCHAR,
+                result_rows BIGINT,
+                complete BOOLEAN
+            )
+        """)
+        # Catalogs created before entries were scoped to a session
+        self._con.execute("ALTER TABLE query_history ADD COLUMN IF NOT EXISTS session VARCHAR")
+
+    def add(self, question: str, sql: str, result: Optional[pd.DataFrame] = None, explanation: Optional[str] = None,
+            timings: Optional[Dict[str, float]] = None, dataset: Optional[str] = None, complete: bool = True,
+            session: Optional[str] = None) -> int:
+        """
+        Record a query. `dataset` scopes recall to the data it ran on and
+        `session` scopes browsing (search/result) to whoever asked; `complete`
+        is False for truncated or sampled results, which are kept for display
+        but never recalled in place of running the query. Results of volatile
+        SQL (random(), now(), ...) are never complete.
+        """
+        with self._lock:
+            entry_id = self._con.execute("SELECT nextval('query_history_id')").fetchone()[0]
+            result_path = self._write_result(result)
+            stored = result is not None and result_path is not None
+            self._con.execute(
+                "INSERT INTO query_history (id, created_at, question, sql, sql_key, fingerprint, dataset, session, explanation,"
+                " timings, result_path, result_rows, complete) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [entry_id, datetime.datetime.now(), question, sql, sql_key(sql) if sql else None,
+                 sql_fingerprint(sql) if sql else None, dataset, session, explanation, json.dumps(timings or {}),
+                 result_path, len(result) if stored else None,
+                 bool(complete) and stored and len(result) <= self.max_result_rows and _recallable(sql)]
+            )
+            if stored:
+                self._cache_result(entry_id, result.head(self.max_result_rows))
+            self._prune()
+        return entry_id
+
+    def _write_result(self, result: Optional[pd.DataFrame]) -> Optional[str]:
+        if not isinstance(result, pd.DataFrame):
+            return None
+        # Unique names, not entry ids: an in-memory fallback catalog restarts its ids
+        # but shares results_dir with the on-disk one
+        path = os.path.join(self.results_dir, f"{uuid.uuid4().hex}.parquet")
+        try:
+            result.head(self.max_result_rows).to_parquet(path)
+        except (OSError, ValueError, TypeError, ImportError):
+            if os.path.exists(path):
+                os.remove(path)
+            return None  # not serializable: the entry is kept without its result
+        return path
 
-    def add(self, question, sql, result, explanation):
-        st.session_state['query_history'].append({
-            'question': question,
-            'sql': sql,
-            'result': result,
-            'explanation': explanation
-        })
+    def _cache_result(self, entry_id: int, result: pd.DataFrame):
+        self._results[entry_id] = result
+        self._results.move_to_end(entry_id)
+        while len(self._results) > self.max_memory_results:
+            self._results.popitem(last=False)
 
-    def get_all(self):
-        return st.session_state['query_history']
+    def _prune(self):
+        # Drop the oldest entries (and their result files) past max_entries
+        stale = self._con.execute(
+            "SELECT id, result_path FROM query_history ORDER BY id DESC OFFSET ?", [self.max_entries]
+        ).fetchall()
+        if not stale:
+            return
+        self._con.execute("DELETE FROM query_history WHERE id <= ?", [max(entry_id for entry_id, _ in stale)])
+        for entry_id, path in stale:
+            self._results.pop(entry_id, None)
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def _rows(self, where: str = 'TRUE', params: Optional[List[Any]] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        sql = f"SELECT {', '.join(_FIELDS)} FROM query_history WHERE {where} ORDER BY id DESC"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._con.execute(sql, params or []).fetchall()
+        entries = [dict(zip(_FIELDS, row)) for row in rows]
+        for entry in entries:
+            entry['timings'] = json.loads(entry['timings']) if entry['timings'] else {}
+        return entries
+
+    def result(self, entry_id: int, session: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        Stored result snapshot of an entry (at most max_result_rows rows), from
+        memory or Parquet; None if `session` is given and the entry is not its own.
+        """
+        with self._lock:
+            if session is None:
+                row = self._con.execute("SELECT result_path FROM query_history WHERE id = ?", [entry_id]).fetchone()
+            else:
+                row = self._con.execute("SELECT result_path FROM query_history WHERE id = ? AND session = ?",
+                                        [entry_id, session]).fetchone()
+            if row is None:
+                return None
+            cached = self._results.get(entry_id)
+            if cached is not None:
+                self._results.move_to_end(entry_id)
+                return cached
+        if not row[0] or not os.path.exists(row[0]):
+            return None
+        result = pd.read_parquet(row[0])
+        with self._lock:
+            self._cache_result(entry_id, result)
+        return result
+
+    def get(self, entry_id: int, session: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        entries = self._rows("id = ?", [entry_id])
+        if not entries or (session is not None and entries[0]['session'] != session):
+            return None
+        entries[0]['result'] = self.result(entry_id)
+        return entries[0]
+
+    def recall(self, sql: str, dataset: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Latest complete result of the same SQL on the same dataset, or None
+        (always None for volatile SQL, whose result differs on every run).
+        """
+        if not _recallable(sql):
+            return None
+        where = "sql_key = ? AND complete"
+        params = [sql_key(sql)]
+        if dataset is not None:
+            where += " AND dataset = ?"
+            params.append(dataset)
+        for entry in self._rows(where, params, limit=3):
+            entry['result'] = self.result(entry['id'])
+            if entry['result'] is not None:
+                return entry
+        return None
+
+    def search(self, text: Optional[str] = None, sql: Optional[str] = None, dataset: Optional[str] = None,
+               session: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Newest entries whose question or SQL contains every word of `text`
+        (case-insensitive) and/or whose SQL has the same fingerprint as `sql`,
+        optionally limited to one dataset and/or session.
+        Results are not loaded; use result(entry['id']).
+        """
+        clauses, params = [], []
+        for word in (text or '').split():
+            clauses.append("(question ILIKE ? OR sql ILIKE ?)")
+            pattern = f"%{word}%"
+            params += [pattern, pattern]
+        if sql:
+            clauses.append("fingerprint = ?")
+            params.append(sql_fingerprint(sql))
+        if dataset is not None:
+            clauses.append("dataset = ?")
+            params.append(dataset)
+        if session is not None:
+            clauses.append("session = ?")
+            params.append(session)
+        return self._rows(' AND '.join(clauses) or 'TRUE', params, limit)
+
+    def get_all(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._rows(limit=limit)
 
     def clear(self):
-        st.session_state['query_history'] = []
+        with self._lock:
+            paths = self._con.execute("SELECT result_path FROM query_history WHERE result_path IS NOT NULL").fetchall()
+            self._con.execute("DELETE FROM query_history")
+            self._results.clear()
+        for (path,) in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def close(self):
+        with self._lock:
+            self._con.close()
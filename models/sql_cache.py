@@ -0,0 +1,129 @@
+"""
+Cache in front of SQLAgent.nl_to_sql: normalized question + schema fingerprint +
+conversation context -> generated SQL.
+Optionally falls back to embedding similarity (FAISS) for near-duplicate questions.
+"""
+import re
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from core.schema_handler import schema_fingerprint
+
+def normalize_question(question: str) -> str:
+    """
+    Lowercase, drop punctuation and collapse whitespace.
+    """
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return ' '.join(question.split())
+
+class SQLCache:
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600, embedding_model=None,
+                 similarity_threshold: float = 0.92):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embedding_model = embedding_model
+        self.similarity_threshold = similarity_threshold
+        # (schema fingerprint, mode, context, question) -> (sql, stored_at, vector_id)
+        self.entries: "OrderedDict[Tuple[str, str, str, str], Tuple[str, float, Optional[int]]]" = OrderedDict()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._index = None
+        self._vector_keys: Dict[int, Tuple[str, str, str, str]] = {}
+        self._next_vector_id = 0
+        self._lock = threading.Lock()
+
+    def get(self, question: str, schema: Dict[str, Any], mode: str = 'sql', context: str = '') -> Optional[str]:
+        """
+        `context` identifies what else shaped the prompt (e.g. a hash of the previous
+        answer for follow-up questions); SQL is only reused within the same context.
+        """
+        key = (schema_fingerprint(schema), mode, context, normalize_question(question))
+        with self._lock:
+            sql = self._lookup(key)
+            if sql is not None:
+                self.hits += 1
+                return sql
+        # Embedding outside the lock; it may be a network call
+        vector = self._embed(key[3]) if self.embedding_model is not None else None
+        with self._lock:
+            sql = self._semantic_lookup(key, vector) if vector is not None else None
+            if sql is not None:
+                self.semantic_hits += 1
+                return sql
+            self.misses += 1
+            return None
+
+    def put(self, question: str, schema: Dict[str, Any], sql: str, mode: str = 'sql', context: str = ''):
+        key = (schema_fingerprint(schema), mode, context, normalize_question(question))
+        vector = self._embed(key[3]) if self.embedding_model is not None else None
+        with self._lock:
+            self._remove(key)
+            vector_id = self._add_vector(key, vector) if vector is not None else None
+            self.entries[key] = (sql, time.time(), vector_id)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'semantic_hits': self.semantic_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.semantic_hits) / lookups if lookups else 0.0
+        }
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self._vector_keys.clear()
+            self._index = None
+
+    def _lookup(self, key) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[1] > self.ttl_seconds:
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def _semantic_lookup(self, key, vector) -> Optional[str]:
+        if self._index is None or self._index.ntotal == 0:
+            return None
+        scores, ids = self._index.search(vector, min(8, self._index.ntotal))
+        for score, vector_id in zip(scores[0], ids[0]):
+            if score < self.similarity_threshold:
+                break
+            candidate = self._vector_keys.get(int(vector_id))
+            # Only reuse SQL generated for the same schema, output mode and context
+            if candidate is not None and candidate[:3] == key[:3]:
+                sql = self._lookup(candidate)
+                if sql is not None:
+                    return sql
+        return None
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray([self.embedding_model.embed_query(text)], dtype='float32')
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _add_vector(self, key, vector) -> int:
+        import faiss
+        if self._index is None:
+            self._index = faiss.IndexIDMap(faiss.IndexFlatIP(vector.shape[1]))
+        vector_id = self._next_vector_id
+        self._next_vector_id += 1
+        self._index.add_with_ids(vector, np.asarray([vector_id], dtype='int64'))
+        self._vector_keys[vector_id] = key
+        return vector_id
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None and entry[2] is not None:
+            self._vector_keys.pop(entry[2], None)
+            self._index.remove_ids(np.asarray([entry[2]], dtype='int64'))
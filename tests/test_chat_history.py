@@ -0,0 +1,53 @@
+import json
+import time
+from models.chat_history import ChatHistory
+
+def test_appends_and_reloads_tail(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    history = ChatHistory(path, fsync_every=10)
+    for i in range(250):
+        history.add_message('user', f"question {i}")
+    history.close()
+    reloaded = ChatHistory(path, load_last=5)
+    assert [m['content'] for m in reloaded.get_history()] == [f"question {i}" for i in range(245, 250)]
+    assert len(reloaded.load_all()) == 250
+
+def test_migrates_json_array_file(tmp_path):
+    path = tmp_path / "history.json"
+    path.write_text(json.dumps([{'role': 'user', 'content': 'hi'}, {'role': 'assistant', 'content': 'hello'}]))
+    history = ChatHistory(str(path))
+    history.add_message('user', 'again')
+    history.close()
+    assert [m['content'] for m in ChatHistory(str(path)).get_history()] == ['hi', 'hello', 'again']
+
+def test_torn_last_line_is_dropped(tmp_path):
+    path = tmp_path / "history.jsonl"
+    path.write_text('{"role": "user", "content": "ok"}\n{"role": "user", "con')
+    history = ChatHistory(str(path))
+    assert [m['content'] for m in history.get_history()] == ['ok']
+    history.add_message('user', 'next')
+    history.close()
+    assert [m['content'] for m in ChatHistory(str(path)).get_history()] == ['ok', 'next']
+
+def test_compaction_keeps_last_messages(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    history = ChatHistory(path, max_messages=10)
+    for i in range(60):
+        history.add_message('user', str(i))
+    history.close()
+    with open(path) as f:
+        lines = f.readlines()
+    # rewritten whenever half the journal is dead: never more than 2 x max_messages lines
+    assert 10 <= len(lines) < 20
+    assert json.loads(lines[-1])['content'] == '59'
+    assert len(ChatHistory(path).get_history()) == len(lines)
+
+def test_idle_batch_is_synced_without_another_message(tmp_path):
+    history = ChatHistory(str(tmp_path / "history.jsonl"), fsync_every=100, fsync_interval=0.05)
+    history.add_message('user', 'hello')
+    history.add_message('user', 'again')
+    deadline = time.monotonic() + 5
+    while history._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert history._pending == 0
+    history.close()
@@ -0,0 +1,51 @@
+import gc
+import os
+import pandas as pd
+from models.chat_store import ChatStore
+
+def _turn(store, message_id, result=None):
+    store.append({'role': 'user', 'type': 'query', 'content': f"q{message_id}", 'message_id': message_id})
+    msg = {'role': 'assistant', 'type': 'query', 'message_id': message_id, 'sql': f"SELECT {message_id}"}
+    if result is not None:
+        msg['result'] = result
+    store.append(msg)
+
+def test_pairs_turns_and_behaves_like_a_list(tmp_path):
+    store = ChatStore(spill_dir=str(tmp_path))
+    for message_id in range(1, 4):
+        _turn(store, message_id)
+    assert len(store) == 6
+    assert store[-1]['sql'] == "SELECT 3"
+    assert [msg['content'] for msg in store[-6:] if msg['role'] == 'user'] == ['q1', 'q2', 'q3']
+    user, assistant = store.turn(2)
+    assert user['content'] == 'q2' and assistant['sql'] == 'SELECT 2'
+    assert store.turn(99) == (None, None)
+
+def test_pages_newest_first(tmp_path):
+    store = ChatStore(spill_dir=str(tmp_path))
+    for message_id in range(1, 26):
+        _turn(store, message_id)
+    assert store.num_pages(10) == 3
+    assert store.page(0, 10)[0] == (16, 16) and store.page(0, 10)[-1] == (25, 25)
+    assert store.page(2, 10) == [(n, n) for n in range(1, 6)]
+
+def test_old_results_are_spilled_and_reloaded(tmp_path):
+    store = ChatStore(spill_dir=str(tmp_path), keep_recent=2)
+    for message_id in range(1, 5):
+        _turn(store, message_id, pd.DataFrame({'x': [message_id]}))
+    _, old = store.turn(1)
+    assert 'result' not in old and os.path.exists(old['spilled']['result'])
+    assert store.artifacts(old)['result']['x'].tolist() == [1]
+    assert 'result' in store.turn(4)[1]
+    assert store.last_query is store.turn(4)[1]
+    store.clear()
+    assert len(store) == 0 and not os.path.exists(str(tmp_path))
+
+def test_spill_dir_is_removed_with_the_store(tmp_path):
+    store = ChatStore(spill_dir=str(tmp_path / 'spill'), keep_recent=1)
+    for message_id in range(1, 3):
+        _turn(store, message_id, pd.DataFrame({'x': [message_id]}))
+    assert os.listdir(str(tmp_path / 'spill'))
+    del store
+    gc.collect()
+    assert not os.path.exists(str(tmp_path / 'spill'))
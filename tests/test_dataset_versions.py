@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+from core.query_executor import copy_on_write, cow_view
+from models.dataset_versions import DatasetVersions
+
+def _apply(versions, code):
+    with copy_on_write():
+        local_vars = {'df': cow_view(versions.current)}
+        exec(code, {}, local_vars)
+    return versions.commit(local_vars['df'], code)
+
+def _frame():
+    return pd.DataFrame({'a': np.arange(6.0), 'b': list('xyzxyz'), 'c': np.arange(6)})
+
+def test_deltas_store_only_changed_columns():
+    versions = DatasetVersions(_frame())
+    version_id = _apply(versions, "df['a'] = df['a'] * 2")
+    assert list(versions.versions[version_id].columns) == ['a']
+    version_id = _apply(versions, "df = df[df['c'] > 1]")
+    delta = versions.versions[version_id]
+    assert delta.columns == {} and list(delta.rows) == [2, 3, 4, 5]
+    assert list(versions.current['a']) == [4.0, 6.0, 8.0, 10.0]
+
+def test_undo_redo_and_branching():
+    df = _frame()
+    versions = DatasetVersions(df)
+    first = _apply(versions, "df['d'] = 1")
+    second = _apply(versions, "df = df.drop(columns=['b'])")
+    assert list(versions.current.columns) == ['a', 'c', 'd']
+    assert list(versions.undo().columns) == ['a', 'b', 'c', 'd']
+    assert versions.undo() is df
+    with pytest.raises(ValueError):
+        versions.undo()
+    versions.redo()
+    assert versions.head == first
+    branch = _apply(versions, "df['e'] = 2")
+    assert not versions.can_redo()
+    assert versions.versions[first].children == [second, branch]
+    assert list(versions.checkout(second).columns) == ['a', 'c', 'd']
+
+def test_version_ids_are_stable_and_replay_matches():
+    ids = []
+    finals = []
+    for _ in range(2):
+        versions = DatasetVersions(_frame(), max_materialized=1)
+        for code in ["df['a'] = df['a'] + 1", "df = df.sort_values('b')", "df.loc[df['c'] == 3, 'b'] = 'w'"]:
+            _apply(versions, code)
+        ids.append([item['id'] for item in versions.history()])
+        finals.append(versions.current)
+    assert ids[0] == ids[1] and len(ids[0]) == 4
+    versions.checkout(versions.root)
+    rebuilt = versions.get(ids[1][-1])
+    pd.testing.assert_frame_equal(rebuilt, finals[1])
+
+def test_new_rows_fall_back_to_snapshot():
+    df = _frame()
+    versions = DatasetVersions(df)
+    version_id = versions.commit(pd.concat([df, df.tail(1).rename(index={5: 6})]), 'append a row')
+    assert versions.versions[version_id].snapshot is not None
+    assert len(versions.current) == 7
+
+def test_cleaning_agent_without_versions_cannot_undo():
+    from agents.cleaning_agent import CleaningAgent
+    agent = CleaningAgent(None)
+    with pytest.raises(ValueError, match="versions"):
+        agent.undo()
+    with pytest.raises(ValueError, match="versions"):
+        agent.redo()
+
+def test_cleaning_with_mistral_and_no_op_steps():
+    from agents.cleaning_agent import CleaningAgent
+    from core.query_executor import QueryEngine
+
+    class MistralLLM:
+        def invoke(self, prompt):
+            return "df = df.dropna()"
+
+    df = _frame()
+    df.loc[0, 'a'] = np.nan
+    engine = QueryEngine()
+    engine.register(df)
+    agent = CleaningAgent(MistralLLM(), 'mistral', engine=engine, versions=DatasetVersions(df))
+    code = agent.nl_to_pandas("drop rows with missing values", list(df.columns))
+    assert code == "df = df.dropna()"
+    version = engine.version
+    # empty code and steps that change nothing leave the registered data alone
+    assert agent.apply_cleaning("", df) is df
+    assert agent.apply_cleaning("df = df.copy()", df) is df
+    assert engine.version == version and len(agent.versions.history()) == 1
+    cleaned = agent.apply_cleaning(code, df)
+    assert len(cleaned) == 5 and engine.version == version + 1
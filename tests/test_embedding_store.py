@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from models.embedding_store import EmbeddingStore
+
+def random_vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype('float32')
+
+def test_batched_top_k_matches_full_sort():
+    vectors = random_vectors(500)
+    store = EmbeddingStore()
+    store.add_batch(list(range(500)), vectors)
+    queries = random_vectors(7, seed=1)
+    scores, ids = store.search_vectors(queries, k=5)
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = np.argsort(-(queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normed.T, axis=1)[:, :5]
+    assert (ids == expected).all()
+    assert (np.diff(scores, axis=1) <= 0).all()
+
+def test_delete_and_mmap_persistence(tmp_path):
+    vectors = random_vectors(100)
+    store = EmbeddingStore()
+    ids = store.add_batch([f"chunk {i}" for i in range(100)], vectors)
+    store.delete([ids[3], ids[50]])
+    assert len(store) == 98
+    _, found = store.search_vectors(vectors[3:4], k=1)
+    assert found[0, 0] != ids[3]
+    store.save(str(tmp_path))
+
+    loaded = EmbeddingStore.load(str(tmp_path))
+    assert isinstance(loaded.vectors, np.memmap)
+    _, found = loaded.search_vectors(vectors[10:11], k=1)
+    assert loaded.get(int(found[0, 0])) == "chunk 10"
+    new_id = loaded.add_batch(["extra"], random_vectors(1, seed=5))[0]
+    assert new_id == 100 and len(loaded) == 99
+
+def test_switches_to_faiss_ivf_above_threshold():
+    pytest.importorskip('faiss')
+    vectors = random_vectors(2000)
+    store = EmbeddingStore(ann_threshold=1000, nprobe=64)
+    ids = store.add_batch(list(range(2000)), vectors)
+    _, found = store.search_vectors(vectors[:5], k=1)
+    assert store._ann is not None
+    assert found[:, 0].tolist() == ids[:5]
+    store.delete([ids[0]])
+    _, found = store.search_vectors(vectors[:1], k=1)
+    assert found[0, 0] != ids[0]
+
+def test_delete_ignores_repeated_ids():
+    vectors = random_vectors(10)
+    store = EmbeddingStore()
+    ids = store.add_batch([f"chunk {i}" for i in range(10)], vectors)
+    store.delete([ids[2], ids[2], ids[9]])
+    assert len(store) == 8
+    for i in range(10):
+        if i not in (2, 9):
+            _, found = store.search_vectors(vectors[i:i + 1], k=1)
+            assert store.get(int(found[0, 0])) == f"chunk {i}"
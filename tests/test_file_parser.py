@@ -16,3 +16,129 @@ def test_schema_from_df():
     schema = get_schema_from_df(df)
     assert schema['num_columns'] == 2
     assert schema['columns'][0]['nulls'] == 1
+
+def test_schema_falls_back_to_pandas_and_closes_engine(monkeypatch):
+    import duckdb
+    import core.file_parser as file_parser
+    closed = []
+    close = file_parser.QueryEngine.close
+    monkeypatch.setattr(file_parser.QueryEngine, 'close', lambda self: closed.append(self) or close(self))
+
+    def failing_stats(*args):
+        raise duckdb.ConversionException("cannot scan")
+
+    monkeypatch.setattr(file_parser, '_column_stats', failing_stats)
+    schema = get_schema_from_df(pd.DataFrame({"x": [1, None, 1]}))
+    assert schema['columns'][0]['nulls'] == 1 and schema['columns'][0]['unique'] == 1
+    assert len(closed) == 1
+    # anything other than a DuckDB error is a bug and propagates
+    monkeypatch.setattr(file_parser, '_column_stats', lambda *args: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        get_schema_from_df(pd.DataFrame({"x": [1]}))
+    assert len(closed) == 2
+    dup = get_schema_from_df(pd.DataFrame([[1, 2]], columns=['a', 'a']))
+    assert [col['name'] for col in dup['columns']] == ['a', 'a']
+
+def test_scan_file_lazy(tmp_path):
+    from core.query_executor import QueryEngine
+    from core.file_parser import scan_file
+    csv_path = tmp_path / "test.csv"
+    csv_path.write_text("a,b\n1,x\n,y\n3,x")
+    engine = QueryEngine()
+    schema = scan_file(str(csv_path), engine)
+    assert schema['num_rows'] == 3
+    assert schema['columns'][0]['nulls'] == 1
+    assert schema['columns'][1]['unique'] == 2
+    assert engine.execute("SELECT SUM(a) AS s FROM data")['s'][0] == 4
+
+def test_schema_from_df_approx_distinct():
+    df = pd.DataFrame({"x": [1.5, None, 2.5, 1.5], "id": range(4), "y": ["a", "b", "c", "a"]})
+    exact = get_schema_from_df(df)
+    assert exact['columns'][0] == {'name': 'x', 'dtype': 'float64', 'nulls': 1, 'unique': 2}
+    big = pd.DataFrame({"id": range(10000), "y": ["a", "b"] * 5000})
+    approx = get_schema_from_df(big, approx_distinct=True)
+    assert approx['columns'][1]['unique'] == 2
+    assert 0.75 * 10000 <= approx['columns'][0]['unique'] <= 1.25 * 10000
+
+def test_open_sql_dump_registers_all_tables(tmp_path):
+    from core.query_executor import QueryEngine
+    from core.file_parser import open_sql_dump
+    sql_path = tmp_path / "dump.sql"
+    sql_path.write_text(
+        "CREATE TABLE `Artist` (`ArtistId` INT NOT NULL, `Name` NVARCHAR(120));\n"
+        "CREATE TABLE `Album` (`AlbumId` INT NOT NULL, `ArtistId` INT NOT NULL);\n"
+        "ALTER TABLE `Album` ADD CONSTRAINT `FK_AlbumArtistId`\n"
+        "    FOREIGN KEY (`ArtistId`) REFERENCES `Artist` (`ArtistId`) ON DELETE NO ACTION;\n"
+        "INSERT INTO `Artist` VALUES (1, N'AC/DC'), (2, N'Accept');\n"
+        "INSERT INTO `Album` VALUES (10, 1), (11, 1), (12, 2);\n"
+    )
+    cache_dir = str(tmp_path / "duckdb")
+    engine = QueryEngine()
+    schema = open_sql_dump(str(sql_path), engine, cache_dir=cache_dir)
+    assert set(schema['tables']) == {'Album', 'Artist'}
+    assert schema['database'].startswith(cache_dir)
+    result = engine.execute("SELECT Name, COUNT(*) AS n FROM Album JOIN Artist USING (ArtistId) GROUP BY Name ORDER BY n DESC")
+    assert result['Name'][0] == 'AC/DC'
+    # Second load reattaches the same database file
+    assert open_sql_dump(str(sql_path), QueryEngine(), cache_dir=cache_dir)['database'] == schema['database']
+    # Opening another dump on the same engine drops the first one's tables
+    other_path = tmp_path / "other.sql"
+    other_path.write_text("CREATE TABLE genre (id INT, name VARCHAR);\nINSERT INTO genre VALUES (1, 'Rock');\n")
+    open_sql_dump(str(other_path), engine, cache_dir=cache_dir)
+    assert set(engine.relations) == {'genre', 'data'}
+    assert engine.execute("SELECT name FROM data")['name'][0] == 'Rock'
+
+def test_parse_file_sql_dump_matches_open_sql_dump(tmp_path, monkeypatch):
+    import core.file_parser as file_parser
+    monkeypatch.setattr(file_parser, 'DUCKDB_CACHE_DIR', str(tmp_path / "duckdb"))
+    sql_path = tmp_path / "dump.sql"
+    sql_path.write_text("CREATE TABLE b (x INT);\nCREATE TABLE a (y INT);\nINSERT INTO a VALUES (1), (2);\n")
+    df, schema = file_parser.parse_file(str(sql_path))
+    assert set(schema['tables']) == {'a', 'b'}
+    assert list(df.columns) == ['y'] and schema['num_rows'] == 2
+
+def test_mysql_rewrites_skip_string_literals():
+    from core.file_parser import _mysql_to_duckdb
+    script = ("INSERT INTO `Track` VALUES (1, N'Rock`n`Roll', 'it''s N''s', 'say \\'hi\\' `x`');"
+              " -- don't touch `this`\nSELECT `a``b` FROM `Track`;")
+    assert _mysql_to_duckdb(script) == (
+        "INSERT INTO \"Track\" VALUES (1, 'Rock`n`Roll', 'it''s N''s', 'say \\'hi\\' `x`');"
+        " -- don't touch `this`\nSELECT \"a`b\" FROM \"Track\";")
+
+def test_read_csv_streaming_narrows_dtypes(tmp_path):
+    from core.file_parser import read_csv_streaming
+    csv_path = tmp_path / "big.csv"
+    rows = [f"{i},{'ab'[i % 2]},id{i},{i / 4},{i / 10}" for i in range(50)]
+    csv_path.write_text("n,flag,key,quarter,tenth\n" + "\n".join(rows))
+    reports = []
+    df, schema = read_csv_streaming(str(csv_path), chunk_rows=10,
+                                    progress=lambda fraction, partial: reports.append((fraction, partial['num_rows'])))
+    assert str(df['n'].dtype) == 'int8'
+    # exact in float32: narrowed; tenths are not, so they keep full width
+    assert str(df['quarter'].dtype) == 'float32' and str(df['tenth'].dtype) == 'float64'
+    assert not any(isinstance(dtype, pd.CategoricalDtype) or dtype == object for dtype in df.dtypes)
+    assert list(df['key'][:2]) == ['id0', 'id1']
+    df.loc[0, 'flag'] = 'new value'  # strings are not categoricals: cleaning code can assign anything
+    assert schema['num_rows'] == 50
+    assert [col['unique'] for col in schema['columns']] == [50, 2, 50, 50, 50]
+    assert [rows for _, rows in reports] == [10, 20, 30, 40, 50]
+    assert reports[-1][0] == 1.0
+
+def test_small_csv_is_not_streamed(tmp_path):
+    csv_path = tmp_path / "small.csv"
+    csv_path.write_text("flag\n" + "\n".join('ab'[i % 2] for i in range(20)))
+    df, schema = parse_file(str(csv_path), progress=lambda fraction, partial: None)
+    assert not isinstance(df['flag'].dtype, pd.CategoricalDtype)
+    df.loc[0, 'flag'] = 'new value'  # categoricals reject values outside their categories
+    assert schema['columns'][0]['unique'] == 2
+
+def test_streaming_honours_approx_distinct(tmp_path, monkeypatch):
+    import core.file_parser as file_parser
+    csv_path = tmp_path / "big.csv"
+    csv_path.write_text("n\n" + "\n".join(str(i) for i in range(100)))
+    monkeypatch.setattr(file_parser, 'STREAMING_THRESHOLD_BYTES', 10)
+    calls = []
+    stats = file_parser._column_stats
+    monkeypatch.setattr(file_parser, '_column_stats', lambda *args: calls.append(args[-1]) or stats(*args))
+    df, schema = file_parser.parse_file(str(csv_path), approx_distinct=True)
+    assert calls == [True] and schema['num_rows'] == 100
@@ -0,0 +1,32 @@
+import os
+import time
+import pandas as pd
+from core.ingest_cache import IngestCache, content_digest
+from core.file_parser import file_digest
+
+def test_ingest_cache_roundtrip(tmp_path):
+    cache = IngestCache(str(tmp_path))
+    df = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]})
+    schema = {'columns': [], 'num_rows': 2, 'num_columns': 2}
+    assert cache.get("k") is None
+    assert cache.put("k", df, schema)
+    cached_df, cached_schema = cache.get("k")
+    assert cached_df.equals(df)
+    assert cached_schema == schema
+
+def test_ingest_cache_evicts_lru(tmp_path):
+    df = pd.DataFrame({"a": range(1000)})
+    cache = IngestCache(str(tmp_path), max_bytes=10 ** 9)
+    for key in ["old", "recent", "new"]:
+        cache.put(key, df, {})
+        time.sleep(0.01)
+    cache.get("old")
+    cache.max_bytes = cache.size_bytes() * 2 // 3
+    cache.evict()
+    assert cache.get("recent") is None
+    assert cache.get("old") is not None
+
+def test_content_digest_matches_file_digest(tmp_path):
+    path = tmp_path / "f.csv"
+    path.write_bytes(b"a,b\n1,2\n")
+    assert content_digest(b"a,b\n1,2\n") == file_digest(str(path))
@@ -0,0 +1,123 @@
+import json
+import time
+import asyncio
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+requests = pytest.importorskip('requests')
+from app.llm_loader import MistralLLM
+
+class StubMistral(BaseHTTPRequestHandler):
+    """
+    Chat-completions stub: sleeps `latency`, answers the first `throttle` requests with 429.
+    """
+    latency = 0.05
+    throttle = 0
+    calls = 0
+    connections = set()
+
+    def do_POST(self):
+        cls = type(self)
+        cls.calls += 1
+        cls.connections.add(self.client_address)
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(cls.latency)
+        if cls.throttle > 0:
+            cls.throttle -= 1
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        prompt = body['messages'][0]['content']
+        if body.get('stream'):
+            events = [{'choices': [{'delta': {'content': word + ' '}}]} for word in prompt.split()]
+            payload = ''.join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+            content_type = 'text/event-stream'
+        else:
+            payload = json.dumps({'choices': [{'message': {'content': prompt.upper()}}]})
+            content_type = 'application/json'
+        data = payload.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_url():
+    StubMistral.protocol_version = 'HTTP/1.1'
+    StubMistral.calls, StubMistral.throttle, StubMistral.latency = 0, 0, 0.05
+    StubMistral.connections = set()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubMistral)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    server.shutdown()
+
+def test_invoke_reuses_connection(stub_url):
+    llm = MistralLLM("key", api_url=stub_url)
+    assert llm.invoke("select one") == "SELECT ONE"
+    assert llm.invoke("select two") == "SELECT TWO"
+    assert len(StubMistral.connections) == 1
+
+def test_retries_on_throttling(stub_url):
+    StubMistral.throttle = 2
+    llm = MistralLLM("key", api_url=stub_url, backoff_base=0.01)
+    assert llm.invoke("hi") == "HI"
+    assert StubMistral.calls == 3
+
+def test_gives_up_after_max_retries(stub_url):
+    StubMistral.throttle = 10
+    llm = MistralLLM("key", api_url=stub_url, max_retries=1, backoff_base=0.01)
+    with pytest.raises(requests.HTTPError):
+        llm.invoke("hi")
+    assert StubMistral.calls == 2
+
+def test_stream_yields_tokens(stub_url):
+    llm = MistralLLM("key", api_url=stub_url)
+    assert list(llm.stream("a b c")) == ["a ", "b ", "c "]
+
+def test_async_calls_run_concurrently(stub_url):
+    StubMistral.latency = 0.3
+    llm = MistralLLM("key", api_url=stub_url)
+
+    async def run():
+        tokens = [token async for token in llm.astream("x y")]
+        results = await asyncio.gather(*(llm.ainvoke(f"q{i}") for i in range(4)))
+        return tokens, results
+
+    t0 = time.perf_counter()
+    tokens, results = asyncio.run(run())
+    elapsed = time.perf_counter() - t0
+    assert tokens == ["x ", "y "]
+    assert results == ["Q0", "Q1", "Q2", "Q3"]
+    assert elapsed < 0.3 * 5 - 0.2
+
+def test_registry_builds_backend_once(monkeypatch):
+    import app.llm_loader as llm_loader
+    built = []
+
+    class FakeLLM:
+        def ping(self):
+            return True
+
+    def fake_get_llm(model_type, api_key):
+        time.sleep(0.05)
+        built.append(model_type)
+        return FakeLLM()
+
+    monkeypatch.setattr(llm_loader, 'get_llm', fake_get_llm)
+    registry = llm_loader.LLMRegistry(health_ttl=60)
+    assert registry.health('mistral', 'key')[0] is None
+    first = registry.get('mistral', 'key')
+    assert registry.get('mistral', 'key') is first
+    assert built == ['mistral']
+    deadline = time.time() + 2
+    while registry.health('mistral', 'key')[0] is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert registry.health('mistral', 'key') == (True, "Mistral model connected")
@@ -0,0 +1,52 @@
+import logging
+from utils.log_buffer import LogBuffer
+
+class _Loud:
+    formatted = 0
+
+    def __str__(self):
+        _Loud.formatted += 1
+        return "prompt"
+
+def test_filters_by_source_level_without_formatting():
+    logs = LogBuffer(level='INFO', levels={'SQLAgent': 'DEBUG'})
+    logs.debug('ChartAgent', "Prompt:\n%s", _Loud())
+    assert len(logs) == 0
+    logs.debug('SQLAgent', "Prompt:\n%s", _Loud())
+    assert len(logs) == 1 and _Loud.formatted == 0  # stored, not yet formatted
+    assert list(logs)[0].endswith("DEBUG [SQLAgent] Prompt:\nprompt") and _Loud.formatted == 1
+    logs.set_level('WARNING', 'SQLAgent')
+    logs.info('SQLAgent', "dropped")
+    assert len(logs) == 1
+
+def test_ring_buffer_is_capped_and_paginated():
+    logs = LogBuffer(capacity=100)
+    for i in range(250):
+        logs.info('RouterAgent' if i % 2 else 'SQLAgent', "event %d", i)
+    assert len(logs) == 100 and logs.dropped == 150
+    lines, pages = logs.window(0, 10, sources=['RouterAgent'])
+    assert pages == 5 and lines[-1].endswith("event 249") and len(lines) == 10
+    lines, _ = logs.window(4, 10, sources=['RouterAgent'])
+    assert lines[0].endswith("event 151")
+    assert [line.split()[-1] for line in logs.window(0, 10, text='EVENT 24')[0]] == [str(i) for i in range(240, 250)]
+    assert logs.sources() == ['RouterAgent', 'SQLAgent']
+
+def test_append_parses_prefix_and_long_messages_are_cut():
+    logs = LogBuffer(max_chars=10)
+    logs.append("[main.py] Error: bad file")
+    logs.append("plain line")
+    logs.info('SQLAgent', "%s", "x" * 25)
+    records = logs.snapshot()
+    assert records[0][1] == logging.ERROR and records[0][2] == 'main.py'
+    assert records[1][2] == 'app'
+    assert logs.filter(level='ERROR') == records[:1]
+    assert list(logs)[2].endswith("xxxxxxxxxx... [15 more characters]")
+
+def test_spills_to_rotating_file(tmp_path):
+    path = tmp_path / "session.log"
+    logs = LogBuffer(capacity=2, spill_path=str(path), spill_max_bytes=200, spill_backups=2)
+    for i in range(20):
+        logs.info('SQLAgent', "event %d", i)
+    assert len(logs) == 2
+    assert "[SQLAgent] event 19" in path.read_text(encoding='utf-8')
+    assert (tmp_path / "session.log.1").exists() and not (tmp_path / "session.log.3").exists()
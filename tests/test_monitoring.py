@@ -0,0 +1,57 @@
+import urllib.request
+import pytest
+from utils.monitoring import Monitoring, percentiles, record_tokens
+
+def test_percentiles_use_nearest_rank():
+    values = list(range(1, 101))
+    assert percentiles(values, (0.5, 0.95, 0.99)) == [50, 95, 99]
+    assert percentiles([], (0.5,)) == [None]
+
+def test_spans_keep_a_fixed_window_but_lifetime_counts():
+    monitoring = Monitoring(window=10)
+    for i in range(100):
+        monitoring.observe('llm_call', i / 100, agent='sql')
+    with pytest.raises(ValueError):
+        with monitoring.span('sql_execution'):
+            raise ValueError("bad query")
+    rows = {row['span']: row for row in monitoring.summary()}
+    assert rows['llm_call']['count'] == 100 and rows['llm_call']['labels'] == 'agent=sql'
+    assert rows['llm_call']['p50'] == 0.94 and rows['llm_call']['p99'] == 0.99
+    assert len(monitoring.spans[('llm_call', (('agent', 'sql'),))].recent) == 10
+    assert rows['sql_execution']['count'] == 1
+    assert {'counter': 'span_errors', 'labels': 'span=sql_execution', 'value': 1} in monitoring.totals()
+
+def test_export_prometheus_and_openmetrics():
+    monitoring = Monitoring(buckets=(0.1, 1.0))
+    monitoring.observe('routing', 0.05)
+    monitoring.observe('routing', 0.5)
+    monitoring.observe('routing', 5)
+    record_tokens(monitoring, 'sql', 'hf', 120, 30)
+    text = monitoring.export()
+    assert 'autoqueryai_span_duration_seconds_bucket{span="routing",le="0.1"} 1' in text
+    assert 'autoqueryai_span_duration_seconds_bucket{span="routing",le="1"} 2' in text
+    assert 'autoqueryai_span_duration_seconds_bucket{span="routing",le="+Inf"} 3' in text
+    assert 'autoqueryai_span_duration_seconds_count{span="routing"} 3' in text
+    assert '# TYPE autoqueryai_llm_tokens_total counter' in text
+    assert 'autoqueryai_llm_tokens_total{agent="sql",kind="prompt",model="hf"} 120' in text
+    openmetrics = monitoring.export(openmetrics=True)
+    assert '# TYPE autoqueryai_llm_tokens counter' in openmetrics and openmetrics.endswith('# EOF\n')
+
+def test_serves_metrics_over_http():
+    monitoring = Monitoring()
+    monitoring.observe('ingest', 0.2, format='csv')
+    server = monitoring.serve(0, addr='127.0.0.1')
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+            assert 'span="ingest"' in response.read().decode('utf-8')
+    finally:
+        server.shutdown()
+
+def test_serves_on_localhost_and_reports_a_taken_port():
+    first = Monitoring().serve(0)
+    try:
+        assert first.server_address[0] == '127.0.0.1'
+        with pytest.raises(OSError):
+            Monitoring().serve(first.server_port)
+    finally:
+        first.shutdown()
@@ -0,0 +1,29 @@
+import time
+from agents.orchestrator import AgentOrchestrator
+
+def test_stages_run_concurrently_and_stream_results():
+    orchestrator = AgentOrchestrator()
+
+    def slow(value, delay):
+        def stage():
+            time.sleep(delay)
+            return value
+        return stage
+
+    def broken():
+        raise RuntimeError("boom")
+
+    t0 = time.perf_counter()
+    results = list(orchestrator.run({'explanation': slow('text', 0.3), 'chart': slow('fig', 0.1), 'bad': broken}))
+    elapsed = time.perf_counter() - t0
+    assert elapsed < 0.39
+    assert [name for name, _, _ in results] == ['bad', 'chart', 'explanation']
+    assert results[1][1] == 'fig'
+    assert isinstance(results[0][2], RuntimeError)
+    assert set(orchestrator.timings) == {'explanation', 'chart', 'bad'}
+    assert orchestrator.timings['explanation'] >= 0.3
+
+def test_time_stage_records_inline_stage():
+    orchestrator = AgentOrchestrator()
+    assert orchestrator.time_stage('sql_generation', lambda: 'SELECT 1') == 'SELECT 1'
+    assert 'sql_generation' in orchestrator.timings
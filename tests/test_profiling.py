@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from utils.profiling import ProfileReportJobs, frame_digest, stratified_sample
+
+def test_stratified_sample_keeps_rare_strata():
+    df = pd.DataFrame({"group": pd.Categorical(["a"] * 990 + ["b"] * 10), "x": range(1000)})
+    sample = stratified_sample(df, 100)
+    assert 95 <= len(sample) <= 105
+    assert set(sample['group']) == {"a", "b"}
+    assert sample['x'].is_monotonic_increasing
+    assert stratified_sample(df, 5000) is df
+
+def test_frame_digest_tracks_content():
+    df = pd.DataFrame({"a": [1, 2, 3]})
+    assert frame_digest(df) == frame_digest(df.copy())
+    assert frame_digest(df) != frame_digest(df.assign(a=[1, 2, 4]))
+
+def test_profile_report_cache_hit(tmp_path):
+    jobs = ProfileReportJobs(cache_dir=str(tmp_path))
+    df = pd.DataFrame({"a": [1, 2, 3]})
+    key = jobs.report_key('dataset-1', 100, True, False, False)
+    assert jobs.status(key) == ('missing', None)
+    with open(jobs.html_path(key), 'w') as f:
+        f.write("<html></html>")
+    assert jobs.submit(df, 100, dataset_id='dataset-1') == key
+    assert jobs.status(key) == ('done', jobs.html_path(key))
+    assert not jobs.jobs
+
+def test_profile_report_runs_in_background(tmp_path):
+    pytest.importorskip('ydata_profiling')
+    jobs = ProfileReportJobs(cache_dir=str(tmp_path))
+    key = jobs.submit(pd.DataFrame({"a": range(100)}), sample_rows=10, dataset_id='d')
+    jobs.jobs[key].result(timeout=300)
+    state, path = jobs.status(key)
+    jobs.shutdown()
+    assert state == 'done'
+    with open(path, encoding='utf-8') as f:
+        assert f.read().strip()
+
+def test_profile_job_samples_in_the_worker(tmp_path, monkeypatch):
+    import utils.profiling as profiling
+    profiled = []
+
+    def fake_report(df, output_path, *options):
+        profiled.append(len(df))
+        with open(output_path, 'w') as f:
+            f.write("<html>report</html>")
+
+    monkeypatch.setattr(profiling, 'generate_profile_report', fake_report)
+    monkeypatch.setattr(profiling, 'frame_digest', lambda df: pytest.fail("hashed the frame"))
+    jobs = ProfileReportJobs(cache_dir=str(tmp_path))
+    jobs._executor = ThreadPoolExecutor(1)  # same process, so the patch applies
+    key = jobs.submit(pd.DataFrame({"a": range(100)}), sample_rows=10, dataset_id='d')
+    jobs.jobs[key].result(timeout=30)
+    jobs.shutdown()
+    assert jobs.status(key)[0] == 'done' and profiled == [10]
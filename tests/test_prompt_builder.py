@@ -0,0 +1,50 @@
+from agents.prompt_builder import PromptBuilder, estimate_tokens, parse_examples
+
+EXAMPLES = [
+    ("Show total sales by country", "SELECT country, SUM(sales) FROM data GROUP BY country;"),
+    ("Show average order value by year", "SELECT year, AVG(order_value) FROM data GROUP BY year;"),
+    ("List all customers from France", "SELECT * FROM data WHERE country = 'France';"),
+]
+
+def wide_schema(n):
+    columns = [{'name': 'fare_amount', 'dtype': 'float64'}, {'name': 'VendorID', 'dtype': 'int64'}]
+    columns += [{'name': f'metric_{i}', 'dtype': 'float64'} for i in range(n)]
+    return {'columns': columns, 'num_rows': 10, 'num_columns': len(columns)}
+
+def test_parse_examples():
+    assert parse_examples("User: a b\nSQL: SELECT 1;\n\nUser: c\nSQL: SELECT 2;\n") == [("a b", "SELECT 1;"), ("c", "SELECT 2;")]
+
+def test_selects_relevant_columns_on_wide_tables():
+    builder = PromptBuilder(EXAMPLES, max_columns=5)
+    section = builder.schema_section("average fare by vendor", wide_schema(50), [], 5)
+    assert "fare_amount (float64)" in section
+    assert "VendorID (int64)" in section
+    assert "(+47 more columns)" in section
+
+def test_history_window_and_example_selection():
+    history = []
+    for i in range(10):
+        history.append({'role': 'user', 'content': f"question {i}"})
+        history.append({'role': 'assistant', 'type': 'query', 'sql': f"SELECT {i};"})
+    builder = PromptBuilder(EXAMPLES, history_turns=2, num_examples=1)
+    chat = builder.history_section(history, 2)
+    assert "(Earlier, 8 questions" in chat
+    assert "assistant: SELECT 9;" in chat and "user: question 1\n" not in chat
+    assert builder.examples_section("customers in France", 1) == "User: List all customers from France\nSQL: SELECT * FROM data WHERE country = 'France';"
+
+def test_prompt_respects_token_budget():
+    history = [{'role': 'user', 'content': "x " * 200} for _ in range(20)]
+    builder = PromptBuilder(EXAMPLES, token_budget=600)
+    prompt = builder.build("average fare", wide_schema(300), history)
+    assert estimate_tokens(prompt) <= 600
+    assert "fare_amount" in prompt
+
+def test_cache_context_scopes_only_follow_ups():
+    builder = PromptBuilder(EXAMPLES, history_turns=1)
+    follow_up = {'role': 'user', 'content': 'now by product'}
+    sales = [{'role': 'user', 'content': 'total sales'}, {'role': 'assistant', 'sql': 'SELECT SUM(sales) FROM data'}, follow_up]
+    fares = [{'role': 'user', 'content': 'average fare'}, {'role': 'assistant', 'sql': 'SELECT AVG(fare) FROM data'}, follow_up]
+    assert builder.cache_context('now by product', sales) != builder.cache_context('now by product', fares)
+    assert builder.cache_context('now by product', list(sales)) == builder.cache_context('now by product', sales)
+    # a standalone question means the same whatever came before it
+    assert builder.cache_context('total sales', sales) == builder.cache_context('total sales', []) == ''
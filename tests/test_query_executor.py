@@ -0,0 +1,27 @@
+import pandas as pd
+from core.query_executor import QueryEngine, execute_sql
+
+def test_query_engine_reuses_connection():
+    engine = QueryEngine()
+    engine.register(pd.DataFrame({"a": [1, 2, 3]}))
+    assert engine.execute("SELECT SUM(a) AS s FROM data")['s'][0] == 6
+    assert engine.execute("SELECT COUNT(*) AS n FROM data")['n'][0] == 3
+    engine.close()
+
+def test_query_engine_reregister():
+    engine = QueryEngine()
+    engine.register(pd.DataFrame({"a": [1, 2, 3]}))
+    engine.register(pd.DataFrame({"a": [10]}))
+    result = engine.execute("SELECT SUM(a) AS s FROM data")
+    assert result['s'][0] == execute_sql(pd.DataFrame({"a": [10]}), "SELECT SUM(a) AS s FROM data")['s'][0]
+    engine.close()
+
+def test_execute_pandas_code_copies_only_written_columns():
+    import numpy as np
+    from core.query_executor import execute_pandas_code
+    df = pd.DataFrame({'a': [1.0, 2.0, 3.0], 'b': [4.0, 5.0, 6.0]})
+    result = execute_pandas_code(df, "df.loc[0, 'a'] = 0\ndf['c'] = df['b'] * 2")
+    assert list(df.columns) == ['a', 'b']
+    assert df.loc[0, 'a'] == 1.0
+    assert result.loc[0, 'a'] == 0
+    assert np.shares_memory(result['b'].to_numpy(), df['b'].to_numpy())
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+from core.query_executor import QueryEngine, QueryTimeout
+from core.query_guard import QueryGuard, explain, limit_sql, sample_sql
+
+@pytest.fixture
+def engine():
+    engine = QueryEngine()
+    engine.register(pd.DataFrame({'a': np.arange(100_000), 'b': np.arange(100_000) % 7}))
+    return engine
+
+def test_explain_flags_cross_products(engine):
+    plan = explain(engine, "SELECT * FROM data d1, data d2")
+    assert plan['cross_product']
+    assert plan['estimated_rows'] == 100_000 ** 2
+    assert not explain(engine, "SELECT b, COUNT(*) FROM data GROUP BY b")['cross_product']
+
+def test_limit_keeps_tighter_limits(engine):
+    assert len(engine.execute(limit_sql("SELECT a FROM data ORDER BY a DESC LIMIT 3;", 10))) == 3
+    assert list(engine.execute(limit_sql("SELECT a FROM data ORDER BY a DESC", 2))['a']) == [99_999, 99_998]
+
+def test_sample_sql_shadows_tables(engine):
+    sql = sample_sql("WITH t AS (SELECT * FROM data) SELECT COUNT(*) AS n FROM t", ['data'], 10)
+    assert sql.startswith('WITH "data" AS')
+    assert engine.execute(sql)['n'].iloc[0] < 100_000
+
+def test_guard_truncates_and_samples(engine):
+    guard = QueryGuard(engine, display_limit=50, sample_threshold=50_000, auto_sample=True)
+    result = guard.run("SELECT * FROM data")
+    assert result['truncated'] and len(result['df']) == 50 and not result['sampled']
+    join = "SELECT COUNT(*) AS n FROM data d1, data d2 WHERE d1.b = d2.b AND d1.a < 10"
+    result = guard.run(join)
+    assert result['sampled'] and not result['truncated']
+    assert not guard.run(join, sample=False)['sampled']
+    assert len(guard.run("DESCRIBE data")['df']) == 2
+    # sampling is opt-in
+    assert not QueryGuard(engine, sample_threshold=50_000).run(join)['sampled']
+
+def test_query_timeout_interrupts(engine):
+    with pytest.raises(QueryTimeout):
+        engine.execute("SELECT COUNT(*) FROM data d1, data d2, data d3 WHERE d1.a + d2.a + d3.a = 7", timeout=0.2)
+    assert engine.execute("SELECT COUNT(*) AS n FROM data")['n'].iloc[0] == 100_000
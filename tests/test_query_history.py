@@ -0,0 +1,87 @@
+import os
+import pandas as pd
+from models.query_history import QueryHistory, sql_fingerprint, sql_key
+
+def test_fingerprint_ignores_literals_and_formatting():
+    assert sql_key("SELECT a FROM data -- x") == sql_key("select  a\nfrom data;")
+    assert sql_key("SELECT a FROM data WHERE b = 1") != sql_key("SELECT a FROM data WHERE b = 2")
+    assert sql_fingerprint("SELECT a FROM data WHERE b = 1 AND c = 'x'") == \
+        sql_fingerprint("select a from data where b = 25 and c = 'it''s'")
+    assert sql_fingerprint("SELECT col1 FROM data") != sql_fingerprint("SELECT col2 FROM data")
+
+def test_recall_returns_stored_result_for_same_sql_and_dataset(tmp_path):
+    history = QueryHistory(str(tmp_path), max_memory_results=1)
+    first = history.add("average fare", "SELECT avg(fare) FROM data", pd.DataFrame({'avg': [3.5]}),
+                        "The mean fare.", timings={'sql_execution': 0.2}, dataset='d1')
+    history.add("total tips", "SELECT sum(tip) FROM data", pd.DataFrame({'sum': [10]}), dataset='d1')
+    # the first result was evicted from memory and is read back from Parquet
+    recalled = history.recall("select avg(fare) from data", 'd1')
+    assert recalled['id'] == first and recalled['result']['avg'].tolist() == [3.5]
+    assert recalled['timings'] == {'sql_execution': 0.2}
+    assert history.recall("SELECT avg(fare) FROM data", 'd2') is None
+    history.close()
+    # entries survive a restart
+    reopened = QueryHistory(str(tmp_path))
+    assert reopened.recall("SELECT avg(fare) FROM data", 'd1')['question'] == "average fare"
+    reopened.close()
+
+def test_incomplete_results_are_not_recalled(tmp_path):
+    history = QueryHistory(str(tmp_path), max_result_rows=2)
+    history.add("sampled", "SELECT * FROM a", pd.DataFrame({'x': [1]}), complete=False)
+    history.add("too big", "SELECT * FROM b", pd.DataFrame({'x': [1, 2, 3]}))
+    assert history.recall("SELECT * FROM a") is None
+    assert history.recall("SELECT * FROM b") is None
+    assert len(history.result(history.search("too big")[0]['id'])) == 2
+    history.close()
+
+def test_search_by_text_and_fingerprint(tmp_path):
+    history = QueryHistory(str(tmp_path))
+    history.add("Fares by vendor", "SELECT vendor, avg(fare) FROM data WHERE year = 2020 GROUP BY vendor")
+    history.add("Tips per day", "SELECT day, sum(tip) FROM data GROUP BY day")
+    assert [e['question'] for e in history.search("fare VENDOR")] == ["Fares by vendor"]
+    assert [e['question'] for e in history.search("sum")] == ["Tips per day"]
+    matches = history.search(sql="SELECT vendor, avg(fare) FROM data WHERE year = 2021 GROUP BY vendor")
+    assert [e['question'] for e in matches] == ["Fares by vendor"]
+    assert len(history.search()) == 2
+    history.close()
+
+def test_prunes_oldest_entries_and_their_results(tmp_path):
+    history = QueryHistory(str(tmp_path), max_entries=2)
+    ids = [history.add(f"q{i}", f"SELECT {i}", pd.DataFrame({'x': [i]})) for i in range(3)]
+    assert [e['id'] for e in history.get_all()] == ids[:0:-1]
+    assert history.get(ids[0]) is None
+    assert len(os.listdir(history.results_dir)) == 2
+    history.clear()
+    assert history.get_all() == [] and os.listdir(history.results_dir) == []
+    history.close()
+
+def test_fallback_catalog_does_not_overwrite_shared_results(tmp_path):
+    first = QueryHistory(str(tmp_path), max_memory_results=0)
+    first.add("one", "SELECT 1", pd.DataFrame({'x': [1]}))
+    # a second catalog on the same directory starts its ids at 1 again
+    second = QueryHistory(str(tmp_path / 'other'), max_memory_results=0)
+    second.results_dir = first.results_dir
+    second.add("two", "SELECT 2", pd.DataFrame({'x': [2]}))
+    assert first.recall("SELECT 1")['result']['x'].tolist() == [1]
+    assert second.recall("SELECT 2")['result']['x'].tolist() == [2]
+    first.close()
+    second.close()
+
+def test_browsing_is_scoped_to_the_session(tmp_path):
+    history = QueryHistory(str(tmp_path))
+    mine = history.add("my question", "SELECT 1", pd.DataFrame({'x': [1]}), dataset='d', session='a')
+    theirs = history.add("their question", "SELECT 2", pd.DataFrame({'x': [2]}), dataset='d', session='b')
+    assert [e['question'] for e in history.search(session='a')] == ["my question"]
+    assert history.result(theirs, session='a') is None and history.get(theirs, session='a') is None
+    assert history.result(mine, session='a')['x'].tolist() == [1]
+    # recall is by SQL and data, so identical queries on identical data are still shared
+    assert history.recall("SELECT 2", 'd')['id'] == theirs
+    history.close()
+
+def test_volatile_queries_are_not_recalled(tmp_path):
+    history = QueryHistory(str(tmp_path))
+    for sql in ("SELECT * FROM data ORDER BY random() LIMIT 5", "SELECT now()", "SELECT * FROM data WHERE d = current_date"):
+        history.add("volatile", sql, pd.DataFrame({'x': [1]}), dataset='d')
+        assert history.recall(sql, 'd') is None
+    assert not any(e['complete'] for e in history.search("volatile"))
+    history.close()
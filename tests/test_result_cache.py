@@ -0,0 +1,31 @@
+import pandas as pd
+from core.query_executor import QueryEngine
+from core.result_cache import ResultCache, canonicalize_sql
+
+def test_canonicalize_sql_keeps_literals():
+    assert canonicalize_sql("SELECT  *\nFROM data WHERE x = 'A  b';") == "select * from data where x = 'A  b'"
+
+def test_engine_serves_repeat_queries_from_cache():
+    engine = QueryEngine(result_cache=ResultCache())
+    engine.register(pd.DataFrame({"a": [1, 2, 3]}))
+    first = engine.execute("SELECT SUM(a) AS s FROM data")
+    second = engine.execute("select sum(a) as s\nfrom data;")
+    assert second.equals(first)
+    stats = engine.result_cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['bytes_held'] > 0
+
+def test_reregister_invalidates_cache():
+    engine = QueryEngine(result_cache=ResultCache())
+    engine.register(pd.DataFrame({"a": [1, 2, 3]}))
+    engine.execute("SELECT SUM(a) AS s FROM data")
+    engine.register(pd.DataFrame({"a": [10]}))
+    assert engine.result_cache.stats()['entries'] == 0
+    assert engine.execute("SELECT SUM(a) AS s FROM data")['s'][0] == 10
+
+def test_lru_eviction_by_bytes():
+    cache = ResultCache(max_bytes=2000)
+    for i in range(5):
+        cache.put((f"q{i}", 0), pd.DataFrame({"a": range(100)}))
+    assert cache.bytes_held <= 2000
+    assert cache.get(("q4", 0)) is not None
+    assert cache.get(("q0", 0)) is None
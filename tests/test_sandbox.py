@@ -0,0 +1,67 @@
+import os
+import pandas as pd
+import pytest
+from core.sandbox import SandboxPool, SandboxError, SandboxTimeout
+from core.query_executor import execute_pandas_code
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = SandboxPool(workers=1, cpu_seconds=2, memory_mb=1024, timeout=20)
+    yield pool
+    pool.close()
+
+def test_dataframe_round_trip(pool):
+    df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]}, index=[10, 20, 30])
+    result = pool.run("df['c'] = df['a'] * 2", df, outputs=('df',))
+    assert list(result['c']) == [2, 4, 6]
+    assert list(result.index) == [10, 20, 30]
+    assert 'c' not in df.columns
+
+def test_execute_pandas_code_in_sandbox(pool):
+    df = pd.DataFrame({"a": [1, 2, 3]})
+    assert execute_pandas_code(df, "result = df['a'].sum()", sandbox=pool) == 6
+
+def test_shared_frame_is_written_once(pool):
+    df = pd.DataFrame({"a": [1, 2, 3]})
+    path = pool.share(df)
+    assert pool.share(df) == path
+    del df
+    assert not os.path.exists(path)
+
+def test_errors_are_raised(pool):
+    with pytest.raises(SandboxError, match="ZeroDivisionError"):
+        pool.run("result = 1 / 0")
+
+def test_cpu_limit_replaces_worker(pool):
+    with pytest.raises(SandboxError, match="CPU time limit"):
+        pool.run("while True: pass")
+    assert pool.run("result = 1 + 1") == 2
+
+def test_timeout_replaces_worker(pool):
+    with pytest.raises(SandboxTimeout):
+        pool.run("import time; time.sleep(30)", timeout=1)
+    assert pool.run("result = 'ok'") == 'ok'
+
+def test_figure_result(pool):
+    pytest.importorskip('plotly')
+    df = pd.DataFrame({"x": ["a", "b"], "y": [1, 2]})
+    fig = pool.run("import plotly.express as px\nfig = px.bar(result_df, x='x', y='y')", df,
+                   input_name='result_df', outputs=('fig',))
+    assert fig.data[0].type == 'bar'
+
+def test_results_are_never_unpickled(pool):
+    code = "class Boom:\n    def __reduce__(self):\n        return (print, ('pwned',))\nresult = Boom()"
+    with pytest.raises(SandboxError, match="Unsupported result type"):
+        pool.run(code)
+    assert pool.run("import numpy as np\nresult = np.int64(3)") == 3
+    assert pool.run("result = {'a': [1, 2.5, None]}") == {'a': [1, 2.5, None]}
+    mixed = pool.run("import pandas as pd\nresult = pd.DataFrame({'m': [1, 'x']})")
+    assert mixed['m'].tolist() == ['1', 'x']
+
+def test_killed_worker_is_replaced(pool):
+    worker = pool._idle.get()
+    worker.process.kill()
+    worker.process.join()
+    pool._idle.put(worker)
+    assert pool.run("result = 2 * 21") == 42
+    assert pool.run("result = 'still ok'") == 'still ok'
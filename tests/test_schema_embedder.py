@@ -0,0 +1,38 @@
+import pytest
+from core.schema_embedder import HashingEmbeddings, SchemaEmbedder, schema_to_tables
+from models.embedding_store import EmbeddingStore
+
+TABLES = {
+    'trips': ['fare_amount', 'tip_amount', 'total_amount', 'trip_distance', 'VendorID', 'payment_type'],
+    'zones': ['LocationID', 'Borough', 'Zone', 'service_zone'],
+}
+
+def test_hashing_embeddings_similarity():
+    model = HashingEmbeddings()
+    fare, tip, borough = model.embed_array(["fare amount", "tip amount", "borough zone"])
+    query = model.embed_array(["average fare"])[0]
+    assert query @ fare > max(query @ tip, query @ borough)
+
+def test_schema_embedder_retrieves_and_reloads(tmp_path):
+    pytest.importorskip('faiss')
+    embedder = SchemaEmbedder(index_dir=str(tmp_path))
+    embedder.chunk_schema(TABLES, chunk_size=3)
+    embedder.embed_chunks()
+    assert embedder.retrieve("which borough", k=1)[0].startswith("Table: zones")
+    assert len(list(tmp_path.glob("*.faiss"))) == 1
+
+    reloaded = SchemaEmbedder(index_dir=str(tmp_path))
+    reloaded.chunk_schema(TABLES, chunk_size=3)
+    reloaded.embed_chunks()
+    assert reloaded.retrieve("which borough", k=1) == embedder.retrieve("which borough", k=1)
+
+def test_schema_to_tables():
+    schema = {'columns': [{'name': 'a', 'dtype': 'int64'}], 'num_rows': 1, 'num_columns': 1}
+    assert schema_to_tables(schema) == {'data': ['a']}
+
+def test_embedding_store_top_k():
+    store = EmbeddingStore(HashingEmbeddings())
+    for chunk in ["fare amount", "tip amount", "borough zone"]:
+        store.add(chunk)
+    assert store.search("zone of the borough") == ["borough zone"]
+    assert store.search("fare", k=2)[0] == "fare amount"
@@ -22,3 +22,50 @@ def test_generate_profile():
     assert 'describe' in profile
     assert 'nulls' in profile
     assert profile['nulls']['b'] == 1
+
+def test_generate_profile_sql():
+    from core.query_executor import QueryEngine
+    from core.schema_handler import generate_profile_sql
+    engine = QueryEngine()
+    engine.register(pd.DataFrame({"a": [1, 2, 3], "b": ["x", None, "z"]}))
+    profile = generate_profile_sql(engine)
+    assert len(profile['head']) == 3
+    assert profile['nulls'] == {'a': 0, 'b': 1}
+    assert profile['describe']['a']['count'] == 3
+
+def test_generate_profile_sql_samples_large_tables():
+    from core.query_executor import QueryEngine
+    from core.schema_handler import generate_profile_sql
+    engine = QueryEngine()
+    engine.register(pd.DataFrame({"a": range(1000)}))
+    profile = generate_profile_sql(engine, sample_rows=100)
+    assert profile['num_rows'] == 1000
+    assert profile['sampled_rows'] == 100
+    assert profile['describe']['a']['count'] == 100
+    assert generate_profile_sql(engine, sample_rows=5000)['sampled_rows'] is None
+
+def test_column_profile():
+    from core.query_executor import QueryEngine
+    from core.schema_handler import column_profile
+    engine = QueryEngine()
+    engine.register(pd.DataFrame({"a": [1, 2, 2, 3, None], "b": ["x", "y", "y", "y", "z"]}))
+    details = column_profile(engine, 'b', 'VARCHAR')
+    assert details['distinct'] == 3
+    assert details['top_values'][0] == {'value': 'y', 'count': 3}
+    assert 'deciles' not in details
+    assert column_profile(engine, 'a', 'DOUBLE')['deciles'][0] == 1.0
+
+def test_profile_cache_reuses_results_until_data_changes():
+    from core.query_executor import QueryEngine
+    from core.schema_handler import ProfileCache
+    engine = QueryEngine()
+    engine.register(pd.DataFrame({"a": [1, 2, 3]}))
+    cache = ProfileCache(engine)
+    summary = cache.summary()
+    assert cache.summary() is summary
+    assert cache.cached_column('a') is None
+    details = cache.column('a')
+    assert cache.cached_column('a') is details
+    engine.register(pd.DataFrame({"a": [1, 2, 3, 4]}))
+    assert cache.cached_column('a') is None
+    assert cache.summary()['num_rows'] == 4
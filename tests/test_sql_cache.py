@@ -0,0 +1,70 @@
+import pytest
+from models.sql_cache import SQLCache, normalize_question
+
+SCHEMA = {'columns': [{'name': 'fare', 'dtype': 'float64', 'nulls': 0, 'unique': 3}], 'num_rows': 3, 'num_columns': 1}
+
+class WordEmbeddings:
+    vocab = ['average', 'mean', 'fare', 'tip', 'show', 'what', 'is', 'the']
+
+    def embed_query(self, text):
+        words = text.replace('mean', 'average').split()
+        return [float(words.count(word)) for word in self.vocab]
+
+def test_normalize_question():
+    assert normalize_question("  What is the AVERAGE fare?? ") == "what is the average fare"
+
+def test_exact_hit_and_schema_scope():
+    cache = SQLCache()
+    assert cache.get("Average fare?", SCHEMA) is None
+    cache.put("Average fare?", SCHEMA, "SELECT AVG(fare) FROM data")
+    assert cache.get("average  FARE", SCHEMA) == "SELECT AVG(fare) FROM data"
+    other = dict(SCHEMA, columns=[{'name': 'tip', 'dtype': 'float64'}])
+    assert cache.get("average fare", other) is None
+    assert cache.get("average fare", SCHEMA, mode='pandas') is None
+    assert cache.stats()['hits'] == 1
+
+def test_ttl_and_lru_eviction():
+    cache = SQLCache(max_entries=2, ttl_seconds=0)
+    cache.put("a", SCHEMA, "SELECT 1")
+    assert cache.get("a", SCHEMA) is None
+    cache = SQLCache(max_entries=2)
+    for q in ["a", "b", "c"]:
+        cache.put(q, SCHEMA, f"SELECT '{q}'")
+    assert cache.get("a", SCHEMA) is None
+    assert cache.get("c", SCHEMA) == "SELECT 'c'"
+
+def test_semantic_hit():
+    pytest.importorskip('faiss')
+    cache = SQLCache(embedding_model=WordEmbeddings(), similarity_threshold=0.95)
+    cache.put("what is the average fare", SCHEMA, "SELECT AVG(fare) FROM data")
+    assert cache.get("what is the mean fare", SCHEMA) == "SELECT AVG(fare) FROM data"
+    assert cache.get("what is the average tip", SCHEMA) is None
+    assert cache.stats()['semantic_hits'] == 1
+
+def test_context_scope():
+    cache = SQLCache()
+    cache.put("now break it down by product", SCHEMA, "SELECT product, SUM(sales) FROM data GROUP BY product", context='conv-a')
+    assert cache.get("now break it down by product", SCHEMA, context='conv-b') is None
+    assert cache.get("now break it down by product", SCHEMA, context='conv-a') is not None
+
+def test_repeated_question_in_a_session_calls_the_llm_once():
+    import streamlit as st
+    from agents.sql_agent import SQLAgent
+    from utils.log_buffer import LogBuffer
+
+    class CountingLLM:
+        calls = 0
+
+        def invoke(self, prompt):
+            self.calls += 1
+            return "SELECT AVG(fare) FROM data;"
+
+    st.session_state["logs"] = LogBuffer()
+    llm = CountingLLM()
+    agent = SQLAgent(llm, 'mistral', cache=SQLCache())
+    history = []
+    for _ in range(2):
+        history.append({'role': 'user', 'content': 'average fare'})
+        sql = agent.nl_to_sql('average fare', SCHEMA, history)
+        history.append({'role': 'assistant', 'sql': sql})
+    assert sql == "SELECT AVG(fare) FROM data;" and llm.calls == 1
@@ -0,0 +1,146 @@
+"""
+LogBuffer: bounded, level-filtered structured log for a session.
+Records are kept unformatted in a ring buffer (formatting happens only when a
+record is rendered), filtered by per-source level, and can be mirrored to a
+rotating log file.
+"""
+import re
+import time
+import logging
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+LEVELS = {'DEBUG': logging.DEBUG, 'INFO': logging.INFO, 'WARNING': logging.WARNING, 'ERROR': logging.ERROR}
+_PREFIX = re.compile(r"^\[([^\]]+)\]\s*")
+
+# (created, levelno, source, msg, args)
+Record = Tuple[float, int, str, str, tuple]
+
+def _levelno(level: Union[int, str]) -> int:
+    return level if isinstance(level, int) else LEVELS[level.upper()]
+
+class LogBuffer:
+    """
+    Keeps the last `capacity` records. A record below its source's level is
+    dropped before anything is formatted or stored, so DEBUG-level prompts and
+    responses cost nothing unless that source is set to DEBUG.
+    """
+    def __init__(self, capacity: int = 2000, level: Union[int, str] = logging.INFO,
+                 levels: Optional[Dict[str, Union[int, str]]] = None, spill_path: Optional[str] = None,
+                 spill_max_bytes: int = 5 * 1024 ** 2, spill_backups: int = 3, max_chars: int = 4000):
+        self.records: "deque[Record]" = deque(maxlen=capacity)
+        self.level = _levelno(level)
+        self.levels: Dict[str, int] = {source: _levelno(value) for source, value in (levels or {}).items()}
+        self.max_chars = max_chars  # longer messages are cut when rendered
+        self.dropped = 0  # records evicted from the ring buffer
+        self._lock = threading.Lock()
+        self._logger = None
+        if spill_path:
+            # A private logger (not registered with logging) so records don't propagate to the root handlers
+            self._logger = logging.Logger(f"autoqueryai.{id(self)}", logging.DEBUG)
+            handler = RotatingFileHandler(spill_path, maxBytes=spill_max_bytes, backupCount=spill_backups, encoding='utf-8')
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+            self._logger.addHandler(handler)
+
+    def set_level(self, level: Union[int, str], source: Optional[str] = None):
+        """
+        Minimum level recorded for `source`, or the default for all other sources.
+        """
+        with self._lock:
+            if source is None:
+                self.level = _levelno(level)
+            else:
+                self.levels[source] = _levelno(level)
+
+    def enabled(self, level: Union[int, str], source: str) -> bool:
+        return _levelno(level) >= self.levels.get(source, self.level)
+
+    def log(self, level: Union[int, str], source: str, msg: str, *args):
+        """
+        Record msg % args; arguments are only formatted when the record is shown.
+        """
+        levelno = _levelno(level)
+        if not self.enabled(levelno, source):
+            return
+        with self._lock:
+            if len(self.records) == self.records.maxlen:
+                self.dropped += 1
+            self.records.append((time.time(), levelno, source, msg, args))
+        if self._logger is not None:
+            self._logger.log(levelno, f"[{source}] {msg}", *args)
+
+    def debug(self, source: str, msg: str, *args):
+        self.log(logging.DEBUG, source, msg, *args)
+
+    def info(self, source: str, msg: str, *args):
+        self.log(logging.INFO, source, msg, *args)
+
+    def warning(self, source: str, msg: str, *args):
+        self.log(logging.WARNING, source, msg, *args)
+
+    def error(self, source: str, msg: str, *args):
+        self.log(logging.ERROR, source, msg, *args)
+
+    def append(self, line: str):
+        """
+        List-style entry point for plain "[Source] message" strings, logged at INFO
+        (ERROR when the message starts with "Error").
+        """
+        match = _PREFIX.match(line)
+        source, msg = (match.group(1), line[match.end():]) if match else ('app', line)
+        level = logging.ERROR if msg.lower().startswith('error') else logging.INFO
+        self.log(level, source, '%s', msg)
+
+    def format(self, record: Record) -> str:
+        created, levelno, source, msg, args = record
+        try:
+            text = msg % args if args else msg
+        except (TypeError, ValueError):
+            text = f"{msg} {args}"
+        if len(text) > self.max_chars:
+            text = f"{text[:self.max_chars]}... [{len(text) - self.max_chars:,} more characters]"
+        return f"{time.strftime('%H:%M:%S', time.localtime(created))} {logging.getLevelName(levelno)} [{source}] {text}"
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.format(record) for record in self.snapshot())
+
+    def snapshot(self) -> List[Record]:
+        with self._lock:
+            return list(self.records)
+
+    def sources(self) -> List[str]:
+        return sorted({record[2] for record in self.snapshot()})
+
+    def filter(self, level: Union[int, str] = logging.DEBUG, sources: Optional[List[str]] = None,
+               text: Optional[str] = None) -> List[Record]:
+        """
+        Records at or above `level`, from `sources` (all when None) and containing
+        `text` (case-insensitive; only then are messages formatted), oldest first.
+        """
+        levelno = _levelno(level)
+        selected = [record for record in self.snapshot()
+                    if record[1] >= levelno and (sources is None or record[2] in sources)]
+        if text:
+            needle = text.lower()
+            selected = [record for record in selected if needle in self.format(record).lower()]
+        return selected
+
+    def window(self, page: int = 0, page_size: int = 50, **filters) -> Tuple[List[str], int]:
+        """
+        Formatted lines of one page of filtered records, newest page first,
+        plus the number of pages. Only the lines on the page are formatted.
+        """
+        selected = self.filter(**filters)
+        num_pages = max(1, -(-len(selected) // page_size))
+        end = max(0, len(selected) - page * page_size)
+        return [self.format(record) for record in selected[max(0, end - page_size):end]], num_pages
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+            self.dropped = 0
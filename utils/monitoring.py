@@ -1,14 +1,191 @@
 """
 Monitoring utilities for prompt latency, LLM cost, and error rates (Part 6).
+Spans are timed into fixed-size windows (for p50/p95/p99) plus cumulative
+histogram buckets, and exported in Prometheus/OpenMetrics text format.
 """
+import math
 import time
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+def percentiles(values: Sequence[float], quantiles: Sequence[float]) -> List[Optional[float]]:
+    """
+    Nearest-rank percentiles of values (None when empty).
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return [None] * len(quantiles)
+    return [ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))] for q in quantiles]
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def record_tokens(monitoring: "Monitoring", agent: str, model: str, prompt_tokens: int, completion_tokens: int):
+    """
+    Count the tokens of one LLM call (prompt and completion) under llm_tokens.
+    """
+    monitoring.increment('llm_tokens', prompt_tokens, agent=agent, model=model, kind='prompt')
+    monitoring.increment('llm_tokens', completion_tokens, agent=agent, model=model, kind='completion')
+
+class _Histogram:
+    """
+    Durations of one span: the last `window` values for percentiles, and
+    cumulative count/sum/bucket counts for export.
+    """
+    def __init__(self, window: int, buckets: Sequence[float]):
+        self.recent = deque(maxlen=window)
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.recent.append(value)
+        self.count += 1
+        self.sum += value
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.bucket_counts[index] += 1
 
 class Monitoring:
-    def __init__(self):
-        self.metrics = []
+    """
+    Process-wide metrics shared by all sessions. Memory is fixed per series:
+    one window of recent durations per (span, labels) and one number per counter.
+    """
+    def __init__(self, window: int = 1024, buckets: Sequence[float] = DEFAULT_BUCKETS, namespace: str = 'autoqueryai'):
+        self.window = window
+        self.buckets = tuple(buckets)
+        self.namespace = namespace
+        self.metrics = deque(maxlen=window)  # raw log() events
+        self.spans: Dict[Tuple[str, LabelKey], _Histogram] = {}
+        self.counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._lock = threading.Lock()
+        self._server = None
 
     def log(self, event, value):
-        self.metrics.append({'event': event, 'value': value, 'timestamp': time.time()})
+        with self._lock:
+            self.metrics.append({'event': event, 'value': value, 'timestamp': time.time()})
 
     def get_metrics(self):
-        return self.metrics
+        with self._lock:
+            return list(self.metrics)
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.spans.get(key)
+            if histogram is None:
+                histogram = self.spans[key] = _Histogram(self.window, self.buckets)
+            histogram.observe(seconds)
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[None]:
+        """
+        Time the enclosed block as span `name`; failures also count in span_errors.
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.increment('span_errors', span=name, **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """
+        One row per span series: lifetime count plus mean and p50/p95/p99 (seconds) over the recent window.
+        """
+        with self._lock:
+            items = [(name, labels, histogram.count, histogram.sum, list(histogram.recent))
+                     for (name, labels), histogram in self.spans.items()]
+        rows = []
+        for name, labels, count, total, recent in sorted(items):
+            p50, p95, p99 = percentiles(recent, (0.5, 0.95, 0.99))
+            rows.append({'span': name, 'labels': ', '.join(f"{k}={v}" for k, v in labels), 'count': count,
+                         'mean': total / count if count else None, 'p50': p50, 'p95': p95, 'p99': p99})
+        return rows
+
+    def totals(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = sorted(self.counters.items())
+        return [{'counter': name, 'labels': ', '.join(f"{k}={v}" for k, v in labels), 'value': value}
+                for (name, labels), value in items]
+
+    def export(self, openmetrics: bool = False) -> str:
+        """
+        All spans as one histogram family (labelled by span) and counters as
+        `<name>_total`, in Prometheus text format or OpenMetrics.
+        """
+        with self._lock:
+            spans = sorted((name, labels, list(h.bucket_counts), h.count, h.sum) for (name, labels), h in self.spans.items())
+            counters = sorted(self.counters.items())
+        family = f"{self.namespace}_span_duration_seconds"
+        lines = [f"# HELP {family} Duration of instrumented spans.", f"# TYPE {family} histogram"]
+        for name, labels, bucket_counts, count, total in spans:
+            series = (('span', name),) + labels
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{family}_bucket{_format_labels(series + (('le', _format_number(bound)),))} {cumulative}")
+            lines.append(f"{family}_bucket{_format_labels(series + (('le', '+Inf'),))} {count}")
+            lines.append(f"{family}_sum{_format_labels(series)} {_format_number(total)}")
+            lines.append(f"{family}_count{_format_labels(series)} {count}")
+        for counter in sorted({name for (name, _), _ in counters}):
+            base = f"{self.namespace}_{counter}"
+            lines.append(f"# TYPE {base if openmetrics else base + '_total'} counter")
+            lines.extend(f"{base}_total{_format_labels(labels)} {_format_number(value)}"
+                         for (name, labels), value in counters if name == counter)
+        if openmetrics:
+            lines.append("# EOF")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port: int, addr: str = '127.0.0.1'):
+        """
+        Expose export() at http://addr:port/metrics for Prometheus scraping (background thread).
+        Binds to localhost by default; pass addr='0.0.0.0' to accept remote scrapers.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        monitoring = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+                body = monitoring.export(openmetrics).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+                                 if openmetrics else 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((addr, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
@@ -1,9 +1,134 @@
 """
-Profiling utility using pandas-profiling.
+Profiling utility using ydata-profiling.
+Reports are built in a background process on a sample of the data and cached
+as HTML by dataset hash and report options.
 """
+import os
+import json
+import hashlib
+import tempfile
+import multiprocessing
+import numpy as np
 import pandas as pd
-from ydata_profiling import ProfileReport
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
 
-def generate_profile_report(df: pd.DataFrame, output_path: str):
-    profile = ProfileReport(df, title="Data Profile Report")
+PROFILE_REPORT_DIR = os.path.join(tempfile.gettempdir(), 'autoqueryai', 'profile_reports')
+# Rows profiled by default; ydata-profiling cost grows with rows x columns
+REPORT_SAMPLE_ROWS = 50000
+# Categorical columns with at most this many values are used as sampling strata
+MAX_STRATA = 50
+
+def generate_profile_report(df: pd.DataFrame, output_path: str, minimal: bool = False,
+                            correlations: bool = True, interactions: bool = True):
+    from ydata_profiling import ProfileReport
+    options = {}
+    if not correlations:
+        options['correlations'] = None
+    if not interactions:
+        options['interactions'] = None
+    profile = ProfileReport(df, title="Data Profile Report", minimal=minimal, **options)
     profile.to_file(output_path)
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """
+    Content hash of a DataFrame (values, index and column names).
+    """
+    digest = hashlib.sha1(json.dumps([str(col) for col in df.columns]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()[:16]
+
+def _strata_column(df: pd.DataFrame) -> Optional[str]:
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype) and len(dtype.categories) <= MAX_STRATA:
+            return col
+        if pd.api.types.is_bool_dtype(dtype):
+            return col
+    return None
+
+def stratified_sample(df: pd.DataFrame, n: int, by: Optional[str] = None, seed: int = 0) -> pd.DataFrame:
+    """
+    Sample about n rows, keeping each stratum of `by` in proportion (and at
+    least one row of every stratum). Without a low-cardinality categorical or
+    boolean column to stratify on, this is a uniform sample. Row order is kept.
+    """
+    if len(df) <= n:
+        return df
+    by = by if by is not None else _strata_column(df)
+    rng = np.random.default_rng(seed)
+    if by is None:
+        return df.iloc[np.sort(rng.choice(len(df), n, replace=False))]
+    fraction = n / len(df)
+    groups = df.groupby(by, dropna=False, observed=True, sort=False).indices
+    picks = [rng.choice(rows, max(1, int(round(len(rows) * fraction))), replace=False) for rows in groups.values()]
+    return df.iloc[np.sort(np.concatenate(picks))]
+
+def _build_report(df: pd.DataFrame, sample_rows: Optional[int], stratify_by: Optional[str], output_path: str,
+                  minimal: bool, correlations: bool, interactions: bool):
+    # Runs in the worker process, so sampling never blocks the caller
+    sample = df if sample_rows is None else stratified_sample(df, sample_rows, stratify_by)
+    generate_profile_report(sample, f"{output_path}.tmp.html", minimal, correlations, interactions)
+    os.replace(f"{output_path}.tmp.html", output_path)
+
+class ProfileReportJobs:
+    """
+    Runs ydata-profiling in a background process so the UI never blocks on it.
+
+    submit() returns a report key right away; poll status() until the report
+    is 'done'. Finished reports are cached on disk, so re-submitting the same
+    data and options is instant.
+    """
+    def __init__(self, cache_dir: str = PROFILE_REPORT_DIR, max_workers: int = 1):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.jobs: Dict[str, Future] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def report_key(self, dataset_id: str, sample_rows: Optional[int], minimal: bool,
+                   correlations: bool, interactions: bool) -> str:
+        options = json.dumps([sample_rows, minimal, correlations, interactions])
+        return hashlib.sha1(f"{dataset_id}:{options}".encode('utf-8')).hexdigest()[:16]
+
+    def html_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.html")
+
+    def submit(self, df: pd.DataFrame, sample_rows: Optional[int] = REPORT_SAMPLE_ROWS, minimal: bool = True,
+               correlations: bool = False, interactions: bool = False, stratify_by: Optional[str] = None,
+               dataset_id: Optional[str] = None) -> str:
+        """
+        Start building a report for df (sampled to sample_rows; None profiles every row).
+        Pass the dataset's content id (e.g. DatasetVersions.head) as dataset_id to
+        skip hashing df; the frame is handed to the worker as is, which samples it.
+        """
+        key = self.report_key(dataset_id or frame_digest(df), sample_rows, minimal, correlations, interactions)
+        running = self.jobs.get(key)
+        if os.path.exists(self.html_path(key)) or (running is not None and not running.done()):
+            return key
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if self._executor is None:
+            # spawn: forking a multi-threaded Streamlit server is unsafe
+            self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+        # The executor pickles df to the worker from its own feeder thread
+        self.jobs[key] = self._executor.submit(_build_report, df, sample_rows, stratify_by, self.html_path(key),
+                                               minimal, correlations, interactions)
+        return key
+
+    def status(self, key: str) -> Tuple[str, Optional[str]]:
+        """
+        ('done', html_path), ('running', None), ('failed', error message) or ('missing', None).
+        """
+        if os.path.exists(self.html_path(key)):
+            return 'done', self.html_path(key)
+        job = self.jobs.get(key)
+        if job is None:
+            return 'missing', None
+        if not job.done():
+            return 'running', None
+        error = job.exception()
+        return ('failed', str(error)) if error is not None else ('missing', None)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None